@@ -0,0 +1,4 @@
+"""
+Read-only local API package for SiteLink Financial Manager
+"""
+from .server import ApiServer, serve
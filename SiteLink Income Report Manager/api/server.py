@@ -0,0 +1,408 @@
+"""
+Read-only local HTTP API for SiteLink Financial Data
+
+Lets several people read one database over the network instead of each
+copying the SQLite file around. Run it headless from the application
+directory:
+
+    python cli.py serve --host 0.0.0.0 --port 8765
+
+Every endpoint takes GET query parameters and answers JSON, or CSV with
+format=csv (or an Accept: text/csv header):
+
+    /health
+    /summary?month=04&year=2024            also start=/end= (YYYY-MM)
+    /trend?start=2023-01&end=2024-12       by_category=1, measure=, rolling=
+    /range?start=2024-01&end=2024-03       raw rows of a month range
+    /rows?year=2024&site=L001&limit=100    one keyset page; pass next_cursor back as after=
+    /sage-export?month=04&year=2024        the Sage GLS journal
+    /search?q=insurance                    full-text search; site=, start=, end=, category=
+
+The event loop only parses requests and writes bytes. Queries run on a
+pool of worker threads, each with its own read-only connection, so in WAL
+mode readers never block each other or an import running in the GUI.
+Row-level results (/range, /rows, /search) are streamed in batches of
+API_STREAM_BATCH rows, never built whole in memory, and a slow client
+pauses its query rather than letting rows pile up. The aggregate
+endpoints (/summary, /trend, /sage-export) are built whole, but they hold
+one row per category, account or month, not per stored charge.
+"""
+import asyncio
+import csv
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from config.settings import API_HOST, API_PAGE_LIMIT, API_PORT, API_STREAM_BATCH, API_WORKERS
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+MEDIA_TYPES = {'json': 'application/json', 'csv': 'text/csv; charset=utf-8'}
+
+# Batches a query may run ahead of the client
+_QUEUED_BATCHES = 4
+_MAX_HEADER_LINES = 100
+
+
+class ApiError(Exception):
+    """An error answered with an HTTP status and a JSON message"""
+
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(message)
+
+
+class Table:
+    """A response body: columns, an iterable of rows and extra top-level JSON fields"""
+
+    def __init__(self, columns, rows, extra=None, headers=None):
+        self.columns = list(columns)
+        self.rows = rows
+        self.extra = extra or {}
+        self.headers = headers or {}
+
+
+def _json_default(value):
+    # numpy scalars and Timestamps from pandas-built results
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, separators=(',', ':'))
+
+
+class _Params:
+    """Query-string parameters with validation answered as 400s"""
+
+    def __init__(self, query):
+        self._values = parse_qs(query, keep_blank_values=False)
+
+    def get(self, name, default=None):
+        values = self._values.get(name)
+        return values[-1] if values else default
+
+    def list(self, name):
+        return self._values.get(name, [])
+
+    def month(self, name='month', required=False):
+        value = self.get(name)
+        if value is None:
+            if required:
+                raise ApiError(400, f"'{name}' is required")
+            return None
+        if not value.isdigit() or not 1 <= int(value) <= 12:
+            raise ApiError(400, f"Invalid month '{value}'")
+        return f"{int(value):02d}"
+
+    def integer(self, name, default=None, required=False, minimum=None):
+        value = self.get(name)
+        if value is None:
+            if required:
+                raise ApiError(400, f"'{name}' is required")
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ApiError(400, f"'{name}' must be a whole number")
+        if minimum is not None and number < minimum:
+            raise ApiError(400, f"'{name}' must be at least {minimum}")
+        return number
+
+    def flag(self, name):
+        return self.get(name, '').lower() in ('1', 'true', 'yes')
+
+    def cursor(self, name='after'):
+        value = self.get(name)
+        if value is None:
+            return None
+        try:
+            cursor = json.loads(value)
+        except ValueError:
+            raise ApiError(400, f"'{name}' must be the next_cursor of the previous page")
+        if not isinstance(cursor, list):
+            raise ApiError(400, f"'{name}' must be the next_cursor of the previous page")
+        return tuple(cursor)
+
+
+class ApiServer:
+    """
+    asyncio HTTP server answering read-only queries from a database.
+
+    db_manager should be opened read-only (see database.sharding.open_database);
+    by default the configured database is.
+    """
+
+    def __init__(self, db_manager=None, host=API_HOST, port=API_PORT, workers=API_WORKERS):
+        if db_manager is None:
+            from database.sharding import open_database
+            db_manager = open_database(read_only=True)
+        self.db_manager = db_manager
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sitelink-api")
+        self._processor = None
+        self._processor_lock = threading.Lock()
+        self.routes = {
+            '/health': self.health,
+            '/summary': self.summary,
+            '/trend': self.trend,
+            '/range': self.data_range,
+            '/rows': self.rows,
+            '/sage-export': self.sage_export,
+            '/search': self.search,
+        }
+
+    # Endpoints: run on a worker thread, return a Table
+
+    def health(self, params):
+        return Table(['status'], [('ok',)])
+
+    def summary(self, params):
+        return Table(*self.db_manager.get_financial_summary_rows(
+            params.month(), params.integer('year'), params.get('start'), params.get('end')
+        ))
+
+    def trend(self, params):
+        return Table(*self.db_manager.get_trend_rows(
+            params.get('start'), params.get('end'), by_category=params.flag('by_category'),
+            measure=params.get('measure', 'net_total'), rolling_months=params.integer('rolling', 3, minimum=1)
+        ))
+
+    def data_range(self, params):
+        if not (params.get('start') or params.get('end')):
+            raise ApiError(400, "'start' or 'end' is required")
+        return Table(*self.db_manager.iter_data_range(params.get('start'), params.get('end'), API_STREAM_BATCH))
+
+    def rows(self, params):
+        filters = {
+            'report_month': params.month(),
+            'report_year': params.integer('year'),
+            'SiteID': params.get('site'),
+            'sChgCategory': params.get('category'),
+        }
+        limit = min(params.integer('limit', 100, minimum=1), API_PAGE_LIMIT)
+        columns, rows, next_cursor = self.db_manager.get_data_page(
+            {key: value for key, value in filters.items() if value is not None},
+            sort=params.get('sort', 'id'), descending=params.flag('descending'),
+            after=params.cursor(), limit=limit
+        )
+        headers = {'X-Next-Cursor': _dumps(next_cursor)} if next_cursor else {}
+        return Table(columns, rows, {'next_cursor': next_cursor}, headers)
+
+    def sage_export(self, params):
+        """
+        The month's Sage journal, built whole from the cached DataFrame.
+
+        It is read from category_summary grouped by category and account,
+        so it has at most two lines per account whatever the month's row
+        count, and shards must be merged before groups can be netted.
+        """
+        report_month, report_year = params.month(required=True), params.integer('year', required=True)
+        journal = self.processor().prepare_sage_export(report_month, report_year)
+        return Table(journal.columns, journal.itertuples(index=False, name=None), headers={
+            'Content-Disposition': f'attachment; filename="sage_export_{report_month}_{report_year}.csv"'
+        })
+
+    def search(self, params):
+        text = params.get('q')
+        if not text:
+            raise ApiError(400, "'q' is required")
+        result = self.db_manager.search(
+            text, site_ids=params.list('site') or None, start=params.get('start'), end=params.get('end'),
+            category=params.get('category'), after=params.cursor(),
+            limit=min(params.integer('limit', 50, minimum=1), API_PAGE_LIMIT), facets=params.get('after') is None
+        )
+        extra = {key: result[key] for key in ('next_cursor', 'total', 'facets')}
+        headers = {'X-Next-Cursor': _dumps(result['next_cursor'])} if result['next_cursor'] else {}
+        return Table(result['columns'], result['rows'], extra, headers)
+
+    def processor(self):
+        """The SiteLinkProcessor for Sage journals, created on first use (imports pandas)"""
+        with self._processor_lock:
+            if self._processor is None:
+                from data.sitelink_processor import SiteLinkProcessor
+                self._processor = SiteLinkProcessor(self.db_manager)
+            return self._processor
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        """Answer one request, then close the connection"""
+        try:
+            try:
+                method, path, params, accept = await self._read_request(reader)
+                route = self.routes.get(path.rstrip('/') or '/')
+                if route is None:
+                    raise ApiError(404, f"No endpoint {path}")
+                if method not in ('GET', 'HEAD'):
+                    raise ApiError(405, "Only GET and HEAD are supported")
+                output = params.get('format') or ('csv' if 'text/csv' in accept else 'json')
+                if output not in MEDIA_TYPES:
+                    raise ApiError(400, f"Unknown format '{output}' (json or csv)")
+            except ApiError as e:
+                await self._send_error(writer, e.status, str(e))
+                return
+            await self._stream(writer, route, params, output, head_only=method == 'HEAD')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        line = (await reader.readline()).decode('latin-1').strip()
+        parts = line.split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ApiError(400, "Malformed request line")
+        accept = ''
+        for _ in range(_MAX_HEADER_LINES):
+            header = (await reader.readline()).decode('latin-1').strip()
+            if not header:
+                break
+            name, _, value = header.partition(':')
+            if name.strip().lower() == 'accept':
+                accept = value.strip().lower()
+        else:
+            raise ApiError(400, "Too many headers")
+        url = urlsplit(parts[1])
+        return parts[0].upper(), url.path, _Params(url.query), accept
+
+    @staticmethod
+    def _head(status, content_type, headers=None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", f"Content-Type: {content_type}",
+                 "Cache-Control: no-store", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def _send_error(self, writer, status, message):
+        writer.write(self._head(status, MEDIA_TYPES['json']) + _dumps({'error': message}).encode('utf-8'))
+        await writer.drain()
+
+    async def _stream(self, writer, route, params, output, head_only=False):
+        """
+        Run route on a worker thread and stream its rows to the client.
+
+        The worker hands over one batch at a time and waits for a free slot
+        before reading the next, so at most _QUEUED_BATCHES batches are in
+        memory per request. A client that disconnects stops the query.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        slots = threading.Semaphore(_QUEUED_BATCHES)
+        cancelled = threading.Event()
+
+        def put(item):
+            slots.acquire()
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+            return not cancelled.is_set()
+
+        def produce():
+            try:
+                table = route(params)
+                if not put(('table', table)) or head_only:
+                    return
+                batch = []
+                for row in table.rows:
+                    batch.append(row)
+                    if len(batch) >= API_STREAM_BATCH:
+                        if not put(('rows', batch)):
+                            return
+                        batch = []
+                if batch and not put(('rows', batch)):
+                    return
+            except BaseException as e:
+                put(('error', e))
+                return
+            put(('end', None))
+
+        worker = loop.run_in_executor(self.executor, produce)
+        try:
+            kind, value = await queue.get()
+            slots.release()
+            if kind == 'error':
+                status = value.status if isinstance(value, ApiError) else 400 if isinstance(value, ValueError) else 500
+                await self._send_error(writer, status, str(value))
+                return
+            table = value
+            headers = dict(table.headers)
+            if output == 'json':
+                headers.pop('Content-Disposition', None)
+            writer.write(self._head(200, MEDIA_TYPES[output], headers))
+            if head_only:
+                await writer.drain()
+                return
+
+            first = True
+            if output == 'json':
+                writer.write(f'{{"columns":{_dumps(table.columns)},"rows":['.encode('utf-8'))
+            else:
+                writer.write(self._csv_lines([table.columns]))
+            while True:
+                kind, value = await queue.get()
+                slots.release()
+                if kind != 'rows':
+                    break
+                if output == 'json':
+                    chunk = ",".join(_dumps(list(row)) for row in value)
+                    writer.write(((',' if not first else '') + chunk).encode('utf-8'))
+                else:
+                    writer.write(self._csv_lines(value))
+                first = False
+                await writer.drain()
+            if kind == 'error':
+                # Headers are gone; cutting the response short tells the client
+                raise ConnectionAbortedError(str(value))
+            if output == 'json':
+                extra = "".join(f',{_dumps(name)}:{_dumps(field)}' for name, field in table.extra.items())
+                writer.write(f']{extra}}}'.encode('utf-8'))
+            await writer.drain()
+        finally:
+            if not worker.done():
+                cancelled.set()
+                # Wake a worker waiting for a slot so it sees the cancellation
+                for _ in range(_QUEUED_BATCHES + 1):
+                    slots.release()
+            await worker
+
+    @staticmethod
+    def _csv_lines(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\r\n').writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    async def serve_forever(self, ready=None):
+        """Listen until cancelled; ready, if given, is called with the bound (host, port)"""
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        async with server:
+            bound = server.sockets[0].getsockname()[:2]
+            if ready:
+                ready(bound)
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(db_manager=None, host=API_HOST, port=API_PORT, workers=API_WORKERS):
+    """Run the API server in the foreground until interrupted"""
+    server = ApiServer(db_manager, host, port, workers)
+    try:
+        asyncio.run(server.serve_forever(
+            ready=lambda bound: print(f"Serving SiteLink data read-only on http://{bound[0]}:{bound[1]}", flush=True)
+        ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
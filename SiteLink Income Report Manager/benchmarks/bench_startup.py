@@ -0,0 +1,61 @@
+"""
+Benchmark start-up time of the GUI and headless CLI entry points
+
+Each sample runs in a fresh interpreter against a scratch database in a
+temporary directory. The GUI path stops just before creating the Tk
+window, so it also runs on machines without a display.
+
+Run from the application directory:
+    python -m benchmarks.bench_startup --runs 7
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    # Everything main.py does before the window appears
+    'gui (imports + processor)': [
+        '-c', 'import gui.main_window\nfrom data.sitelink_processor import SiteLinkProcessor\nSiteLinkProcessor()'
+    ],
+    'cli summary': [str(APP_DIR / 'cli.py'), 'summary'],
+    'cli rebuild --check': [str(APP_DIR / 'cli.py'), 'rebuild', '--check'],
+}
+
+
+def time_run(args, cwd, env):
+    """Wall-clock seconds for one fresh interpreter running args"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(APP_DIR))
+    with tempfile.TemporaryDirectory() as scratch:
+        # Create and migrate the scratch database once so every scenario
+        # measures opening an existing, up-to-date database
+        time_run(SCENARIOS['cli summary'], scratch, env)
+
+        baseline = statistics.median(time_run(['-c', 'pass'], scratch, env) for _ in range(args.runs))
+        print(f"{'bare interpreter':28s} {baseline * 1000:8.0f} ms")
+        for name, scenario in SCENARIOS.items():
+            samples = [time_run(scenario, scratch, env) for _ in range(args.runs)]
+            median = statistics.median(samples)
+            print(f"{name:28s} {median * 1000:8.0f} ms  (min {min(samples) * 1000:.0f} ms, "
+                  f"{(median - baseline) * 1000:.0f} ms over bare interpreter)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark suite for the SiteLink import, summary and export hot paths
+
+Generates a synthetic database and workbook, then times each case in its
+own fresh process so peak RSS is measured per case. Results can be saved
+as a JSON baseline and later runs compared against it.
+
+Run from the application directory:
+    python -m benchmarks.run_benchmarks --sites 50 --charges 40 --months 24 --save
+    python -m benchmarks.run_benchmarks --sites 50 --charges 40 --months 24
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Database generated once per suite run; write cases work on copies of it
+DATABASE_FILE = "bench.db"
+WORKBOOK_FILE = "report.xlsx"
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _database_copy(workdir, name):
+    """Copy the generated database for a case that writes to it"""
+    path = Path(workdir) / name
+    shutil.copy(Path(workdir) / DATABASE_FILE, path)
+    return path
+
+
+# Each case takes (workdir, scale) and returns (callable to time, rows it
+# processes). It is called again before every repeat so write cases start
+# from the same state each time.
+
+def case_read_excel_file(workdir, scale):
+    from data.sitelink_processor import SiteLinkProcessor
+    from database.db_manager import DatabaseManager
+    processor = SiteLinkProcessor(DatabaseManager(Path(workdir) / DATABASE_FILE))
+    workbook = Path(workdir) / WORKBOOK_FILE
+    return lambda: processor.read_excel_file(workbook, *scale['new_period']), scale['month_rows']
+
+
+def case_import_excel_file(workdir, scale):
+    from data.sitelink_processor import SiteLinkProcessor
+    from database.db_manager import DatabaseManager
+    db_path = _database_copy(workdir, f"import_{time.perf_counter_ns()}.db")
+    processor = SiteLinkProcessor(DatabaseManager(db_path))
+    workbook = Path(workdir) / WORKBOOK_FILE
+    return lambda: processor.import_excel_file(workbook, *scale['new_period']), scale['month_rows']
+
+
+def case_store_data(workdir, scale):
+    from data.sitelink_processor import SiteLinkProcessor
+    from database.db_manager import DatabaseManager
+    db_path = _database_copy(workdir, f"store_{time.perf_counter_ns()}.db")
+    processor = SiteLinkProcessor(DatabaseManager(db_path))
+    df = processor.read_excel_file(Path(workdir) / WORKBOOK_FILE, *scale['new_period'])
+    return lambda: processor.store_data(df), scale['month_rows']
+
+
+def case_create_monthly_summary(workdir, scale):
+    from database.db_manager import DatabaseManager
+    db_manager = DatabaseManager(Path(workdir) / DATABASE_FILE)
+    report_month, report_year = scale['last_period']
+
+    def run():
+        with db_manager.transaction() as conn:
+            db_manager.create_monthly_summary(conn, report_month, report_year)
+    return run, scale['month_rows']
+
+
+def case_get_financial_summary(workdir, scale):
+    from database.db_manager import DatabaseManager
+    db_manager = DatabaseManager(Path(workdir) / DATABASE_FILE)
+    return db_manager.get_financial_summary, scale['total_rows']
+
+
+def case_get_trend_report(workdir, scale):
+    from benchmarks.synthetic import period_for
+    from database.db_manager import DatabaseManager
+    db_manager = DatabaseManager(Path(workdir) / DATABASE_FILE)
+    first_month, first_year = period_for(0)
+    last_month, last_year = scale['last_period']
+    start, end = f"{first_year}-{first_month}", f"{last_year}-{last_month}"
+    return lambda: db_manager.get_trend_report(start, end, by_category=True), scale['total_rows']
+
+
+def case_get_sage_export_data(workdir, scale):
+    from database.db_manager import DatabaseManager
+    db_manager = DatabaseManager(Path(workdir) / DATABASE_FILE)
+    return lambda: db_manager.get_sage_export_data(*scale['last_period']), scale['month_rows']
+
+
+def case_prepare_sage_export(workdir, scale):
+    from data.sitelink_processor import SiteLinkProcessor
+    from database.db_manager import DatabaseManager
+    processor = SiteLinkProcessor(DatabaseManager(Path(workdir) / DATABASE_FILE))
+    return lambda: processor.prepare_sage_export(*scale['last_period']), scale['month_rows']
+
+
+CASES = {
+    'read_excel_file': case_read_excel_file,
+    'import_excel_file': case_import_excel_file,
+    'store_data': case_store_data,
+    'create_monthly_summary': case_create_monthly_summary,
+    'get_financial_summary': case_get_financial_summary,
+    'get_trend_report': case_get_trend_report,
+    'get_sage_export_data': case_get_sage_export_data,
+    'prepare_sage_export': case_prepare_sage_export,
+}
+
+
+def run_case(name, workdir, scale, repeat):
+    """Time one case in the current (fresh) process"""
+    # DatabaseManager imports pandas lazily; keep that one-off cost (measured
+    # by bench_startup) out of the first sample
+    import pandas  # noqa: F401
+    os.chdir(workdir)
+    samples = []
+    for _ in range(repeat):
+        func, rows = CASES[name](workdir, scale)
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    seconds = statistics.median(samples)
+    return {
+        'seconds': seconds,
+        'best_seconds': min(samples),
+        'rows': rows,
+        'rows_per_sec': rows / seconds if seconds else None,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def prepare(workdir, sites, charges, months):
+    """Generate the benchmark database and workbook; return the scale"""
+    from benchmarks.synthetic import build_database, make_report_frame, period_for, write_workbook
+    from database.db_manager import DatabaseManager
+
+    os.chdir(workdir)
+    db_manager = DatabaseManager(Path(workdir) / DATABASE_FILE)
+    total_rows = build_database(db_manager, sites, charges, months)
+    db_manager.close()
+    write_workbook(Path(workdir) / WORKBOOK_FILE, make_report_frame(sites, charges, months))
+    return {
+        'sites': sites, 'charges': charges, 'months': months,
+        'month_rows': sites * charges, 'total_rows': total_rows,
+        'last_period': period_for(months - 1), 'new_period': period_for(months),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Print deltas against a baseline; return the names that regressed.
+
+    A case regresses when it is more than tolerance slower and also at
+    least min_delta seconds slower, so millisecond-scale jitter in the
+    fast queries is not reported.
+    """
+    regressions = []
+    if baseline.get('scale', {}).get('total_rows') != results['scale']['total_rows']:
+        print("\nWarning: baseline was recorded at a different scale")
+    print(f"\n{'case':24s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if not previous:
+            print(f"{name:24s} {'-':>10s} {current['seconds']:10.3f}s")
+            continue
+        change = current['seconds'] / previous['seconds'] - 1 if previous['seconds'] else 0.0
+        flag = ""
+        if change > tolerance and current['seconds'] - previous['seconds'] >= min_delta:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:24s} {previous['seconds']:9.3f}s {current['seconds']:9.3f}s {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sites', type=int, default=20)
+    parser.add_argument('--charges', type=int, default=50, help="charge descriptions per site")
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case (median reported)")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="slowdown vs baseline reported as a regression (default 0.2 = 20%%)")
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            scale = pool.submit(prepare, workdir, args.sites, args.charges, args.months).result()
+        print(f"Generated {scale['total_rows']:,} rows ({args.sites} sites x {args.charges} charges "
+              f"x {args.months} months) in {time.perf_counter() - started:.1f}s\n")
+
+        results = {
+            'recorded': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'cases': {},
+        }
+        print(f"{'case':24s} {'median':>9s} {'rows/sec':>12s} {'peak RSS':>10s}")
+        for name in args.cases:
+            # A fresh process per case keeps peak RSS and caches independent
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                case = pool.submit(run_case, name, workdir, scale, args.repeat).result()
+            results['cases'][name] = case
+            rss = f"{case['peak_rss_mb']:.0f} MB" if case['peak_rss_mb'] is not None else "n/a"
+            print(f"{name:24s} {case['seconds']:8.3f}s {case['rows_per_sec']:12,.0f} {rss:>10s}")
+
+    regressions = []
+    if args.baseline.exists():
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nBaseline saved to {args.baseline}")
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Synthetic SiteLink data for benchmarks
+
+Generates financial summary rows in EXPECTED_COLUMNS layout at a chosen
+scale of sites x charge descriptions x months, as DataFrames, Excel
+workbooks or a populated database. Output is deterministic for a seed.
+"""
+import numpy as np
+import pandas as pd
+from config.settings import EXPECTED_COLUMNS
+
+CATEGORIES = ['Rent', 'Late Fee', 'Admin Fee', 'Insurance', 'Merchandise', 'Deposit', 'Other']
+CATEGORY_MAPPINGS = {"Rent": "4000", "Late Fee": "4010", "Admin Fee": "4020", "Insurance": "4030"}
+
+
+def make_report_frame(sites, charges, month_index=0, seed=0):
+    """
+    One month's report: sites x charges rows in EXPECTED_COLUMNS order.
+
+    Charge lines keep the same keys from month to month while amounts
+    vary with month_index, as real consecutive reports do.
+    """
+    rows = sites * charges
+    rng = np.random.default_rng([seed, month_index])
+    site_ids = np.repeat([f"L{site:04d}" for site in range(1, sites + 1)], charges)
+    charge_ids = np.tile(np.arange(1, charges + 1), sites)
+    categories = np.array(CATEGORIES)[charge_ids % len(CATEGORIES)]
+    account_codes = (4000 + charge_ids % 97).astype(str)
+
+    charge = rng.gamma(2.0, 250.0, rows).round(2)
+    tax1 = (charge * 0.06).round(2)
+    tax2 = (charge * 0.01).round(2)
+    payment = (charge * rng.uniform(0.6, 1.0, rows)).round(2)
+    credit = np.where(rng.random(rows) < 0.05, (charge * 0.1).round(2), 0.0)
+    frame = pd.DataFrame({
+        'SiteID': site_ids,
+        'ChargeDescID': charge_ids.astype(str),
+        'sChgCategory': categories,
+        'sChgDesc': [f"{category} {charge_id}" for category, charge_id in zip(categories, charge_ids)],
+        'sDefAcctCode': account_codes,
+        'sAcctCode': account_codes,
+        'Chg_dDisabled': (rng.random(rows) < 0.03).astype(int),
+        'Chg_dDeleted': 0,
+        'Price': charge,
+        'Charge': charge,
+        'Discount': 0.0,
+        'ChargeTax1': tax1,
+        'ChargeTax2': tax2,
+        'ChargeTotal': charge + tax1 + tax2,
+        'Payment': payment,
+        'PaymentTax1': (payment * 0.06).round(2),
+        'PaymentTax2': (payment * 0.01).round(2),
+        'PaymentTotal': (payment * 1.07).round(2),
+        'Credit': credit,
+        'CreditTax1': 0.0,
+        'CreditTax2': 0.0,
+        'CreditTotal': credit,
+        'TotalCost': (charge * 1.07 - payment * 1.07 - credit).round(2),
+        'iCount': rng.integers(1, 50, rows),
+        'dcPercent': 0.0,
+    })
+    return frame[EXPECTED_COLUMNS]
+
+
+def period_for(month_index, start_year=2020):
+    """Return the (report_month, report_year) of the nth generated month"""
+    return f"{month_index % 12 + 1:02d}", start_year + month_index // 12
+
+
+def write_workbook(path, frame):
+    """Write a report frame as a SiteLink-style .xlsx using a streaming writer"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("FinancialSummary")
+    sheet.append(list(frame.columns))
+    for row in frame.itertuples(index=False, name=None):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def build_database(db_manager, sites, charges, months, start_year=2020, seed=0):
+    """Fill a database with months of reports; return the rows stored"""
+    total = 0
+    for month_index in range(months):
+        report_month, report_year = period_for(month_index, start_year)
+        frame = make_report_frame(sites, charges, month_index, seed)
+        db_manager.store_rows(report_month, report_year,
+                              [frame.itertuples(index=False, name=None)])
+        total += len(frame)
+    return total
+
+
+def make_export_rows(rows, seed=0):
+    """Synthetic get_sage_export_data output with some zero legs"""
+    rng = np.random.default_rng(seed)
+    debit = rng.normal(500, 300, rows).round(2)
+    credit = rng.normal(400, 250, rows).round(2)
+    debit[rng.random(rows) < 0.1] = 0
+    credit[rng.random(rows) < 0.1] = 0
+    return pd.DataFrame({
+        'sChgCategory': rng.choice(CATEGORIES, rows),
+        'sAcctCode': rng.integers(4000, 4999, rows).astype(str),
+        'sDefAcctCode': rng.integers(4000, 4999, rows).astype(str),
+        'debit_amount': debit,
+        'credit_amount': credit,
+    })
@@ -0,0 +1,358 @@
+"""
+SiteLink Financial Data Manager - Headless Command Line Entry Point
+
+For cron jobs and servers without a display. Nothing heavier than the
+standard library is imported until a command needs it, so quick commands
+such as summary start fast.
+
+    python cli.py import report.xlsx --month 04 --year 2024
+    python cli.py validate report.xlsx --month 04 --year 2024
+    python cli.py bulk-import "C:/Reports/Facility 12"
+    python cli.py export-sage --month 04 --year 2024 --output april.csv
+    python cli.py export-report --month 04 --year 2024 --output april.xlsx
+    python cli.py summary --year 2024
+    python cli.py search insurance --start 2024-01 --site L001
+    python cli.py trend --start 2023-01 --end 2024-12 --by-category
+    python cli.py rebuild
+    python cli.py shard --by year
+    python cli.py archive --before 2023-01 --vacuum
+    python cli.py serve --host 0.0.0.0 --port 8765
+    python cli.py --metrics metrics.prom --profile cprofile import report.xlsx --month 04 --year 2024
+"""
+import argparse
+import sys
+
+
+def _database():
+    from database.sharding import open_database
+    return open_database()
+
+
+def _processor():
+    from data.sitelink_processor import SiteLinkProcessor
+    return SiteLinkProcessor(_database())
+
+
+def _print_table(columns, rows):
+    """Print rows as a plain fixed-width table"""
+    cells = [[f"{v:,.2f}" if isinstance(v, float) else str(v) for v in row] for row in rows]
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(columns)]
+    print("  ".join(name.ljust(width) for name, width in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def import_command(args):
+    """Stream one workbook into the database"""
+    from data.import_cache import import_workbook
+    from data.validation import ValidationError, format_validation
+    try:
+        stats = import_workbook(_database(), args.file, args.month, args.year, force=args.force,
+                                strict=args.strict)
+    except ValidationError as e:
+        print(f"{args.file} was not imported. {e}", file=sys.stderr)
+        return 1
+    if stats['skipped']:
+        print(f"{args.file} is already imported for {args.month}/{args.year} and unchanged; "
+              f"nothing to do (use --force to re-import)")
+        return 0
+    print(f"Imported {stats['rows']} records for {args.month}/{args.year}: "
+          f"inserted {stats['inserted']}, updated {stats['updated']}, "
+          f"deleted {stats['deleted']}, unchanged {stats['unchanged']}")
+    print(format_validation(stats['validation'], stats['reconciliation']))
+    return 0
+
+
+def validate_command(args):
+    """Check a workbook's rows without importing it"""
+    from data.excel_stream import iter_excel_chunks
+    from data.validation import ImportValidator, format_validation, reconcile_import
+    validator = ImportValidator()
+    for chunk in iter_excel_chunks(args.file):
+        validator.check(chunk)
+    validator.finish()
+    report = validator.report()
+    reconciliation = None
+    if args.month and args.year:
+        # Compare with what the database already holds for the month
+        reconciliation = reconcile_import(_database(), args.month, args.year, report)
+    print(format_validation(report, reconciliation))
+    return 1 if report['violations'] or (reconciliation and not reconciliation['ok']) else 0
+
+
+def bulk_import_command(args):
+    """Import a directory or glob of monthly workbooks"""
+    from data.bulk_import import BulkImporter, format_results
+    results = BulkImporter(_database(), workers=args.workers, force=args.force,
+                           strict=args.strict).run(args.source)
+    print(format_results(results))
+    return 1 if results['failed'] else 0
+
+
+def export_sage_command(args):
+    """Write the Sage GLS journal for one month to CSV"""
+    sage_df = _processor().prepare_sage_export(args.month, args.year)
+    if sage_df.empty:
+        print(f"No data available for {args.month}/{args.year}", file=sys.stderr)
+        return 1
+    output = args.output or f"sage_export_{args.month}_{args.year}.csv"
+    sage_df.to_csv(output, index=False)
+    print(f"Sage GLS export saved as: {output} ({len(sage_df)} lines)")
+    return 0
+
+
+def export_report_command(args):
+    """Stream raw rows, summary and Sage journal into one Excel workbook"""
+    if bool(args.month) != bool(args.year):
+        print("Give both --month and --year, or neither to export every month", file=sys.stderr)
+        return 1
+    if args.month:
+        output = args.output or f"sitelink_report_{args.month}_{args.year}.xlsx"
+    else:
+        output = args.output or "sitelink_report.xlsx"
+    written = _processor().export_excel_report(output, args.month, args.year)
+    print(f"Excel report saved as: {output} "
+          f"({', '.join(f'{name}: {rows} rows' for name, rows in written.items())})")
+    return 0
+
+
+def summary_command(args):
+    """Print the financial summary"""
+    columns, rows = _database().get_financial_summary_rows(args.month, args.year, args.start, args.end)
+    if not rows:
+        print("No data available")
+        return 0
+    _print_table(columns, rows)
+    return 0
+
+
+SEARCH_COLUMNS = ['report_year', 'report_month', 'SiteID', 'sChgCategory', 'sChgDesc', 'sAcctCode',
+                  'ChargeTotal', 'score']
+
+
+def search_command(args):
+    """Print rows matching a full-text search, with facet counts"""
+    after = tuple(None if value == "" else int(value) if value.isdigit() and position != 2 else value
+                  for position, value in enumerate(args.after.split(","))) if args.after else None
+    result = _database().search(" ".join(args.text), site_ids=args.site, start=args.start, end=args.end,
+                                category=args.category, after=after, limit=args.limit, facets=after is None)
+    if result['total'] is not None:
+        print(f"{result['total']:,} matching rows")
+        for facet, counts in result['facets'].items():
+            shown = ", ".join(f"{value} ({count:,})" for value, count in counts[:args.facets])
+            more = f", ... {len(counts) - args.facets} more" if len(counts) > args.facets else ""
+            print(f"  by {facet}: {shown}{more}")
+    if not result['rows']:
+        print("No matches")
+        return 0
+    positions = [result['columns'].index(column) for column in SEARCH_COLUMNS]
+    _print_table(SEARCH_COLUMNS, [[row[position] for position in positions] for row in result['rows']])
+    if result['next_cursor']:
+        cursor = ",".join("" if value is None else str(value) for value in result['next_cursor'])
+        print(f"More: --after {cursor}")
+    return 0
+
+
+def trend_command(args):
+    """Print monthly totals with month-over-month, year-over-year and rolling figures"""
+    columns, rows = _database().get_trend_rows(
+        args.start, args.end, by_category=args.by_category, measure=args.measure,
+        rolling_months=args.rolling
+    )
+    if not rows:
+        print("No data available")
+        return 0
+    _print_table(columns, [["" if value is None else value for value in row] for row in rows])
+    return 0
+
+
+def rebuild_command(args):
+    """Rebuild summary tables from the raw rows"""
+    db_manager = _database()
+    if args.check:
+        mismatched = db_manager.check_category_summary(repair=False)
+        for report_month, report_year in mismatched:
+            print(f"Summary out of date for {report_month}/{report_year}")
+        return 1 if mismatched else 0
+    db_manager.rebuild_category_summary(args.month, args.year)
+    print("Summary tables rebuilt")
+    return 0
+
+
+def shard_command(args):
+    """Copy the single database into per-year or per-site shard files"""
+    from database.db_manager import DatabaseManager
+    from database.sharding import ShardedDatabaseManager
+    sharded = ShardedDatabaseManager(args.by)
+    if sharded.shard_keys():
+        print(f"{sharded.directory} already holds shards; not copying", file=sys.stderr)
+        return 1
+    rows = sharded.copy_from(DatabaseManager())
+    print(f"Copied {rows} rows into {len(sharded.shard_keys())} shard(s) in {sharded.directory}; "
+          f"set SITELINK_SHARD_BY={args.by} to use them")
+    return 0
+
+
+def archive_command(args):
+    """Move closed months' raw rows out to Parquet files, or list archived months"""
+    from database.archive import archive_periods
+    db_manager = _database()
+    if args.list:
+        for period in db_manager.archived_periods():
+            print(f"{period['report_month']}/{period['report_year']}: {period['row_count']} rows, "
+                  f"{period['file_size']:,} bytes in {period['file_path']}")
+        return 0
+    if not args.before:
+        print("Give --before YYYY-MM, or --list", file=sys.stderr)
+        return 1
+    archived = archive_periods(db_manager, args.before, vacuum=args.vacuum)
+    print(f"Archived {archived['rows']} rows from {archived['periods']} month(s) before {args.before}")
+    return 0
+
+
+def restore_command(args):
+    """Move an archived month back into the database"""
+    from database.archive import restore_period
+    rows = restore_period(_database(), args.month, args.year)
+    print(f"Restored {rows} rows for {args.month}/{args.year}")
+    return 0
+
+
+def serve_command(args):
+    """Answer read-only API requests until interrupted"""
+    from database.sharding import open_database
+    from api.server import serve
+    serve(open_database(read_only=True), args.host, args.port, args.workers)
+    return 0
+
+
+def _period(value):
+    """Validate a YYYY-MM argument"""
+    from utils.helpers import validate_date_range
+    if not validate_date_range(value, value):
+        raise argparse.ArgumentTypeError(f"invalid month '{value}' (expected YYYY-MM)")
+    return value
+
+
+def _month(value):
+    """Normalize a month argument to the stored two-digit form"""
+    if not value.isdigit() or not 1 <= int(value) <= 12:
+        raise argparse.ArgumentTypeError(f"invalid month '{value}'")
+    return f"{int(value):02d}"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="SiteLink Financial Data Manager (headless)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write timing metrics after the run (.json, or .prom for Prometheus)")
+    parser.add_argument("--profile", metavar="MODES",
+                        help="capture a profile: cprofile, tracemalloc or both comma-separated")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="import one monthly report")
+    command.add_argument("file", help=".xlsx or .xls report")
+    command.add_argument("--month", required=True, type=_month)
+    command.add_argument("--year", required=True, type=int)
+    command.add_argument("--force", action="store_true", help="re-import even if unchanged")
+    command.add_argument("--strict", action="store_true", help="reject the import if any row fails validation")
+    command.set_defaults(handler=import_command)
+
+    command = commands.add_parser("validate", help="check a report's rows without importing it")
+    command.add_argument("file", help=".xlsx or .xls report")
+    command.add_argument("--month", type=_month, help="with --year, reconcile against the stored month")
+    command.add_argument("--year", type=int)
+    command.set_defaults(handler=validate_command)
+
+    command = commands.add_parser("bulk-import", help="import a folder or glob of monthly reports")
+    command.add_argument("source", help="directory or glob pattern")
+    command.add_argument("--workers", type=int, default=None, help="parser processes")
+    command.add_argument("--force", action="store_true", help="re-import months even if unchanged")
+    command.add_argument("--strict", action="store_true", help="reject months whose rows fail validation")
+    command.set_defaults(handler=bulk_import_command)
+
+    command = commands.add_parser("export-sage", help="export one month for Sage GLS")
+    command.add_argument("--month", required=True, type=_month)
+    command.add_argument("--year", required=True, type=int)
+    command.add_argument("--output", help="CSV path (default: sage_export_{month}_{year}.csv)")
+    command.set_defaults(handler=export_sage_command)
+
+    command = commands.add_parser("export-report", help="export raw data, summary and Sage journal to Excel")
+    command.add_argument("--month", type=_month)
+    command.add_argument("--year", type=int)
+    command.add_argument("--output", help="xlsx path (default: sitelink_report[_{month}_{year}].xlsx)")
+    command.set_defaults(handler=export_report_command)
+
+    command = commands.add_parser("summary", help="print the financial summary")
+    command.add_argument("--month", type=_month)
+    command.add_argument("--year", type=int)
+    command.add_argument("--start", type=_period, help="first month, YYYY-MM")
+    command.add_argument("--end", type=_period, help="last month, YYYY-MM")
+    command.set_defaults(handler=summary_command)
+
+    command = commands.add_parser("search", help="full-text search of charge descriptions, categories and accounts")
+    command.add_argument("text", nargs="+", help="words to find (each matches the start of a word)")
+    command.add_argument("--site", action="append", help="only this SiteID (repeatable)")
+    command.add_argument("--start", type=_period, help="first month, YYYY-MM")
+    command.add_argument("--end", type=_period, help="last month, YYYY-MM")
+    command.add_argument("--category", help="only this charge category")
+    command.add_argument("--limit", type=int, default=20, help="rows per page")
+    command.add_argument("--after", help="cursor printed with the previous page")
+    command.add_argument("--facets", type=int, default=5, help="values shown per facet")
+    command.set_defaults(handler=search_command)
+
+    from database.queries import TREND_MEASURES
+    command = commands.add_parser("trend", help="print a monthly trend report for a range of months")
+    command.add_argument("--start", required=True, type=_period, help="first month, YYYY-MM")
+    command.add_argument("--end", required=True, type=_period, help="last month, YYYY-MM")
+    command.add_argument("--by-category", action="store_true", help="one series per charge category")
+    command.add_argument("--measure", choices=TREND_MEASURES, default='net_total',
+                         help="figure the changes and rolling total are computed for")
+    command.add_argument("--rolling", type=int, default=3, help="months in the rolling total")
+    command.set_defaults(handler=trend_command)
+
+    command = commands.add_parser("rebuild", help="rebuild summary tables from raw data")
+    command.add_argument("--month", type=_month)
+    command.add_argument("--year", type=int)
+    command.add_argument("--check", action="store_true", help="only report out-of-date periods")
+    command.set_defaults(handler=rebuild_command)
+
+    command = commands.add_parser("archive", help="move closed months' raw rows to Parquet files")
+    command.add_argument("--before", type=_period, help="archive every month before this one, YYYY-MM")
+    command.add_argument("--vacuum", action="store_true", help="compact the database file afterwards")
+    command.add_argument("--list", action="store_true", help="list archived months")
+    command.set_defaults(handler=archive_command)
+
+    command = commands.add_parser("restore", help="move an archived month back into the database")
+    command.add_argument("--month", required=True, type=_month)
+    command.add_argument("--year", required=True, type=int)
+    command.set_defaults(handler=restore_command)
+
+    command = commands.add_parser("shard", help="copy the database into per-year or per-site shards")
+    command.add_argument("--by", required=True, choices=['year', 'site'])
+    command.set_defaults(handler=shard_command)
+
+    from config.settings import API_HOST, API_PORT, API_WORKERS
+    command = commands.add_parser("serve", help="serve summaries, rows and Sage exports over a read-only local API")
+    command.add_argument("--host", default=API_HOST, help=f"address to listen on (default: {API_HOST})")
+    command.add_argument("--port", type=int, default=API_PORT, help=f"port (default: {API_PORT})")
+    command.add_argument("--workers", type=int, default=API_WORKERS, help="queries answered at once")
+    command.set_defaults(handler=serve_command)
+    return parser
+
+
+def main(argv=None):
+    """Headless entry point; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    from utils import instrumentation
+    try:
+        instrumentation.configure(args.metrics, args.profile)
+        return args.handler(args)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        instrumentation.finish()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
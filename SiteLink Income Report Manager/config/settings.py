@@ -8,6 +8,24 @@ from pathlib import Path
 DATABASE_NAME = "sitelink_financial_data.db"
 DATABASE_PATH = Path.cwd() / DATABASE_NAME
 
+# SQLite connection tuning (applied once per pooled connection)
+SQLITE_BUSY_TIMEOUT = 30  # seconds to wait on a locked database
+SQLITE_CACHED_STATEMENTS = 256  # prepared statements kept per connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # negative = KiB, i.e. 64 MB page cache
+    "mmap_size": 268435456,  # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+
+# Optional sharding: store data in one SQLite file per year or per site
+# under SHARD_DIRECTORY instead of DATABASE_PATH (see database.sharding).
+# None keeps the single database; set SITELINK_SHARD_BY to 'year' or 'site'
+SHARD_BY = os.environ.get("SITELINK_SHARD_BY") or None
+SHARD_DIRECTORY = Path.cwd() / "shards"
+SHARD_WORKERS = 4  # shards queried or written at once
+
 # Sage mapping configuration
 SAGE_MAPPING_FILE = "sage_gls_mapping.json"
 SAGE_MAPPING_PATH = Path.cwd() / SAGE_MAPPING_FILE
@@ -30,6 +48,39 @@ NUMERIC_COLUMNS = [
     'CreditTotal', 'TotalCost', 'iCount', 'dcPercent', 'Chg_dDisabled', 'Chg_dDeleted'
 ]
 
+# Parsed-report cache used by read_excel_file (Parquet; needs pyarrow or fastparquet)
+IMPORT_CACHE_DIR = Path.cwd() / ".import_cache"
+IMPORT_CACHE_MAX_FILES = 50  # 0 disables the cache
+
+# Summary and Sage export results cached in memory (see database.query_cache);
+# 0 disables. Set SITELINK_QUERY_CACHE_DIR to spill evicted results to disk
+QUERY_CACHE_SIZE = 64
+QUERY_CACHE_DIR = os.environ.get("SITELINK_QUERY_CACHE_DIR") or None
+QUERY_CACHE_MAX_FILES = 200
+
+# Closed periods moved out of the database by cli.py archive (see database.archive)
+ARCHIVE_DIR = Path.cwd() / "archive"
+ARCHIVE_COMPRESSION = "zstd"
+
+# Import validation (see data.validation): allowed rounding difference between
+# a total and its parts, and sample row numbers kept per rule
+VALIDATION_TOLERANCE = 0.015
+VALIDATION_SAMPLE_ROWS = 5
+
+# Read-only local API served by cli.py serve (see api.server). Use host
+# 0.0.0.0 to reach it from other machines on the network
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+API_WORKERS = 8  # queries answered at once, one read-only connection each
+API_STREAM_BATCH = 1000  # rows written to the client per batch
+API_PAGE_LIMIT = 1000  # largest limit= accepted by /rows and /search
+
+# Low-cardinality text columns read as pandas categoricals
+CATEGORICAL_COLUMNS = ['SiteID', 'sChgCategory', 'sAcctCode']
+
+# Rows per batch when streaming large Excel imports into the database
+IMPORT_CHUNK_SIZE = 5000
+
 # Default Sage GLS mapping
 DEFAULT_SAGE_MAPPING = {
     "account_mappings": {
@@ -48,7 +99,9 @@ DEFAULT_SAGE_MAPPING = {
         "Late Fee": "4010",
         "Admin Fee": "4020",
         "Insurance": "4030"
-    }
+    },
+    # Ordered rules tried before category_mappings; see data/sage_mapping.py
+    "mapping_rules": []
 }
 
 # GUI Settings
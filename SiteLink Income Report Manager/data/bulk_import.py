@@ -0,0 +1,326 @@
+"""
+Parallel bulk import of folders of monthly SiteLink reports
+
+Run from the application directory:
+    python -m data.bulk_import "C:/Reports/Facility 12"
+    python -m data.bulk_import "reports/*2023*.xlsx" --workers 4
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from config.settings import IMPORT_CHUNK_SIZE
+from data.excel_stream import iter_excel_chunks
+from data.import_cache import combined_fingerprint, file_fingerprint, import_source
+
+EXCEL_SUFFIXES = ('.xlsx', '.xls')
+
+MONTH_NAMES = {
+    name: f"{number:02d}"
+    for number, names in enumerate([
+        ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'),
+        ('may',), ('june', 'jun'), ('july', 'jul'), ('august', 'aug'),
+        ('september', 'sept', 'sep'), ('october', 'oct'), ('november', 'nov'), ('december', 'dec'),
+    ], start=1)
+    for name in names
+}
+
+_MONTH_NAME = '(' + '|'.join(sorted(MONTH_NAMES, key=len, reverse=True)) + ')'
+
+# Explicit numeric periods are tried before month names. Digits must not
+# run on into other digits, and a month name must be a whole word, so
+# "Augusta" or "Decatur" in a facility name never reads as a month.
+_YEAR_MONTH_PATTERN = re.compile(r'(?<!\d)((?:19|20)\d{2})[-_. ]?(0[1-9]|1[0-2])(?!\d)')
+_MONTH_YEAR_PATTERN = re.compile(r'(?<!\d)(0[1-9]|1[0-2]|[1-9](?=[-_.]))[-_.]?((?:19|20)\d{2})(?!\d)')
+_NAMED_MONTH_PATTERNS = [
+    re.compile(r'(?<![a-z])' + _MONTH_NAME + r'(?![a-z])[\W_]*((?:19|20)\d{2})(?!\d)', re.I),
+    re.compile(r'(?<!\d)((?:19|20)\d{2})[\W_]*' + _MONTH_NAME + r'(?![a-z])', re.I),
+]
+
+
+def period_from_text(text):
+    """Return (month, year) named in text, or None"""
+    if not text:
+        return None
+    match = _YEAR_MONTH_PATTERN.search(text)
+    if match:
+        return match.group(2), int(match.group(1))
+    match = _MONTH_YEAR_PATTERN.search(text)
+    if match:
+        return f"{int(match.group(1)):02d}", int(match.group(2))
+    for pattern in _NAMED_MONTH_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            first, second = match.groups()
+            month, year = (first, second) if not first.isdigit() else (second, first)
+            return MONTH_NAMES[month.lower()], int(year)
+    return None
+
+
+def _workbook_metadata(file_path):
+    """Return document properties and sheet names of an .xlsx workbook"""
+    if Path(file_path).suffix.lower() != '.xlsx':
+        return []
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        properties = workbook.properties
+        return [properties.title, properties.subject, properties.description,
+                properties.keywords] + workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def infer_period(file_path):
+    """
+    Work out which month a report covers.
+
+    The file name is tried first (e.g. "2023-04", "04-2023", "202304",
+    "042023", "April 2023", "Apr_2023"), then the workbook's title, subject, description and
+    keywords, then its sheet names. Returns (month, year) or None.
+    """
+    period = period_from_text(Path(file_path).stem)
+    if period:
+        return period
+    for text in _workbook_metadata(file_path):
+        period = period_from_text(text)
+        if period:
+            return period
+    return None
+
+
+def find_report_files(source):
+    """Expand a directory or glob pattern into a sorted list of workbooks"""
+    if os.path.isdir(source):
+        paths = [p for p in Path(source).iterdir() if p.is_file()]
+    else:
+        paths = [Path(p) for p in glob.glob(source, recursive=True)]
+    # Skip Excel's "~$" lock files left next to open workbooks
+    return sorted(
+        p for p in paths
+        if p.suffix.lower() in EXCEL_SUFFIXES and not p.name.startswith('~$')
+    )
+
+
+def parse_workbook(file_path, chunk_size=IMPORT_CHUNK_SIZE):
+    """Parse one workbook into normalized row chunks (runs in a worker process)"""
+    return list(iter_excel_chunks(file_path, chunk_size))
+
+
+class BulkImporter:
+    """
+    Import many monthly reports at once.
+
+    Workbooks are parsed in parallel by a process pool while the calling
+    thread is the only database writer. Each period is committed as soon
+    as its files are parsed. Files that share a month are merged into one
+    import, because importing a month replaces whatever that month held.
+    Only a bounded number of parsed workbooks wait in memory at once.
+    Periods whose files are byte-for-byte what import_ledger says they hold
+    are skipped before parsing unless force is set. Each period is
+    validated and reconciled as in import_workbook; with strict, a period
+    with violations is rolled back and its files reported as failed.
+    """
+
+    def __init__(self, db_manager, workers=None, chunk_size=IMPORT_CHUNK_SIZE, force=False, strict=False):
+        self.db_manager = db_manager
+        self.workers = workers or max(1, min(os.cpu_count() or 1, 8))
+        self.chunk_size = chunk_size
+        self.force = force
+        self.strict = strict
+
+    def plan(self, files):
+        """Group files by inferred period; return (periods, unmatched files)"""
+        periods, unmatched = {}, []
+        for path in files:
+            period = infer_period(path)
+            if period is None:
+                unmatched.append(path)
+            else:
+                periods.setdefault(period, []).append(path)
+        return periods, unmatched
+
+    def _period_source(self, paths):
+        """Fingerprint one period's files as a single import_ledger source"""
+        fingerprints = [file_fingerprint(path) for path in paths]
+        if len(paths) == 1:
+            return dict(fingerprints[0], source_path=str(paths[0]))
+        return dict(combined_fingerprint(fingerprints), source_path="; ".join(str(path) for path in paths))
+
+    def _drop_unchanged(self, periods, results):
+        """Remove periods already imported from exactly these files"""
+        sources = {}
+        for period, paths in list(periods.items()):
+            source = self._period_source(paths)
+            if not self.force and self.db_manager.unchanged_import(
+                    period[0], period[1], source['file_hash'], source['file_size']) is not None:
+                del periods[period]
+                results['unchanged_files'].extend(str(path) for path in paths)
+                results['unchanged_periods'] += 1
+            else:
+                sources[period] = source
+        return sources
+
+    def run(self, source, progress=None):
+        """
+        Import every workbook found at source (a directory or glob).
+
+        progress, if given, is called as progress(phase, rows_read=...,
+        rows_written=...) after each file is parsed and each period is
+        written; an exception it raises stops the import, keeping periods
+        already committed. Returns a dict of per-period results, unchanged,
+        skipped and failed files, totals and rows/sec and files/sec throughput.
+        """
+        started = time.perf_counter()
+        files = find_report_files(source)
+        if progress:
+            progress('planning')
+        periods, unmatched = self.plan(files)
+
+        results = {
+            'files': len(files),
+            'imported_files': 0,
+            'periods': [],
+            'skipped': [(str(path), "Could not infer month/year") for path in unmatched],
+            'failed': [],
+            'unchanged_files': [],
+            'unchanged_periods': 0,
+            'rows': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0,
+            'violations': 0,
+        }
+        # Hashing is far cheaper than parsing, so settle unchanged periods first
+        sources = self._drop_unchanged(periods, results)
+        remaining = {period: len(paths) for period, paths in periods.items()}
+        parsed = {period: [] for period in periods}
+        failed_periods = set()
+        queue = [(period, path) for period, paths in sorted(periods.items(),
+                 key=lambda item: (item[0][1], item[0][0])) for path in paths]
+        rows_read = 0
+
+        # spawn rather than fork: the GUI calls this from a worker thread
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            pending = {}
+            try:
+                while queue or pending:
+                    while queue and len(pending) < self.workers * 2:
+                        period, path = queue.pop(0)
+                        future = pool.submit(parse_workbook, str(path), self.chunk_size)
+                        pending[future] = (period, path)
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        period, path = pending.pop(future)
+                        remaining[period] -= 1
+                        try:
+                            chunks = future.result()
+                        except Exception as e:
+                            results['failed'].append((str(path), str(e)))
+                            failed_periods.add(period)
+                            chunks = []
+                        rows_read += sum(len(chunk) for chunk in chunks)
+                        parsed[period].append((path, chunks))
+                        if progress:
+                            progress('parsing', rows_read=rows_read)
+
+                        if not remaining[period]:
+                            self._write_period(period, parsed.pop(period), sources[period],
+                                               period in failed_periods, results, progress)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        elapsed = time.perf_counter() - started
+        results['seconds'] = elapsed
+        results['rows_per_sec'] = results['rows'] / elapsed if elapsed else 0.0
+        results['files_per_sec'] = results['imported_files'] / elapsed if elapsed else 0.0
+        return results
+
+    def _write_period(self, period, parsed, source, has_failures, results, progress):
+        """Commit one period's parsed files in a single import"""
+        report_month, report_year = period
+        paths = [str(path) for path, _ in parsed]
+        if has_failures:
+            # A partial month would delete the rows of the file that failed
+            failed = {path for path, _ in results['failed']}
+            results['skipped'].extend(
+                (path, f"Another {report_month}/{report_year} file failed")
+                for path in paths if path not in failed
+            )
+            return
+
+        from data.validation import ImportValidator, ValidationError, reconcile_import
+        validator = ImportValidator(strict=self.strict)
+        chunks = validator.wrap(chunk for _, file_chunks in parsed for chunk in file_chunks)
+        if len(paths) == 1:
+            source = import_source(paths[0], source)
+        try:
+            stats = self.db_manager.store_rows(report_month, report_year, chunks, progress=progress,
+                                               source=source)
+        except Exception as e:
+            if self.strict and validator.counts:
+                e = ValidationError(validator.report())
+            results['failed'].extend((path, str(e)) for path in paths)
+            return
+        stats['validation'] = validator.report()
+        stats['reconciliation'] = reconcile_import(self.db_manager, report_month, report_year,
+                                                   stats['validation'])
+        results['violations'] += sum(v['count'] for v in stats['validation']['violations'].values())
+
+        results['periods'].append(dict(stats, month=report_month, year=report_year, files=paths))
+        results['imported_files'] += len(paths)
+        for key in ('rows', 'inserted', 'updated', 'deleted', 'unchanged'):
+            results[key] += stats[key]
+        if progress:
+            progress('writing', rows_written=results['inserted'] + results['updated'] + results['deleted'])
+
+
+def format_results(results):
+    """Render bulk import results as a short text report"""
+    lines = [
+        f"Imported {results['imported_files']} of {results['files']} file(s) "
+        f"covering {len(results['periods'])} period(s)"
+        + (f"; {results['unchanged_periods']} unchanged period(s) skipped" if results['unchanged_periods'] else ""),
+        f"Rows: {results['rows']:,}  Inserted: {results['inserted']:,}  Updated: {results['updated']:,}  "
+        f"Deleted: {results['deleted']:,}  Unchanged: {results['unchanged']:,}",
+        f"Throughput: {results['rows_per_sec']:,.0f} rows/sec, {results['files_per_sec']:.2f} files/sec "
+        f"({results['seconds']:.1f}s)",
+    ]
+    from data.validation import format_validation
+    for period in results['periods']:
+        if period['validation']['violations'] or not period['reconciliation']['ok']:
+            lines.append(f"Validation of {period['month']}/{period['year']}:")
+            lines.extend("  " + line for line in format_validation(
+                period['validation'], period['reconciliation']).splitlines())
+    for path in results['unchanged_files']:
+        lines.append(f"Unchanged since last import: {path}")
+    for path, reason in results['skipped']:
+        lines.append(f"Skipped {path}: {reason}")
+    for path, reason in results['failed']:
+        lines.append(f"Failed {path}: {reason}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Entry point for command-line bulk imports"""
+    parser = argparse.ArgumentParser(description="Import a folder of monthly SiteLink reports")
+    parser.add_argument("source", help="directory or glob pattern of .xlsx/.xls reports")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count, max 8)")
+    parser.add_argument("--force", action="store_true", help="re-import months even if their files are unchanged")
+    parser.add_argument("--strict", action="store_true", help="reject months whose rows fail validation")
+    args = parser.parse_args(argv)
+
+    from database.sharding import open_database
+    results = BulkImporter(open_database(), workers=args.workers, force=args.force, strict=args.strict).run(args.source)
+    print(format_results(results))
+    return 1 if results['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Chunked Excel reading for large SiteLink exports
+"""
+import math
+from pathlib import Path
+from config.settings import EXPECTED_COLUMNS, NUMERIC_COLUMNS, IMPORT_CHUNK_SIZE
+
+INTEGER_COLUMNS = {'iCount', 'Chg_dDisabled', 'Chg_dDeleted'}
+
+
+def _to_number(value, integer):
+    """Coerce a cell to float/int, returning None for blanks and junk"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().replace(',', '')
+        if not value:
+            return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value):
+        return None
+    return int(value) if integer and value.is_integer() else value
+
+
+def _to_text(value):
+    """Coerce a cell to text the way SQLite TEXT affinity would store it"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _row_converters(header):
+    """Build (source index, converter) pairs for EXPECTED_COLUMNS"""
+    positions = {}
+    for index, name in enumerate(header):
+        if name is not None:
+            positions.setdefault(str(name).strip(), index)
+
+    converters = []
+    for column in EXPECTED_COLUMNS:
+        index = positions.get(column)
+        if column in NUMERIC_COLUMNS:
+            integer = column in INTEGER_COLUMNS
+            converters.append((index, lambda v, i=integer: _to_number(v, i)))
+        else:
+            converters.append((index, _to_text))
+    return converters
+
+
+def _iter_raw_rows(file_path):
+    """Yield the header row and then each data row as a tuple of cell values"""
+    if Path(file_path).suffix.lower() == '.xls':
+        # openpyxl cannot read legacy .xls; fall back to pandas (not streamed)
+        import pandas as pd
+        df = pd.read_excel(file_path, dtype=object)
+        yield tuple(df.columns)
+        for row in df.itertuples(index=False, name=None):
+            yield tuple(None if isinstance(v, float) and math.isnan(v) else v for v in row)
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_sheet_header(file_path):
+    """Return a workbook's sheet names and the header row of its first sheet"""
+    if Path(file_path).suffix.lower() == '.xls':
+        import pandas as pd
+        with pd.ExcelFile(file_path) as workbook:
+            names = list(workbook.sheet_names)
+            return names, tuple(workbook.parse(names[0], nrows=0).columns)
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        return list(workbook.sheetnames), tuple(header)
+    finally:
+        workbook.close()
+
+
+def iter_excel_chunks(file_path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Stream a SiteLink workbook as lists of normalized row tuples.
+
+    Each tuple follows EXPECTED_COLUMNS order with numeric columns coerced;
+    columns absent from the sheet are filled with 0 as read_excel_file does.
+    Only one chunk is held in memory at a time.
+    """
+    rows = _iter_raw_rows(file_path)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    converters = _row_converters(header)
+    chunk = []
+    for raw in rows:
+        if raw is None or all(v is None for v in raw):
+            continue
+        width = len(raw)
+        chunk.append(tuple(
+            (convert(raw[index]) if index < width else None) if index is not None else 0
+            for index, convert in converters
+        ))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
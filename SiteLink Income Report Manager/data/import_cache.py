@@ -0,0 +1,150 @@
+"""
+File fingerprints and parsed-frame sidecars for skipping repeat imports
+"""
+import hashlib
+import importlib.util
+from pathlib import Path
+from config.settings import IMPORT_CACHE_DIR, IMPORT_CACHE_MAX_FILES, IMPORT_CHUNK_SIZE
+
+# Parquet sidecars need pyarrow or fastparquet; without either they are skipped
+PARQUET_AVAILABLE = any(importlib.util.find_spec(name) for name in ('pyarrow', 'fastparquet'))
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_fingerprint(file_path):
+    """Return {'file_hash', 'file_size'} for a file's exact contents"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+            size += len(block)
+    return {'file_hash': digest.hexdigest(), 'file_size': size}
+
+
+def combined_fingerprint(fingerprints):
+    """Fingerprint a set of files imported together as one period"""
+    digest = hashlib.sha256()
+    for fingerprint in sorted(fingerprints, key=lambda fp: fp['file_hash']):
+        digest.update(fingerprint['file_hash'].encode())
+    return {'file_hash': digest.hexdigest(), 'file_size': sum(fp['file_size'] for fp in fingerprints)}
+
+
+def sheet_signature(file_path):
+    """Short hash of a workbook's sheet names and first-sheet header row"""
+    from data.excel_stream import read_sheet_header
+    names, header = read_sheet_header(file_path)
+    text = "|".join(names) + "\n" + "|".join("" if v is None else str(v) for v in header)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def import_source(file_path, fingerprint=None):
+    """Describe a workbook for the import ledger"""
+    source = dict(fingerprint or file_fingerprint(file_path))
+    source['sheet_signature'] = sheet_signature(file_path)
+    source['source_path'] = str(file_path)
+    return source
+
+
+def _report_rows_read(chunks, progress):
+    """Pass chunks through, reporting the running row count"""
+    rows_read = 0
+    for chunk in chunks:
+        rows_read += len(chunk)
+        progress('reading', rows_read=rows_read)
+        yield chunk
+
+
+def import_workbook(db_manager, file_path, report_month, report_year, chunk_size=IMPORT_CHUNK_SIZE,
+                    progress=None, force=False, strict=False):
+    """
+    Stream a workbook into the database unless it is already there.
+
+    The file is hashed first; if import_ledger shows the period still holds
+    exactly this file, nothing is parsed and the returned counts have
+    skipped=True. force re-imports regardless. See
+    DatabaseManager.store_rows for progress and the returned counts.
+
+    Imported rows are checked by data.validation.ImportValidator on the way
+    in and the stored monthly totals reconciled against them afterwards;
+    the counts gain 'validation' and 'reconciliation' reports. With strict,
+    any violation rolls the import back and raises ValidationError.
+    """
+    from data.excel_stream import iter_excel_chunks
+    from data.validation import ImportValidator, ValidationError, reconcile_import
+    fingerprint = file_fingerprint(file_path)
+    if not force:
+        stats = db_manager.unchanged_import(report_month, report_year, **fingerprint)
+        if stats is not None:
+            if progress:
+                progress('unchanged', rows_read=stats['rows'])
+            return stats
+
+    validator = ImportValidator(strict=strict)
+    chunks = validator.wrap(iter_excel_chunks(file_path, chunk_size))
+    if progress:
+        chunks = _report_rows_read(chunks, progress)
+    try:
+        stats = db_manager.store_rows(report_month, report_year, chunks, progress=progress,
+                                      source=import_source(file_path, fingerprint))
+    except Exception:
+        if strict and validator.counts:
+            raise ValidationError(validator.report()) from None
+        raise
+    stats['validation'] = validator.report()
+    stats['reconciliation'] = reconcile_import(db_manager, report_month, report_year, stats['validation'])
+    return stats
+
+
+class FrameSidecar:
+    """
+    Parquet copies of parsed report frames, keyed by file hash.
+
+    read_excel_file stores its normalized frame here after parsing, so
+    reading the same workbook again loads a compact columnar file instead
+    of re-parsing Excel. Only the newest IMPORT_CACHE_MAX_FILES are kept.
+    Disabled when no Parquet engine is installed.
+    """
+
+    def __init__(self, directory=IMPORT_CACHE_DIR, max_files=IMPORT_CACHE_MAX_FILES):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    @property
+    def enabled(self):
+        return PARQUET_AVAILABLE and self.max_files > 0
+
+    def _path(self, file_hash):
+        return self.directory / f"{file_hash}.parquet"
+
+    def load(self, file_hash):
+        """Return the cached frame for a file hash, or None"""
+        if not self.enabled:
+            return None
+        path = self._path(file_hash)
+        if not path.exists():
+            return None
+        import pandas as pd
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            # A truncated or incompatible sidecar is just a cache miss
+            path.unlink(missing_ok=True)
+            return None
+        path.touch()
+        return df
+
+    def save(self, file_hash, df):
+        """Store a parsed frame, evicting the least recently used sidecars"""
+        if not self.enabled:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(file_hash)
+        partial = path.with_suffix('.tmp')
+        df.to_parquet(partial, index=False)
+        partial.replace(path)
+
+        sidecars = sorted(self.directory.glob('*.parquet'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in sidecars[self.max_files:]:
+            stale.unlink(missing_ok=True)
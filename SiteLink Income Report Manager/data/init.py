@@ -2,3 +2,9 @@
 Data processing package for SiteLink Financial Manager
 """
 from .sitelink_processor import SiteLinkProcessor
+from .excel_stream import iter_excel_chunks
+from .sage_journal import build_sage_journal
+from .sage_mapping import SageMappingEngine
+from .bulk_import import BulkImporter, infer_period
+from .import_cache import FrameSidecar, file_fingerprint, import_workbook
+from .validation import ImportValidator, ValidationError, reconcile_import, validate_frame
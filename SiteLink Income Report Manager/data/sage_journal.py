@@ -0,0 +1,51 @@
+"""
+Vectorized Sage GLS journal construction
+"""
+import numpy as np
+import pandas as pd
+
+JOURNAL_COLUMNS = ['Account', 'Description', 'Debit', 'Credit', 'Reference']
+
+
+def build_sage_journal(df, category_mappings=None, reference=None, site_column=None,
+                       accounts=None):
+    """
+    Turn grouped Sage export rows into debit/credit journal lines.
+
+    df needs sChgCategory, sAcctCode, debit_amount and credit_amount. The
+    account comes from accounts (one per row, e.g. from
+    SageMappingEngine.resolve_frame) or else from category_mappings,
+    falling back to sAcctCode. Each
+    input row yields its debit line then its credit line, skipping zero
+    legs. reference labels every line; when omitted it is built per row
+    from report_month/report_year. site_column, if given, is carried
+    through as a leading Site column.
+    """
+    if reference is None:
+        reference = df['report_month'].astype(str) + '-' + df['report_year'].astype(str)
+
+    # Interleave the legs as [debit_0, credit_0, debit_1, credit_1, ...] so the
+    # output keeps each row's debit line ahead of its credit line
+    amounts = np.column_stack([
+        df['debit_amount'].to_numpy(dtype=float), df['credit_amount'].to_numpy(dtype=float)
+    ]).ravel()
+    is_debit = np.tile([True, False], len(df))
+    keep = amounts != 0
+    rows = np.repeat(np.arange(len(df)), 2)[keep]
+    amounts = np.abs(amounts[keep])
+    is_debit = is_debit[keep]
+
+    if accounts is None:
+        accounts = df['sChgCategory'].map(category_mappings or {}).fillna(df['sAcctCode'])
+    accounts = np.asarray(accounts, dtype=object)
+    journal = {}
+    if site_column:
+        journal['Site'] = df[site_column].to_numpy()[rows]
+    journal['Account'] = accounts[rows]
+    journal['Description'] = df['sChgCategory'].to_numpy()[rows]
+    journal['Debit'] = np.where(is_debit, amounts, 0.0)
+    journal['Credit'] = np.where(is_debit, 0.0, amounts)
+    journal['Reference'] = (
+        reference.to_numpy()[rows] if isinstance(reference, pd.Series) else reference
+    )
+    return pd.DataFrame(journal, columns=(['Site'] if site_column else []) + JOURNAL_COLUMNS)
@@ -0,0 +1,124 @@
+"""
+Compiled Sage GLS account mapping with hot reload
+"""
+import json
+import re
+import threading
+import pandas as pd
+from pathlib import Path
+from config.settings import SAGE_MAPPING_PATH
+
+RULE_FIELDS = ('category', 'account_code', 'site')
+MATCH_TYPES = ('exact', 'prefix', 'regex')
+
+
+def _compile_condition(match, pattern):
+    """Return a predicate for one field condition of a mapping rule"""
+    pattern = str(pattern)
+    if match == 'exact':
+        return lambda value: value == pattern
+    if match == 'prefix':
+        return lambda value: value is not None and value.startswith(pattern)
+    regex = re.compile(pattern)
+    return lambda value: value is not None and regex.search(value) is not None
+
+
+def compile_rules(rules):
+    """
+    Compile mapping_rules entries into (conditions, account) pairs.
+
+    Each rule names a sage_account plus one or more category, account_code
+    and site patterns, all of which must match. match is exact (default), prefix
+    or regex and applies to every pattern in the rule.
+    """
+    compiled = []
+    for position, rule in enumerate(rules, start=1):
+        match = rule.get('match', 'exact')
+        if match not in MATCH_TYPES:
+            raise ValueError(f"Mapping rule {position}: unknown match type '{match}'")
+        if 'sage_account' not in rule:
+            raise ValueError(f"Mapping rule {position}: missing 'sage_account'")
+        conditions = [
+            (RULE_FIELDS.index(field), _compile_condition(match, rule[field]))
+            for field in RULE_FIELDS if field in rule
+        ]
+        if not conditions:
+            raise ValueError(f"Mapping rule {position}: needs a category, account_code or site pattern")
+        compiled.append((conditions, str(rule['sage_account'])))
+    return compiled
+
+
+class SageMappingEngine:
+    """
+    Resolve (category, account code, site) to a Sage account.
+
+    The mapping file is parsed once and re-read only when its modification
+    time or size changes. Ordered mapping_rules are tried first, then the
+    exact category_mappings, then the SiteLink account code itself. Each
+    distinct key is resolved once and memoized until the next reload.
+    """
+
+    def __init__(self, path=SAGE_MAPPING_PATH):
+        self.path = Path(path)
+        self._signature = None
+        self._category_mappings = {}
+        self._rules = []
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the mapping file if it changed since the last load"""
+        stat = self.path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            with open(self.path, 'r') as f:
+                mapping = json.load(f)
+            self._rules = compile_rules(mapping.get('mapping_rules', []))
+            self._category_mappings = {
+                str(k): str(v) for k, v in mapping.get('category_mappings', {}).items()
+            }
+            self._resolved = {}
+            self._signature = signature
+        return True
+
+    @property
+    def signature(self):
+        """(mtime_ns, size) of the mapping file as loaded, reloading it first if it changed"""
+        self.refresh()
+        return self._signature
+
+    def resolve(self, category, account, site=None):
+        """Return the Sage account for one key, memoized"""
+        key = (category, account, site)
+        resolved = self._resolved.get(key)
+        if resolved is None and key not in self._resolved:
+            resolved = self._resolved[key] = self._lookup(key)
+        return resolved
+
+    def _lookup(self, key):
+        for conditions, sage_account in self._rules:
+            if all(test(key[index]) for index, test in conditions):
+                return sage_account
+        return self._category_mappings.get(key[0], key[1])
+
+    def resolve_frame(self, df, site_column=None):
+        """
+        Resolve accounts for every row of a Sage export frame.
+
+        Only distinct (sChgCategory, sAcctCode, site) combinations are
+        looked up; the results are broadcast back to all rows.
+        """
+        self.refresh()
+        columns = ['sChgCategory', 'sAcctCode'] + ([site_column] if site_column else [])
+        keys = df[columns].astype(object).where(df[columns].notna(), None)
+        # Both number distinct keys in order of first appearance
+        uniques = keys.drop_duplicates().itertuples(index=False, name=None)
+        codes = keys.groupby(columns, dropna=False, sort=False).ngroup().to_numpy()
+        accounts = [
+            self.resolve(category, account, site[0] if site else None)
+            for category, account, *site in uniques
+        ]
+        return pd.Series(pd.array(accounts, dtype=object)[codes], index=df.index, dtype=object)
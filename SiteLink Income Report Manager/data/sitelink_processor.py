@@ -1,16 +1,60 @@
 """
 SiteLink data processing and management
 """
+import importlib.util
 import pandas as pd
 import json
 from datetime import datetime
-from config.settings import SAGE_MAPPING_PATH, DEFAULT_SAGE_MAPPING
-from database.db_manager import DatabaseManager
+from config.settings import (
+    SAGE_MAPPING_PATH, DEFAULT_SAGE_MAPPING, IMPORT_CHUNK_SIZE, EXPECTED_COLUMNS, NUMERIC_COLUMNS,
+    CATEGORICAL_COLUMNS
+)
+from database.sharding import open_database
+from data.import_cache import FrameSidecar, file_fingerprint, import_workbook, sheet_signature
+from data.sage_journal import build_sage_journal
+from data.sage_mapping import SageMappingEngine
+from data.bulk_import import BulkImporter
+from data.validation import ValidationError, reconcile_import, validate_frame
+from utils.instrumentation import instrumented
 
+# calamine (Rust) parses workbooks several times faster than openpyxl
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+def _read_report_frame(file_path):
+    """Read the EXPECTED_COLUMNS projection of a report with pinned dtypes"""
+    wanted = set(EXPECTED_COLUMNS)
+    dtypes = {col: 'float64' for col in NUMERIC_COLUMNS}
+    dtypes.update({col: 'category' for col in CATEGORICAL_COLUMNS})
+    dtypes.update({col: object for col in EXPECTED_COLUMNS if col not in dtypes})
+    options = dict(usecols=lambda col: str(col).strip() in wanted, engine=EXCEL_ENGINE)
+    try:
+        df = pd.read_excel(file_path, dtype=dtypes, **options)
+    except ValueError:
+        # Text in a numeric column: read numerics untyped and coerce below
+        text_dtypes = {col: dtype for col, dtype in dtypes.items() if col not in NUMERIC_COLUMNS}
+        df = pd.read_excel(file_path, dtype=text_dtypes, **options)
+
+    df.columns = [str(col).strip() for col in df.columns]
+    loose = [col for col in NUMERIC_COLUMNS if col in df.columns and df[col].dtype != 'float64']
+    if loose:
+        # Junk becomes NaN, as in the streaming importer
+        df[loose] = df[loose].apply(pd.to_numeric, errors='coerce').astype('float64')
+    return df
+
+def _sheet_signature_or_none(file_path):
+    """Sheet signature of a source file that may since have been moved"""
+    try:
+        return sheet_signature(file_path)
+    except OSError:
+        return None
+
+@instrumented()
 class SiteLinkProcessor:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager or open_database()
         self.init_sage_mapping()
+        self.sage_mapping = SageMappingEngine(SAGE_MAPPING_PATH)
+        self.frame_cache = FrameSidecar()
     
     def init_sage_mapping(self):
         """Initialize Sage GLS mapping configuration"""
@@ -21,75 +65,177 @@ class SiteLinkProcessor:
     def read_excel_file(self, file_path, report_month, report_year):
         """
         Read and process the Excel file.
+
+        Only EXPECTED_COLUMNS are parsed, with pinned dtypes and the fastest
+        available engine; absent columns are added as 0 in one step. Parsed
+        frames are cached as Parquet sidecars keyed by file hash when a
+        Parquet engine is installed. The file's fingerprint rides along in
+        df.attrs so store_data can skip an unchanged re-import.
         """
         try:
-            df = pd.read_excel(file_path)
-            
-            df['report_month'] = report_month
-            df['report_year'] = report_year
-            df['upload_date'] = datetime.now().isoformat()
-            
-            db_columns = [
-                'SiteID', 'ChargeDescID', 'sChgCategory', 'sChgDesc', 'sDefAcctCode', 'sAcctCode',
-                'Price', 'Charge', 'Discount', 'ChargeTax1', 'ChargeTax2', 'ChargeTotal',
-                'Payment', 'PaymentTax1', 'PaymentTax2', 'PaymentTotal', 'Credit',
-                'CreditTax1', 'CreditTax2', 'CreditTotal', 'TotalCost', 'iCount',
-                'dcPercent', 'Chg_dDisabled', 'Chg_dDeleted'
-            ]
-            
-            for col in db_columns:
-                if col not in df.columns:
-                    df[col] = 0
-            
+            fingerprint = file_fingerprint(file_path)
+            df = self.frame_cache.load(fingerprint['file_hash'])
+            if df is None:
+                df = _read_report_frame(file_path).reindex(columns=EXPECTED_COLUMNS, fill_value=0)
+                self.frame_cache.save(fingerprint['file_hash'], df)
+            df.insert(0, 'upload_date', datetime.now().isoformat())
+            df.insert(0, 'report_year', report_year)
+            df.insert(0, 'report_month', report_month)
+            df.attrs['import_source'] = dict(fingerprint, source_path=str(file_path), rows=len(df))
             return df
-            
+
         except Exception as e:
             raise Exception(f"Error reading Excel file: {str(e)}")
     
-    def store_data(self, df):
-        """Store processed data using database manager"""
+    def import_excel_file(self, file_path, report_month, report_year, chunk_size=IMPORT_CHUNK_SIZE,
+                          progress=None, force=False, strict=False):
+        """
+        Stream an Excel file straight into the database.
+
+        Rows are read and normalized in bounded chunks, so peak memory does not
+        grow with the size of the workbook. progress, if given, is called as
+        progress(phase, rows_read=..., rows_written=...) after every chunk and
+        phase change. A file already imported for the period unchanged is
+        skipped unless force is set. Returns the import counts from
+        DatabaseManager.store_rows with the validation and reconciliation
+        reports of data.import_cache.import_workbook; strict rejects an
+        import with violations.
+        """
+        try:
+            return import_workbook(self.db_manager, file_path, report_month, report_year,
+                                   chunk_size, progress=progress, force=force, strict=strict)
+        except Exception as e:
+            raise Exception(f"Error importing Excel file: {str(e)}")
+
+    def bulk_import(self, source, workers=None, progress=None, force=False, strict=False):
+        """
+        Import a directory or glob of monthly reports in parallel.
+
+        Month and year are inferred per file; see data.bulk_import.BulkImporter.
+        """
+        try:
+            return BulkImporter(self.db_manager, workers=workers, force=force, strict=strict).run(source, progress=progress)
+        except Exception as e:
+            raise Exception(f"Error bulk importing reports: {str(e)}")
+
+    def store_data(self, df, force=False, strict=False):
+        """
+        Store processed data using database manager.
+
+        Frames from read_excel_file name their source file; if the period
+        already holds exactly that file, nothing is written (unless force).
+        Frames are validated before they are stored and reconciled after,
+        like streamed imports; strict raises ValidationError instead of
+        storing a frame with violations.
+        """
         try:
-            return self.db_manager.store_data(df)
+            source = df.attrs.get('import_source')
+            if source and source.get('rows') != len(df):
+                # Rows were added or dropped since reading: no longer the file
+                source = None
+            if source:
+                if not force:
+                    stats = self.db_manager.unchanged_import(
+                        df['report_month'].iloc[0], df['report_year'].iloc[0],
+                        source['file_hash'], source['file_size']
+                    )
+                    if stats is not None:
+                        return stats
+                source = dict(source, sheet_signature=_sheet_signature_or_none(source['source_path']))
+            validation = validate_frame(df)
+            if strict and validation['violations']:
+                raise ValidationError(validation)
+            stats = self.db_manager.store_data(df, source=source)
+            stats['validation'] = validation
+            stats['reconciliation'] = reconcile_import(
+                self.db_manager, df['report_month'].iloc[0], df['report_year'].iloc[0], stats['validation']
+            )
+            return stats
         except Exception as e:
             raise e
 
-    def get_all_data(self):
-        """Get all raw data for display"""
-        return self.db_manager.get_all_data()
+    def get_all_data(self, include_archived=False):
+        """Get all raw data for display (archived months only if asked)"""
+        return self.db_manager.get_all_data(include_archived)
+
+    def get_data_range(self, start=None, end=None, include_archived=False):
+        """Get raw rows for a 'YYYY-MM' month range"""
+        return self.db_manager.get_data_range(start, end, include_archived)
+
+    def get_data_page(self, filters=None, sort='id', descending=False, after=None, limit=100):
+        """Get one keyset-paginated page of raw data for browsing"""
+        return self.db_manager.get_data_page(filters, sort, descending, after, limit)
+
+    def search(self, text, site_ids=None, start=None, end=None, category=None, after=None, limit=50,
+               facets=True):
+        """Full-text search of stored rows; see DatabaseManager.search"""
+        return self.db_manager.search(text, site_ids, start, end, category, after, limit, facets)
 
-    def get_financial_summary(self, report_month=None, report_year=None):
-        """Get financial summary"""
-        return self.db_manager.get_financial_summary(report_month, report_year)
+    def count_data(self, filters=None):
+        """Count raw rows matching viewer filters"""
+        return self.db_manager.count_data(filters)
+
+    def get_financial_summary(self, report_month=None, report_year=None, start=None, end=None):
+        """Get financial summary, optionally for a 'YYYY-MM' start/end range"""
+        return self.db_manager.get_financial_summary(report_month, report_year, start, end)
+
+    def get_trend_report(self, start, end, by_category=False, measure='net_total', rolling_months=3):
+        """Get monthly totals with MoM/YoY changes and rolling totals for a month range"""
+        return self.db_manager.get_trend_report(start, end, by_category, measure, rolling_months)
 
     def prepare_sage_export(self, report_month, report_year):
-        """Prepare data for Sage GLS export"""
-        with open(SAGE_MAPPING_PATH, 'r') as f:
-            mapping = json.load(f)
-        
-        df = self.db_manager.get_sage_export_data(report_month, report_year)
-        
-        df['sage_account'] = df['sChgCategory'].map(
-            mapping.get('category_mappings', {})
-        ).fillna(df['sAcctCode'])
-        
-        sage_export = []
-        for _, row in df.iterrows():
-            if row['debit_amount'] != 0:
-                sage_export.append({
-                    'Account': row['sage_account'],
-                    'Description': row['sChgCategory'],
-                    'Debit': abs(row['debit_amount']),
-                    'Credit': 0,
-                    'Reference': f"{report_month}-{report_year}"
-                })
-            
-            if row['credit_amount'] != 0:
-                sage_export.append({
-                    'Account': row['sage_account'],
-                    'Description': row['sChgCategory'],
-                    'Debit': 0,
-                    'Credit': abs(row['credit_amount']),
-                    'Reference': f"{report_month}-{report_year}"
-                })
-        
-        return pd.DataFrame(sage_export)
+        """
+        Prepare data for Sage GLS export.
+
+        The journal is cached until the period's data or the mapping file
+        changes.
+        """
+        def compute():
+            df = self.db_manager.get_sage_export_data(report_month, report_year)
+            return build_sage_journal(
+                df, reference=f"{report_month}-{report_year}",
+                accounts=self.sage_mapping.resolve_frame(df)
+            )
+        return self.db_manager.cached_query(
+            'sage_journal', [report_month, report_year, self.sage_mapping.signature], compute,
+            periods=[(report_month, report_year)]
+        )
+
+    def export_excel_report(self, file_path, report_month=None, report_year=None, progress=None):
+        """
+        Write the raw rows, financial summary and Sage journal to one workbook.
+
+        Rows are streamed from the database into the workbook, so memory use
+        stays flat however many are exported. Without a month and year every
+        stored row is exported and the Sage journal sheet is left out.
+        Returns the rows written per sheet; see write_report for progress.
+        """
+        from utils.report_writer import ReportSheet, write_report
+        filters = {'report_month': report_month, 'report_year': report_year}
+        columns, rows = self.db_manager.iter_data_rows(filters)
+        sheets = [ReportSheet('Financial Data', columns, rows)]
+        sheets.append(ReportSheet('Summary', *self.db_manager.get_financial_summary_rows(report_month, report_year)))
+        if report_month and report_year:
+            sheets.append(ReportSheet.from_frame('Sage Journal', self.prepare_sage_export(report_month, report_year)))
+        return write_report(file_path, sheets, progress=progress)
+
+    def prepare_sage_export_batch(self, periods, site_ids=None, by_site=False):
+        """
+        Prepare one Sage GLS journal covering several periods and sites.
+
+        periods is an iterable of (report_month, report_year) pairs; each
+        line's Reference names its period. See
+        DatabaseManager.get_sage_export_batch for site_ids and by_site.
+        Site-specific mapping rules only apply when by_site is set.
+        """
+        periods = list(periods)
+        site_column = 'SiteID' if by_site else None
+
+        def compute():
+            df = self.db_manager.get_sage_export_batch(periods, site_ids, by_site)
+            return build_sage_journal(
+                df, site_column=site_column,
+                accounts=self.sage_mapping.resolve_frame(df, site_column)
+            )
+        params = [tuple(periods), tuple(site_ids or ()), by_site, self.sage_mapping.signature]
+        return self.db_manager.cached_query('sage_journal_batch', params, compute, periods=periods)
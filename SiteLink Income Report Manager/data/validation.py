@@ -0,0 +1,229 @@
+"""
+Vectorized validation and reconciliation of imported SiteLink rows
+
+Every rule is a column expression over a whole chunk, so checking an
+import adds one pass of array arithmetic per chunk rather than Python work
+per row. ImportValidator sits between the reader and the database: it
+passes chunks through unchanged while counting violations, keeping a few
+sample row numbers per rule, and totalling the money columns.
+reconcile_import then compares those totals with the month's
+monthly_summary row once the import is stored.
+"""
+import numpy as np
+import pandas as pd
+from config.settings import (
+    EXPECTED_COLUMNS, NUMERIC_COLUMNS, VALIDATION_SAMPLE_ROWS, VALIDATION_TOLERANCE
+)
+from database.db_manager import FLAG_COLUMNS
+
+# The row's part of the UNIQUE key (the period comes from the import); blanks are stored as ''
+ROW_KEY_COLUMNS = ['SiteID', 'ChargeDescID', 'sChgCategory', 'sChgDesc']
+
+# Imported totals compared with monthly_summary: (summary column, source column)
+RECONCILED_TOTALS = [
+    ('total_charges', 'ChargeTotal'),
+    ('total_payments', 'PaymentTotal'),
+    ('total_credits', 'CreditTotal'),
+    ('net_total', 'TotalCost'),
+]
+
+RULE_DESCRIPTIONS = {
+    'charge_total': "ChargeTotal differs from Charge - Discount + ChargeTax1 + ChargeTax2",
+    'payment_total': "PaymentTotal differs from Payment + PaymentTax1 + PaymentTax2",
+    'credit_total': "CreditTotal differs from Credit + CreditTax1 + CreditTax2",
+    'duplicate_key': "Repeats the site, charge ID, category and description of an earlier row",
+    'missing_key': "Blank SiteID or sChgCategory",
+    'invalid_flag': "Chg_dDisabled or Chg_dDeleted is not 0 or 1",
+    'negative_count': "iCount is negative",
+}
+# The readers turn text that is not a number into a blank, so these cannot tell the two apart
+for _column in NUMERIC_COLUMNS:
+    RULE_DESCRIPTIONS[f"blank:{_column}"] = f"{_column} is blank or could not be read as a number"
+
+
+class ValidationError(Exception):
+    """Raised by a strict ImportValidator when an import has violations"""
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__("Validation failed:\n" + format_validation(report))
+
+
+def _total_mismatch(numbers, total, parts, tolerance):
+    expected = numbers[parts[0]].to_numpy()
+    for column in parts[1:]:
+        sign = -1.0 if column.startswith('-') else 1.0
+        expected = expected + sign * numbers[column.lstrip('-')].to_numpy()
+    # NaN compares False, so rows with blanks are only reported as blank
+    return np.abs(numbers[total].to_numpy() - expected) > tolerance
+
+
+def evaluate_rules(text, numbers, tolerance=VALIDATION_TOLERANCE):
+    """
+    Evaluate every row rule over one chunk.
+
+    text holds the key columns, numbers the NUMERIC_COLUMNS as float64.
+    Returns {rule: boolean mask} for the rules (duplicate keys are checked
+    across chunks by ImportValidator).
+    """
+    masks = {
+        'charge_total': _total_mismatch(
+            numbers, 'ChargeTotal', ['Charge', '-Discount', 'ChargeTax1', 'ChargeTax2'], tolerance),
+        'payment_total': _total_mismatch(
+            numbers, 'PaymentTotal', ['Payment', 'PaymentTax1', 'PaymentTax2'], tolerance),
+        'credit_total': _total_mismatch(
+            numbers, 'CreditTotal', ['Credit', 'CreditTax1', 'CreditTax2'], tolerance),
+        'missing_key': (text[['SiteID', 'sChgCategory']] == '').to_numpy().any(axis=1),
+        'invalid_flag': (numbers[FLAG_COLUMNS].notna() & ~numbers[FLAG_COLUMNS].isin([0, 1])).to_numpy().any(axis=1),
+        'negative_count': (numbers['iCount'] < 0).to_numpy(),
+    }
+    blanks = numbers.isna().to_numpy()
+    for position, column in enumerate(numbers.columns):
+        masks[f"blank:{column}"] = blanks[:, position]
+    return masks
+
+
+def _numeric_column(values):
+    try:
+        # None becomes NaN; only text needs the slower coercion
+        return np.array(values, dtype='float64')
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+
+def _chunk_frames(chunk):
+    """Split a chunk (row tuples or a DataFrame, EXPECTED_COLUMNS order) into key text and numbers"""
+    if isinstance(chunk, pd.DataFrame):
+        frame = chunk.reindex(columns=EXPECTED_COLUMNS)
+        columns = {column: frame[column].to_numpy(dtype=object) for column in EXPECTED_COLUMNS}
+    else:
+        columns = dict(zip(EXPECTED_COLUMNS, zip(*chunk))) if chunk else {column: () for column in EXPECTED_COLUMNS}
+    text = pd.DataFrame({
+        column: pd.Series(columns[column], dtype=object).fillna('').astype(str) for column in ROW_KEY_COLUMNS
+    })
+    numbers = pd.DataFrame({column: _numeric_column(columns[column]) for column in NUMERIC_COLUMNS})
+    return text, numbers
+
+
+class ImportValidator:
+    """
+    Validates and totals an import as its chunks stream past.
+
+    Use wrap(chunks) around the chunks handed to store_rows, then read
+    report(). With strict=True the wrapped stream raises ValidationError
+    after its last chunk if anything was found, so store_rows rolls the
+    whole import back.
+    """
+
+    def __init__(self, tolerance=VALIDATION_TOLERANCE, sample_rows=VALIDATION_SAMPLE_ROWS, strict=False):
+        self.tolerance = tolerance
+        self.sample_rows = sample_rows
+        self.strict = strict
+        self.rows = 0
+        self.counts = {}
+        self.samples = {}
+        self.totals = {column: 0.0 for _, column in RECONCILED_TOTALS}
+        self._key_hashes = []
+        self._finished = False
+
+    def _record(self, rule, mask, offset):
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        self.counts[rule] = self.counts.get(rule, 0) + count
+        samples = self.samples.setdefault(rule, [])
+        if len(samples) < self.sample_rows:
+            # Row numbers are 1-based positions among the imported rows
+            found = np.flatnonzero(mask)[:self.sample_rows - len(samples)] + offset + 1
+            samples.extend(found.tolist())
+
+    def check(self, chunk):
+        """Validate one chunk; returns it (an iterator comes back as a list)"""
+        if not isinstance(chunk, (list, tuple, pd.DataFrame)):
+            chunk = list(chunk)
+        text, numbers = _chunk_frames(chunk)
+        offset = self.rows
+        for rule, mask in evaluate_rules(text, numbers, self.tolerance).items():
+            self._record(rule, mask, offset)
+        for _, column in RECONCILED_TOTALS:
+            self.totals[column] += float(np.nansum(numbers[column].to_numpy()))
+        self._key_hashes.append(pd.util.hash_pandas_object(text, index=False).to_numpy())
+        self.rows += len(text)
+        return chunk
+
+    def finish(self):
+        """Find keys repeated anywhere in the import (one sort over all key hashes)"""
+        if self._finished:
+            return
+        self._finished = True
+        if not self._key_hashes:
+            return
+        hashes = np.concatenate(self._key_hashes)
+        self._key_hashes = []
+        order = np.argsort(hashes, kind='stable')
+        repeats = np.zeros(len(hashes), dtype=bool)
+        repeats[order[1:]] = hashes[order[1:]] == hashes[order[:-1]]
+        self._record('duplicate_key', repeats, 0)
+        if self.strict and self.counts:
+            raise ValidationError(self.report())
+
+    def wrap(self, chunks):
+        """Pass chunks through, validating each; finish() runs after the last"""
+        for chunk in chunks:
+            yield self.check(chunk)
+        self.finish()
+
+    def report(self):
+        """
+        Return {'rows', 'violations', 'totals'}; violations maps each rule
+        that fired to {'count', 'rows' (sample row numbers), 'description'}.
+        """
+        violations = {
+            rule: {'count': count, 'rows': sorted(self.samples[rule]), 'description': RULE_DESCRIPTIONS[rule]}
+            for rule, count in sorted(self.counts.items())
+        }
+        return {'rows': self.rows, 'violations': violations, 'totals': dict(self.totals)}
+
+
+def validate_frame(df, tolerance=VALIDATION_TOLERANCE):
+    """Validate a whole DataFrame in EXPECTED_COLUMNS layout; return the report"""
+    validator = ImportValidator(tolerance)
+    validator.check(df)
+    validator.finish()
+    return validator.report()
+
+
+def reconcile_import(db_manager, report_month, report_year, report, tolerance=VALIDATION_TOLERANCE):
+    """
+    Compare an import's totals with the stored monthly_summary row.
+
+    Returns {'ok', 'differences'}, differences mapping each total that
+    disagrees (including record_count) to (imported, stored), e.g. when
+    another import has replaced the month's rows since.
+    """
+    stored = db_manager.get_monthly_totals(report_month, report_year) or {}
+    differences = {}
+    if report['rows'] != stored.get('record_count', 0):
+        differences['record_count'] = (report['rows'], stored.get('record_count', 0))
+    for summary_column, column in RECONCILED_TOTALS:
+        imported, saved = report['totals'][column], stored.get(summary_column) or 0.0
+        if abs(imported - saved) > tolerance:
+            differences[summary_column] = (round(imported, 2), round(saved, 2))
+    return {'ok': not differences, 'differences': differences}
+
+
+def format_validation(report, reconciliation=None):
+    """Render a validation report (and optional reconciliation) as short text"""
+    lines = []
+    for rule, violation in report['violations'].items():
+        more = " ..." if violation['count'] > len(violation['rows']) else ""
+        rows = ", ".join(str(row) for row in violation['rows'])
+        lines.append(f"{violation['count']:,} row(s): {violation['description']} (rows {rows}{more})")
+    if not lines:
+        lines.append(f"All {report['rows']:,} rows passed validation")
+    if reconciliation is not None:
+        if reconciliation['ok']:
+            lines.append("Stored monthly totals match the imported rows")
+        for name, (imported, stored) in reconciliation['differences'].items():
+            lines.append(f"Monthly {name} does not reconcile: imported {imported:,}, stored {stored:,}")
+    return "\n".join(lines)
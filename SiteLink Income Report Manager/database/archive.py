@@ -0,0 +1,165 @@
+"""
+Archiving closed periods to compressed Parquet files
+
+Raw rows of old months are rarely read but make every scan, backup and
+VACUUM of the database slower. archive_periods moves them out to one
+zstd-compressed Parquet file per month, laid out as
+
+    archive/report_year=2021/report_month=04/financial_data.parquet
+
+and deletes them from financial_facts. The month's category_summary and
+monthly_summary rows stay, so summaries, trends and Sage exports are
+unchanged. get_all_data and get_data_range read archived months back only
+when asked (include_archived=True), opening just the files they need.
+restore_period moves a month back into the database. With sharded storage
+each shard archives its own rows under a shard=KEY subdirectory.
+
+Needs pyarrow or fastparquet.
+"""
+import os
+from pathlib import Path
+from config.settings import ARCHIVE_COMPRESSION, ARCHIVE_DIR, EXPECTED_COLUMNS
+from data.import_cache import PARQUET_AVAILABLE
+from utils.helpers import parse_period, period_key
+
+ARCHIVE_FILE_NAME = "financial_data.parquet"
+
+_PERIOD_ROWS_QUERY = "SELECT * FROM financial_data WHERE report_year = ? AND report_month = ? ORDER BY id"
+
+
+def _require_parquet():
+    if not PARQUET_AVAILABLE:
+        raise Exception("Archiving needs pyarrow or fastparquet (pip install pyarrow)")
+
+
+def period_path(report_month, report_year, directory=ARCHIVE_DIR):
+    """Archive file of one month"""
+    return Path(directory) / f"report_year={int(report_year)}" / f"report_month={report_month}" / ARCHIVE_FILE_NAME
+
+
+def _databases(db_manager, directory):
+    """(DatabaseManager, archive directory) pairs: one per shard when sharded"""
+    from database.sharding import ShardedDatabaseManager
+    if isinstance(db_manager, ShardedDatabaseManager):
+        return [(shard, Path(directory) / f"shard={key}") for key, shard in db_manager.shards()]
+    return [(db_manager, Path(directory))]
+
+
+def closed_periods(db_manager, before):
+    """Stored months earlier than before ('YYYY-MM') that are not archived yet"""
+    cutoff = period_key(*parse_period(before))
+    rows = db_manager.connection().execute(
+        "SELECT report_month, report_year FROM monthly_summary ORDER BY report_year, report_month"
+    ).fetchall()
+    archived = {(period['report_month'], period['report_year']) for period in db_manager.archived_periods()}
+    return [(month, year) for month, year in rows
+            if period_key(month, year) < cutoff and (month, year) not in archived]
+
+
+def archive_period(db_manager, report_month, report_year, directory=ARCHIVE_DIR):
+    """
+    Move one month's raw rows to its Parquet file; return the row count.
+
+    The file is written and read back before anything is deleted, and the
+    rows are then dropped in one transaction with the archived_periods
+    record. A month with no raw rows is skipped (returns 0).
+    """
+    import pandas as pd
+    _require_parquet()
+    report_year = int(report_year)
+    df = pd.read_sql_query(_PERIOD_ROWS_QUERY, db_manager.connection(), params=[report_year, report_month])
+    if df.empty:
+        return 0
+
+    path = period_path(report_month, report_year, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.partial')
+    try:
+        df.to_parquet(partial, index=False, compression=ARCHIVE_COMPRESSION)
+        if len(pd.read_parquet(partial, columns=['id'])) != len(df):
+            raise Exception(f"Archive of {report_month}/{report_year} did not read back intact")
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    db_manager.drop_archived_rows(report_month, report_year, path, len(df), path.stat().st_size)
+    return len(df)
+
+
+def archive_periods(db_manager, before, directory=ARCHIVE_DIR, vacuum=False, progress=None):
+    """
+    Archive every stored month before 'YYYY-MM'.
+
+    With vacuum, the database file is compacted afterwards so the freed
+    pages go back to the file system. progress, if given, is called as
+    progress('archiving', rows_written=...) after each month. Returns
+    {'periods': months archived, 'rows': rows moved}.
+    """
+    _require_parquet()
+    archived = {'periods': 0, 'rows': 0}
+    for database, database_directory in _databases(db_manager, directory):
+        periods = 0
+        for report_month, report_year in closed_periods(database, before):
+            rows = archive_period(database, report_month, report_year, database_directory)
+            if rows:
+                periods += 1
+                archived['rows'] += rows
+            if progress:
+                progress('archiving', rows_written=archived['rows'])
+        if vacuum and periods:
+            database.connection().execute("VACUUM")
+        archived['periods'] += periods
+    return archived
+
+
+def read_archived_rows(periods, columns=None):
+    """
+    Read archived rows as one DataFrame in financial_data's layout.
+
+    periods is a list of archived_periods records (see
+    DatabaseManager.archived_periods); only their files are read.
+    """
+    import pandas as pd
+    _require_parquet()
+    frames = [pd.read_parquet(period['file_path'], columns=columns) for period in periods]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def restore_period(db_manager, report_month, report_year):
+    """
+    Move an archived month back into the database; return the row count.
+
+    Rows are re-imported through store_rows, which recomputes the month's
+    summary rows from them, and the archive file is deleted afterwards.
+    """
+    report_year = int(report_year)
+    archived = []
+    for database, _ in _databases(db_manager, ARCHIVE_DIR):
+        periods = [period for period in database.archived_periods()
+                   if (period['report_month'], period['report_year']) == (report_month, report_year)]
+        if periods:
+            archived.append((database, periods))
+    if not archived:
+        raise ValueError(f"{report_month}/{report_year} is not archived")
+    return sum(_restore(database, report_month, report_year, periods) for database, periods in archived)
+
+
+def _restore(db_manager, report_month, report_year, periods):
+    """Restore one database's archived month from its file"""
+    df = read_archived_rows(periods)
+    values = df[EXPECTED_COLUMNS].astype(object)
+    values = values.where(values.notna(), None)
+
+    with db_manager.transaction() as conn:
+        conn.execute(
+            "DELETE FROM archived_periods WHERE report_year = ? AND report_month = ?",
+            (report_year, report_month)
+        )
+        db_manager.store_rows(
+            report_month, report_year, [values.itertuples(index=False, name=None)],
+            upload_date=df['upload_date'].max()
+        )
+    Path(periods[0]['file_path']).unlink(missing_ok=True)
+    return len(df)
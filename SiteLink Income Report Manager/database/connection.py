@@ -0,0 +1,117 @@
+"""
+Pooled SQLite connections for SiteLink Financial Data
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from config.settings import SQLITE_BUSY_TIMEOUT, SQLITE_CACHED_STATEMENTS, SQLITE_PRAGMAS
+from utils.instrumentation import connection_factory
+
+
+class ConnectionPool:
+    """
+    Hands out one long-lived, tuned connection per thread for a database file.
+
+    Connections run in autocommit mode; writes go through transaction(),
+    which issues BEGIN IMMEDIATE and uses savepoints when nested. Statement
+    strings are reused verbatim so sqlite3's per-connection statement cache
+    skips re-preparing them.
+
+    A read_only pool opens the file with mode=ro and query_only set, so its
+    connections can never write. In WAL mode (set by the read-write side)
+    any number of them read concurrently with each other and with an
+    import in progress, each seeing the last committed state.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path, read_only=False):
+        self.db_path = str(db_path)
+        self.read_only = read_only
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Serializes write transactions between this process's threads so
+        # they queue here instead of spinning on SQLITE_BUSY
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, db_path, read_only=False):
+        """Return the shared pool for a database file"""
+        key = str(Path(db_path).resolve()) if str(db_path) != ":memory:" else ":memory:"
+        with cls._pools_lock:
+            pool = cls._pools.get((key, read_only))
+            if pool is None:
+                pool = cls._pools[key, read_only] = cls(db_path, read_only)
+            return pool
+
+    def _connect(self):
+        target = self.db_path
+        if self.read_only:
+            if not Path(target).exists():
+                raise FileNotFoundError(f"No database at {target}")
+            target = f"{Path(target).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            target,
+            timeout=SQLITE_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+            factory=connection_factory(),
+            uri=self.read_only,
+        )
+        for pragma, value in SQLITE_PRAGMAS.items():
+            # The journal mode is a property of the file, set by writers
+            if not (self.read_only and pragma == "journal_mode"):
+                conn.execute(f"PRAGMA {pragma} = {value}")
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block atomically; nested blocks become savepoints"""
+        conn = self.connection()
+        depth = self._local.depth
+        savepoint = f"sp_{depth}"
+        if not depth:
+            self._write_lock.acquire()
+        try:
+            conn.execute(f"SAVEPOINT {savepoint}" if depth else "BEGIN IMMEDIATE")
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                if depth:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                else:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}" if depth else "COMMIT")
+            finally:
+                self._local.depth = depth
+        finally:
+            if not depth:
+                self._write_lock.release()
+
+    def close_all(self):
+        """Close every connection opened by this pool"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -2,23 +2,148 @@
 Database management for SiteLink Financial Data
 """
 import sqlite3
-import pandas as pd
+import time
 from datetime import datetime
-from config.settings import DATABASE_PATH, EXPECTED_COLUMNS
+from config.settings import DATABASE_PATH, EXPECTED_COLUMNS, IMPORT_CHUNK_SIZE
+from database.connection import ConnectionPool
+from database.migrations import SCHEMA_MIGRATIONS, SCHEMA_VERSION
+from database.queries import (
+    ADD_DIMENSIONS_SQL, ALL_DATA_QUERY, ARCHIVED_PERIODS_QUERY, BUMP_GENERATION_SQL, CATEGORY_SUMMARY_COLUMNS,
+    CATEGORY_SUMMARY_GROUPING, CATEGORY_SUMMARY_SELECT, COUNT_NEW_ROWS_SQL, DATA_RANGE_QUERY,
+    DELETE_TOUCHED_SUMMARY_SQL, DELETE_VANISHED_ROWS_SQL, DIMENSIONS, FACT_GROUP_COLUMNS, FACT_KEY_COLUMNS,
+    FINANCIAL_DATA_COLUMNS, INSERT_TOUCHED_SUMMARY_SQL, KEY_COLUMNS, MEASURE_COLUMNS, MONTHLY_TOTALS_QUERY,
+    PAGE_FILTER_COLUMNS, PAGE_SORT_KEYS, RECORD_IMPORT_SQL, SAGE_EXPORT_BATCH_QUERY, SAGE_EXPORT_QUERY,
+    SEARCH_DOCUMENTS_QUERY, SEARCH_NEWEST_ROWS_QUERY, SEARCH_PERIOD_FACETS_QUERY, SEARCH_ROWS_QUERY,
+    SEARCH_SITE_FACETS_QUERY, STAGE_FACTS_SQL, STAGE_ROW_SQL, SUMMARY_MISMATCH_QUERY, SYNC_SEARCH_SQL,
+    TOUCH_GROUPS_SQL, UNCHANGED_IMPORT_QUERY, UPSERT_ROWS_SQL, _GROUP_COLUMNS, _STAGED_COLUMNS,
+    _financial_summary_query, _match_expression, _period_conditions, _period_range, _sage_export_batch_query,
+    _trend_query
+)
+from database.query_cache import QueryCache, cache_key
+from utils.helpers import period_key
+from utils.instrumentation import instrumented
 
+
+def _read_frame(query, conn, params=None):
+    """Run a query into a DataFrame; pandas is imported on first use"""
+    import pandas as pd
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def _decode_dimension(ids, lookup):
+    """Categorical of the text behind a column of lookup ids; NULL ids give NaN"""
+    import numpy as np
+    import pandas as pd
+    # codes_by_id[id] is the category code of that id. One spare slot at the
+    # end stays -1 (NaN), and NULL ids are pointed at it as index -1
+    codes_by_id = np.full(max((row[0] for row in lookup), default=0) + 2, -1, dtype=np.int32)
+    codes, categories = pd.factorize(np.array([row[1] for row in lookup], dtype=object))
+    if lookup:
+        codes_by_id[[row[0] for row in lookup]] = codes
+    positions = ids.fillna(-1).astype('int64').to_numpy()
+    return pd.Categorical.from_codes(codes_by_id[positions], categories=categories)
+
+
+def _batched_rows(cursor, batch_size):
+    """Yield a cursor's rows, fetching batch_size at a time"""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield from batch
+
+
+def _frame_import(df):
+    """Split a DataFrame for store_rows: (report_month, report_year, upload_date, chunks)"""
+    try:
+        report_month = df['report_month'].iloc[0]
+        report_year = int(df['report_year'].iloc[0])
+        upload_date = df['upload_date'].iloc[0] if 'upload_date' in df.columns else None
+    except Exception as e:
+        raise Exception(f"Error storing data: {str(e)}")
+
+    # Pad absent columns like read_excel_file does; object dtype turns
+    # numpy scalars into Python values sqlite3 can bind
+    values = df.reindex(columns=EXPECTED_COLUMNS, fill_value=0).astype(object)
+    values = values.where(values.notna(), None)
+    return report_month, report_year, upload_date, [values.itertuples(index=False, name=None)]
+
+
+# 0/1 columns returned as uint8 when they hold no NULLs
+FLAG_COLUMNS = ['Chg_dDisabled', 'Chg_dDeleted']
+
+
+def _compact_frame(df):
+    """
+    Shrink a query result in place: text columns become categoricals and
+    integer columns the smallest integer dtype that holds them. Money
+    columns stay float64, since float32 cannot hold cents exactly.
+    """
+    import pandas as pd
+    for column in df.columns:
+        series = df[column]
+        if column in FLAG_COLUMNS:
+            if series.notna().all() and series.isin([0, 1]).all():
+                df[column] = series.astype('uint8')
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+            df[column] = series.astype('category')
+    return df
+
+
+def _duplicate_key_message(conn, rows, staged):
+    """Describe the row of a chunk that repeated a key; rows before it are already staged"""
+    position = conn.execute("SELECT COUNT(*) FROM temp.import_staging").fetchone()[0] - staged
+    row = dict(zip(_STAGED_COLUMNS, rows[position]))
+    key = ", ".join(f"{column}={row[column] or ''!r}" for column in KEY_COLUMNS[2:])
+    return f"Row {staged + position + 1} repeats the key of an earlier row ({key})"
+
+
+# Connection plumbing is excluded: it is called constantly and does no work
+@instrumented('connection', 'transaction', 'close', 'cached_query')
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = DATABASE_PATH
-        self.init_database()
-        self.migrate_database()
+    def __init__(self, db_path=None, read_only=False):
+        self.db_path = db_path or DATABASE_PATH
+        self.read_only = read_only
+        self.pool = ConnectionPool.for_path(self.db_path, read_only)
+        self.query_cache = QueryCache()
+        if read_only:
+            if self.schema_version() != SCHEMA_VERSION:
+                raise Exception(
+                    f"{self.db_path} is at schema version {self.schema_version()}, not {SCHEMA_VERSION}; "
+                    f"open it read-write once to migrate it"
+                )
+            return
+        # Opening an up-to-date database is read-only: no write lock taken
+        if self.schema_version() != SCHEMA_VERSION:
+            self.init_database()
+            self.migrate_database()
+
+    def schema_version(self):
+        """Return the schema version recorded in the database file"""
+        return self.connection().execute("PRAGMA user_version").fetchone()[0]
+
+    def connection(self):
+        """Return the pooled connection for the calling thread"""
+        return self.pool.connection()
+
+    def transaction(self):
+        """Context manager running a block in a single transaction"""
+        return self.pool.transaction()
+
+    def close(self):
+        """Close all pooled connections for this database"""
+        self.pool.close_all()
 
     def init_database(self):
         """Initialize SQLite database with proper schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            self._create_tables(conn)
 
+    def _create_tables(self, conn):
         # Create main financial data table
-        cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS financial_data (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 report_month TEXT NOT NULL,
@@ -54,7 +179,7 @@ class DatabaseManager:
         ''')
 
         # Create summary table
-        cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS monthly_summary (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 report_month TEXT NOT NULL,
@@ -69,64 +194,228 @@ class DatabaseManager:
             )
         ''')
 
-        conn.commit()
-        conn.close()
-
     def migrate_database(self):
         """Handle database migrations for schema updates"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("PRAGMA table_info(financial_data)")
-            columns = [column[1] for column in cursor.fetchall()]
+            with self.transaction() as conn:
+                columns = [column[1] for column in conn.execute("PRAGMA table_info(financial_data)")]
 
-            if 'Chg_dDisabled' not in columns:
-                cursor.execute('ALTER TABLE financial_data ADD COLUMN Chg_dDisabled INTEGER DEFAULT 0')
-            
-            if 'Chg_dDeleted' not in columns:
-                cursor.execute('ALTER TABLE financial_data ADD COLUMN Chg_dDeleted INTEGER DEFAULT 0')
+                if 'Chg_dDisabled' not in columns:
+                    conn.execute('ALTER TABLE financial_data ADD COLUMN Chg_dDisabled INTEGER DEFAULT 0')
 
-            conn.commit()
+                if 'Chg_dDeleted' not in columns:
+                    conn.execute('ALTER TABLE financial_data ADD COLUMN Chg_dDeleted INTEGER DEFAULT 0')
         except Exception as e:
             print(f"Migration error (this is usually safe to ignore): {e}")
-        finally:
-            conn.close()
 
-    def store_data(self, df):
-        """Store DataFrame in database"""
-        conn = sqlite3.connect(self.db_path)
-        
-        # Define all columns the database expects
-        db_columns = [
-            'report_month', 'report_year', 'upload_date', 'SiteID', 'ChargeDescID', 'sChgCategory', 
-            'sChgDesc', 'sDefAcctCode', 'sAcctCode', 'Price', 'Charge', 'Discount', 'ChargeTax1', 
-            'ChargeTax2', 'ChargeTotal', 'Payment', 'PaymentTax1', 'PaymentTax2', 'PaymentTotal', 
-            'Credit', 'CreditTax1', 'CreditTax2', 'CreditTotal', 'TotalCost', 'iCount', 
-            'dcPercent', 'Chg_dDisabled', 'Chg_dDeleted'
-        ]
-        
-        # Filter the DataFrame to only include columns that exist in the database table
-        df_to_store = df[[col for col in db_columns if col in df.columns]]
+        try:
+            with self.transaction() as conn:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+                    for statement in statements:
+                        if callable(statement):
+                            statement(conn)
+                        else:
+                            conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {number}")
+        except Exception as e:
+            raise Exception(f"Error migrating database to schema version {SCHEMA_VERSION}: {str(e)}")
+
+    def store_data(self, df, source=None):
+        """Store DataFrame in database; source is passed on to store_rows"""
+        report_month, report_year, upload_date, chunks = _frame_import(df)
+        return self.store_rows(report_month, report_year, chunks, upload_date=upload_date, source=source)
+
+    def store_rows(self, report_month, report_year, chunks, upload_date=None, progress=None,
+                   source=None):
+        """
+        Synchronize one month's data with rows streamed in chunks.
+
+        chunks is any iterable of row-tuple iterables in EXPECTED_COLUMNS
+        order. Rows are staged in a temp table, their text swapped for
+        lookup ids, and diffed against the stored month on the UNIQUE key:
+        new rows are inserted, changed rows updated in place, rows missing
+        from the import deleted, and identical rows left alone. Everything
+        happens in one transaction. Two rows with the same key (site, charge
+        ID, category and description) fail the whole import.
+
+        progress, if given, is called as progress(phase, rows_written=...)
+        between steps; an exception it raises rolls the import back.
+
+        source describes the file the rows came from (file_hash, file_size,
+        sheet_signature, source_path) and is recorded in import_ledger so an
+        identical re-import can be skipped; without it the period's ledger
+        entry is cleared.
+
+        Returns a dict with rows/inserted/updated/deleted/unchanged counts.
+        """
+        upload_date = upload_date or datetime.now().isoformat()
+        report_year = int(report_year)
+        prefix = (report_month, report_year, upload_date)
 
         try:
-            report_month = df_to_store['report_month'].iloc[0]
-            report_year = df_to_store['report_year'].iloc[0]
+            with self.transaction() as conn:
+                if self._is_archived(conn, report_month, report_year):
+                    raise ValueError(f"{report_month}/{report_year} is archived; restore it before importing")
+                conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+                conn.execute(
+                    f"CREATE TEMP TABLE import_staging AS "
+                    f"SELECT {', '.join(FINANCIAL_DATA_COLUMNS)} FROM financial_data WHERE 0"
+                )
+                conn.execute(
+                    f"CREATE UNIQUE INDEX temp.import_staging_key "
+                    f"ON import_staging ({', '.join(KEY_COLUMNS)})"
+                )
+                staged = 0
+                for chunk in chunks:
+                    rows = [prefix + tuple(row) for row in chunk]
+                    try:
+                        conn.executemany(STAGE_ROW_SQL, rows)
+                    except sqlite3.IntegrityError:
+                        raise ValueError(_duplicate_key_message(conn, rows, staged)) from None
+                    staged += len(rows)
 
-            conn.execute(
-                "DELETE FROM financial_data WHERE report_month = ? AND report_year = ?",
-                (report_month, report_year)
-            )
+                if progress:
+                    progress('merging')
+                for statement in ADD_DIMENSIONS_SQL:
+                    conn.execute(statement)
+                conn.execute("DROP TABLE IF EXISTS temp.import_facts")
+                conn.execute(STAGE_FACTS_SQL)
+                conn.execute(
+                    f"CREATE UNIQUE INDEX temp.import_facts_key "
+                    f"ON import_facts ({', '.join(FACT_KEY_COLUMNS)})"
+                )
+                conn.execute("DROP TABLE temp.import_staging")
+                for statement in SYNC_SEARCH_SQL:
+                    conn.execute(statement)
+
+                conn.execute("DROP TABLE IF EXISTS temp.touched_groups")
+                conn.execute(
+                    f"CREATE TEMP TABLE touched_groups ({', '.join(FACT_GROUP_COLUMNS)}, {_GROUP_COLUMNS})"
+                )
+                conn.execute(TOUCH_GROUPS_SQL, (report_month, report_year))
+
+                deleted = conn.execute(DELETE_VANISHED_ROWS_SQL, (report_month, report_year)).rowcount
+                inserted = conn.execute(COUNT_NEW_ROWS_SQL).fetchone()[0]
+                # changes() from an upsert counts inserts plus updates that passed the WHERE
+                updated = conn.execute(UPSERT_ROWS_SQL).rowcount - inserted
 
-            df_to_store.to_sql('financial_data', conn, if_exists='append', index=False)
-            self.create_monthly_summary(conn, report_month, report_year) # Still useful for later
-            conn.commit()
-            return True
+                if inserted or updated or deleted:
+                    if progress:
+                        progress('summarizing', rows_written=inserted + updated + deleted)
+                    self._refresh_touched_summary(conn, report_month, report_year)
+                conn.execute("DROP TABLE temp.import_facts")
+                conn.execute("DROP TABLE temp.touched_groups")
+                self._record_import(conn, report_month, report_year, staged, upload_date, source)
+
+            return {
+                'rows': staged,
+                'inserted': inserted,
+                'updated': updated,
+                'deleted': deleted,
+                'unchanged': staged - inserted - updated,
+                'skipped': False,
+            }
         except Exception as e:
-            conn.rollback()
             raise Exception(f"Error storing data: {str(e)}")
-        finally:
-            conn.close()
+
+    def _record_import(self, conn, report_month, report_year, row_count, imported_at, source):
+        if source is None:
+            conn.execute(
+                "DELETE FROM import_ledger WHERE report_year = ? AND report_month = ?",
+                (report_year, report_month)
+            )
+            return
+        conn.execute(RECORD_IMPORT_SQL, (
+            report_month, report_year, source['file_hash'], source['file_size'],
+            source.get('sheet_signature'), row_count, source.get('source_path'), imported_at
+        ))
+
+    @staticmethod
+    def _is_archived(conn, report_month, report_year):
+        return conn.execute(
+            "SELECT 1 FROM archived_periods WHERE report_year = ? AND report_month = ?",
+            (int(report_year), report_month)
+        ).fetchone() is not None
+
+    def unchanged_import(self, report_month, report_year, file_hash, file_size):
+        """
+        Return import counts if the period still holds exactly this file.
+
+        A hit means the file was the last one imported for the period and
+        nothing has replaced its rows since, so re-importing it would change
+        nothing. Returns None otherwise.
+        """
+        row = self.connection().execute(
+            UNCHANGED_IMPORT_QUERY, (int(report_year), report_month, file_hash, file_size)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'rows': row[0], 'inserted': 0, 'updated': 0, 'deleted': 0,
+                'unchanged': row[0], 'skipped': True}
+
+    def _refresh_touched_summary(self, conn, report_month, report_year):
+        """Recompute only the category_summary groups an import touched"""
+        conn.execute(DELETE_TOUCHED_SUMMARY_SQL, (report_month, report_year))
+        conn.execute(INSERT_TOUCHED_SUMMARY_SQL, (report_month, report_year))
+        self.create_monthly_summary(conn, report_month, report_year)
+
+    def rebuild_category_summary(self, report_month=None, report_year=None):
+        """
+        Rebuild category_summary and monthly_summary from financial_data.
+
+        With no arguments every period is rebuilt; otherwise only the given
+        month/year.
+        """
+        if (report_month is None) != (report_year is None):
+            raise ValueError("report_month and report_year must be given together")
+
+        with self.transaction() as conn:
+            if report_month is None:
+                # Archived periods have no raw rows left to rebuild from
+                conn.execute(
+                    "DELETE FROM category_summary WHERE (report_year, report_month) NOT IN "
+                    "(SELECT report_year, report_month FROM archived_periods)"
+                )
+                conn.execute(
+                    f"INSERT INTO category_summary ({', '.join(CATEGORY_SUMMARY_COLUMNS)})"
+                    + CATEGORY_SUMMARY_SELECT + CATEGORY_SUMMARY_GROUPING
+                )
+                conn.execute("DELETE FROM monthly_summary")
+                periods = conn.execute(
+                    "SELECT DISTINCT report_month, report_year FROM category_summary"
+                ).fetchall()
+            else:
+                if self._is_archived(conn, report_month, report_year):
+                    raise ValueError(f"{report_month}/{report_year} is archived; restore it before rebuilding")
+                conn.execute(
+                    "DELETE FROM category_summary WHERE report_month = ? AND report_year = ?",
+                    (report_month, int(report_year))
+                )
+                conn.execute(
+                    f"INSERT INTO category_summary ({', '.join(CATEGORY_SUMMARY_COLUMNS)})"
+                    + CATEGORY_SUMMARY_SELECT
+                    + " WHERE f.report_month = ? AND f.report_year = ?"
+                    + CATEGORY_SUMMARY_GROUPING,
+                    (report_month, int(report_year))
+                )
+                periods = [(report_month, int(report_year))]
+
+            for month, year in periods:
+                self.create_monthly_summary(conn, month, year)
+
+    def check_category_summary(self, repair=False):
+        """
+        Verify category_summary against a fresh aggregate of financial_data.
+
+        Returns the (report_month, report_year) periods that disagree; with
+        repair=True those periods are rebuilt before returning.
+        """
+        mismatched = [tuple(row) for row in self.connection().execute(SUMMARY_MISMATCH_QUERY)]
+        if repair:
+            for month, year in mismatched:
+                self.rebuild_category_summary(month, year)
+        return mismatched
 
     def create_monthly_summary(self, conn, report_month, report_year):
         """Create monthly summary calculations"""
@@ -134,17 +423,10 @@ class DatabaseManager:
             "DELETE FROM monthly_summary WHERE report_month = ? AND report_year = ?",
             (report_month, report_year)
         )
+        # Every change to a period's summaries passes through here
+        self._bump_generation(conn, report_month, report_year)
         
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT
-                SUM(ChargeTotal), SUM(PaymentTotal), SUM(CreditTotal),
-                SUM(TotalCost), COUNT(*)
-            FROM financial_data
-            WHERE report_month = ? AND report_year = ?
-        ''', (report_month, report_year))
-        
-        result = cursor.fetchone()
+        result = conn.execute(MONTHLY_TOTALS_QUERY, (report_month, report_year)).fetchone()
         
         conn.execute('''
             INSERT INTO monthly_summary
@@ -157,75 +439,553 @@ class DatabaseManager:
             datetime.now().isoformat()
         ))
 
-    def get_all_data(self):
-        """Get all raw data from the financial_data table"""
-        conn = sqlite3.connect(self.db_path)
-        query = "SELECT * FROM financial_data ORDER BY id"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
-
-    def get_financial_summary(self, report_month=None, report_year=None):
-        """Get financial summary with filtering options"""
-        conn = sqlite3.connect(self.db_path)
-        
-        query = '''
-            SELECT
-                report_month, report_year, sChgCategory, sAcctCode,
-                SUM(ChargeTotal) as total_charges,
-                SUM(PaymentTotal) as total_payments,
-                SUM(CreditTotal) as total_credits,
-                SUM(TotalCost) as net_total,
-                COUNT(*) as transaction_count,
-                SUM(CASE WHEN Chg_dDisabled = 1 THEN 1 ELSE 0 END) as disabled_charges
-            FROM financial_data
-        '''
-        
-        params = []
-        conditions = []
-        if report_month:
-            conditions.append("report_month = ?")
-            params.append(report_month)
-        if report_year:
-            conditions.append("report_year = ?")
-            params.append(report_year)
+    @staticmethod
+    def _bump_generation(conn, report_month, report_year):
+        """Invalidate cached results that read a period (inside the writing transaction)"""
+        report_year = int(report_year)
+        conn.execute(BUMP_GENERATION_SQL, (
+            report_month, report_year, period_key(report_month, report_year), time.time_ns()
+        ))
 
+    def data_generations(self, report_month=None, report_year=None, start=None, end=None, periods=None):
+        """
+        Return (report_year, report_month, generation) for every stored period
+        a query with these filters reads; periods is a list of
+        (report_month, report_year) pairs.
+        """
+        conditions, params = _period_conditions(report_month, report_year, start, end)
+        if periods is not None:
+            periods = sorted({(report_month, int(report_year)) for report_month, report_year in periods})
+            if not periods:
+                return ()
+            conditions.append(
+                f"(report_month, report_year) IN (VALUES {', '.join('(?, ?)' for _ in periods)})"
+            )
+            params.extend(value for period in periods for value in period)
+        query = "SELECT report_year, report_month, generation FROM data_generations"
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        
-        query += " GROUP BY report_month, report_year, sChgCategory, sAcctCode"
-        query += " ORDER BY report_year DESC, report_month DESC, sChgCategory"
-        
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
-        return df
+        return tuple(self.connection().execute(query + " ORDER BY report_year, report_month", params))
+
+    def cached_query(self, name, params, compute, **scope):
+        """
+        Return compute() through the query cache.
+
+        The result is keyed by name, params and the data generations of the
+        periods selected by scope (see data_generations), so it is reused
+        until one of those periods changes.
+        """
+        if not self.query_cache.enabled:
+            return compute()
+        key = cache_key(str(self.db_path), name, tuple(params), self.data_generations(**scope))
+        return self.query_cache.cached(key, compute)
+
+    def get_monthly_totals(self, report_month, report_year):
+        """Get one month's monthly_summary row as a dict, or None if it has none"""
+        cursor = self.connection().execute(
+            "SELECT total_charges, total_payments, total_credits, net_total, record_count "
+            "FROM monthly_summary WHERE report_month = ? AND report_year = ?",
+            (report_month, int(report_year))
+        )
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def get_all_data(self, include_archived=False):
+        """
+        Get all raw data in financial_data's layout, compactly.
+
+        Rows are read from financial_facts with their lookup ids and each
+        text column is built as a categorical straight from its lookup
+        table, so no per-row strings are created. Integers are downcast as
+        in _compact_frame. With include_archived, the rows of archived
+        periods are read back from their Parquet files as well.
+        """
+        import pandas as pd
+        if include_archived:
+            return self._with_archived(self.get_all_data(), self.archived_periods())
+        conn = self.connection()
+        facts = _read_frame(ALL_DATA_QUERY, conn)
+
+        columns = {'id': facts['id'], 'report_month': facts['report_month'], 'report_year': facts['report_year']}
+        for id_column, (table, values) in DIMENSIONS.items():
+            for column, value in values.items():
+                lookup = conn.execute(f"SELECT id, {value} FROM {table}").fetchall()
+                columns[column] = _decode_dimension(facts[id_column], lookup)
+        for column in MEASURE_COLUMNS:
+            columns[column] = facts[column]
+        return _compact_frame(pd.DataFrame(columns)[['id'] + FINANCIAL_DATA_COLUMNS])
+
+    def get_data_range(self, start=None, end=None, include_archived=False):
+        """
+        Get raw rows for an inclusive 'YYYY-MM' month range, compactly.
+
+        Either end may be open. Rows are ordered by period, then id. With
+        include_archived, archived periods in the range are read from their
+        Parquet files; only those files are opened.
+        """
+        first, last = _period_range(start, end)
+        df = _read_frame(DATA_RANGE_QUERY, self.connection(), [first // 12, last // 12, first, last])
+        if not include_archived:
+            return _compact_frame(df)
+        archived = [period for period in self.archived_periods()
+                    if first <= period_key(period['report_month'], period['report_year']) <= last]
+        return self._with_archived(df, archived)
+
+    def _with_archived(self, df, archived):
+        """Combine live rows with the rows of the given archived periods"""
+        if not archived:
+            return _compact_frame(df)
+        import pandas as pd
+        from database.archive import read_archived_rows
+        frames = [frame for frame in (read_archived_rows(archived), df) if len(frame)]
+        combined = pd.concat(frames, ignore_index=True)
+        combined = combined.sort_values(['report_year', 'report_month', 'id'], kind='stable')
+        return _compact_frame(combined.reset_index(drop=True))
+
+    def archived_periods(self):
+        """List archived periods, oldest first, as dicts"""
+        cursor = self.connection().execute(ARCHIVED_PERIODS_QUERY + " ORDER BY report_year, report_month")
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def drop_archived_rows(self, report_month, report_year, file_path, row_count, file_size):
+        """
+        Record a period as archived and delete its raw rows, in one transaction.
+
+        Called once the rows are safely in file_path. Nothing is deleted
+        unless the period still holds exactly row_count rows, so rows
+        imported in the meantime are never lost. Summary rows are kept.
+        """
+        report_year = int(report_year)
+        with self.transaction() as conn:
+            stored = conn.execute(
+                "SELECT COUNT(*) FROM financial_facts WHERE report_year = ? AND report_month = ?",
+                (report_year, report_month)
+            ).fetchone()[0]
+            if stored != row_count:
+                raise ValueError(
+                    f"{report_month}/{report_year} holds {stored} rows but {row_count} were archived"
+                )
+            conn.execute(
+                "INSERT INTO archived_periods VALUES (?, ?, ?, ?, ?, ?)",
+                (report_month, report_year, str(file_path), row_count, file_size, datetime.now().isoformat())
+            )
+            conn.execute(
+                "DELETE FROM financial_facts WHERE report_year = ? AND report_month = ?",
+                (report_year, report_month)
+            )
+            conn.execute(
+                "DELETE FROM import_ledger WHERE report_year = ? AND report_month = ?",
+                (report_year, report_month)
+            )
+            self._bump_generation(conn, report_month, report_year)
+
+    def _page_conditions(self, filters, facts=False):
+        """
+        Translate a filters dict into WHERE clauses and parameters.
+
+        With facts=True the clauses apply to financial_facts, text filters
+        becoming a lookup of the matching id.
+        """
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in PAGE_FILTER_COLUMNS:
+                raise ValueError(f"Cannot filter on column '{column}'")
+            if value not in (None, ''):
+                condition = f"{column} = ?"
+                if facts:
+                    for id_column, (table, values) in DIMENSIONS.items():
+                        if column in values:
+                            condition = f"{id_column} = (SELECT id FROM {table} WHERE {values[column]} = ?)"
+                conditions.append(condition)
+                params.append(int(value) if column == 'report_year' else value)
+        return conditions, params
+
+    def get_data_page(self, filters=None, sort='id', descending=False, after=None, limit=100):
+        """
+        Fetch one page of raw rows using keyset pagination.
+
+        filters maps PAGE_FILTER_COLUMNS to exact values; sort is a key of
+        PAGE_SORT_KEYS. after is the cursor returned with the previous page,
+        so each page is an index seek rather than an OFFSET scan. Returns
+        (columns, rows, next_cursor) with next_cursor None on the last page.
+        """
+        if sort not in PAGE_SORT_KEYS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        sort_columns = PAGE_SORT_KEYS[sort]
+        direction = "DESC" if descending else "ASC"
+
+        conditions, params = self._page_conditions(filters)
+        if after is not None:
+            conditions.append(
+                f"({', '.join(sort_columns)}) {'<' if descending else '>'} "
+                f"({', '.join('?' for _ in sort_columns)})"
+            )
+            params.extend(after)
+
+        query = "SELECT * FROM financial_data"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY " + ", ".join(f"{col} {direction}" for col in sort_columns)
+        query += " LIMIT ?"
+        params.append(limit + 1)
+
+        cursor = self.connection().execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            positions = [columns.index(col) for col in sort_columns]
+            next_cursor = tuple(rows[-1][position] for position in positions)
+        return columns, rows, next_cursor
+
+    def search(self, text, site_ids=None, start=None, end=None, category=None, after=None, limit=50,
+               facets=True, ranked=True):
+        """
+        Find stored rows whose description, category or account codes match text.
+
+        Every word of text must match the start of a word in one of those
+        columns ("insur lock" finds "Insurance - Lock Fee"). Rows are ranked
+        by how well their text matches (bm25), then newest period first.
+        site_ids, start/end ('YYYY-MM', inclusive) and category narrow the
+        search. Pages use a keyset cursor like get_data_page: pass the
+        returned next_cursor as after. Rows of archived periods are not
+        searched.
+
+        Returns a dict with columns and rows (financial_data's layout plus
+        a score column, higher is better), next_cursor, and unless facets
+        is False the total match count and facets: lists of (value, count)
+        for 'site', 'period' ('YYYY-MM') and 'category', largest first.
+
+        With ranked=False rows come newest period first, then by id
+        descending, and the cursor is (report_year, report_month, id); an
+        id of None there starts at that whole period. ShardedDatabaseManager
+        merges shards this way.
+        """
+        expression = _match_expression(text)
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        conn = self.connection()
+        category_filter, category_params = "", []
+        if category:
+            category_filter = " AND d.category_id IN (SELECT id FROM charge_categories WHERE sChgCategory = ?)"
+            category_params = [category]
+        documents = conn.execute(
+            SEARCH_DOCUMENTS_QUERY.format(category=category_filter), [expression] + category_params
+        ).fetchall()
+
+        conditions, params = [], []
+        if site_ids:
+            site_ids = list(site_ids)
+            conditions.append(f"f.site_id IN (SELECT id FROM sites WHERE SiteID IN ({', '.join('?' for _ in site_ids)}))")
+            params.extend(site_ids)
+        if start or end:
+            first, last = _period_range(start, end)
+            conditions.append(
+                "f.report_year BETWEEN ? AND ? "
+                "AND f.report_year * 12 + CAST(f.report_month AS INTEGER) - 1 BETWEEN ? AND ?"
+            )
+            params.extend([first // 12, last // 12, first, last])
+
+        result = {'total': None, 'facets': None}
+        if facets:
+            result.update(self._search_facets(conn, expression, documents, conditions + (
+                [category_filter[5:]] if category else []), params + category_params))
+
+        if not ranked:
+            return self._search_newest(conn, expression, documents, conditions + (
+                [category_filter[5:]] if category else []), params + category_params, after, limit, result)
+
+        # Walk documents in rank order, each one's rows by index, until the page is full
+        position, cursor_key = (after[0], tuple(after[1:])) if after else (0, (None,))
+        page, next_cursor = [], None
+        for index in range(position, len(documents)):
+            if len(page) == limit:
+                next_cursor = (index, None, None, None)
+                break
+            row_conditions, row_params = list(conditions), list(params)
+            if index == position and cursor_key[0] is not None:
+                row_conditions.append("(f.report_year, f.report_month, f.site_id) < (?, ?, ?)")
+                row_params.extend(cursor_key)
+            query = SEARCH_ROWS_QUERY.format(
+                conditions="".join(f" AND {condition}" for condition in row_conditions)
+            )
+            wanted = limit - len(page)
+            found = conn.execute(query, list(documents[index][1:5]) + row_params + [wanted + 1]).fetchall()
+            page.extend((index, row) for row in found[:wanted])
+            if len(found) > wanted:
+                next_cursor = (index,) + tuple(page[-1][1][1:])
+                break
+
+        scores = [(row[0], documents[index][5]) for index, row in page]
+        return self._search_page(conn, scores, next_cursor, result)
+
+    def _search_newest(self, conn, expression, documents, conditions, params, after, limit, result):
+        """One page of an unranked search, newest period first"""
+        conditions, params = list(conditions), list(params)
+        if after is not None:
+            if after[2] is None:
+                conditions.append("(f.report_year, f.report_month) <= (?, ?)")
+                params.extend(after[:2])
+            else:
+                conditions.append("(f.report_year, f.report_month, f.id) < (?, ?, ?)")
+                params.extend(after[:3])
+        query = SEARCH_NEWEST_ROWS_QUERY.format(
+            conditions="".join(f" AND {condition}" for condition in conditions)
+        )
+        found = conn.execute(query, [expression] + params + [limit + 1]).fetchall()
+        ranks = {document[0]: document[5] for document in documents}
+        next_cursor = tuple(found[limit - 1][1:3]) + (found[limit - 1][0],) if len(found) > limit else None
+        scores = [(row[0], ranks[row[3]]) for row in found[:limit]]
+        return self._search_page(conn, scores, next_cursor, result)
+
+    def _search_page(self, conn, scores, next_cursor, result):
+        """Fill a search result with the stored rows of (id, bm25 rank) pairs"""
+        ids = [row_id for row_id, _ in scores]
+        stored = {}
+        columns = ['id'] + FINANCIAL_DATA_COLUMNS
+        if ids:
+            cursor = conn.execute(
+                f"SELECT * FROM financial_data WHERE id IN ({', '.join('?' for _ in ids)})", ids
+            )
+            columns = [description[0] for description in cursor.description]
+            stored = {row[0]: row for row in cursor}
+        result['columns'] = columns + ['score']
+        result['rows'] = [stored[row_id] + (round(-rank, 4),) for row_id, rank in scores]
+        result['next_cursor'] = next_cursor
+        return result
+
+    def _search_facets(self, conn, expression, documents, conditions, params):
+        """Total and facet counts of a search's matching rows"""
+        extra = "".join(f" AND {condition}" for condition in conditions)
+        categories = dict(conn.execute("SELECT id, sChgCategory FROM charge_categories"))
+        category_of = {document[0]: categories.get(document[2]) for document in documents}
+        periods, by_category, total = {}, {}, 0
+        for document_id, report_year, report_month, count in conn.execute(
+            SEARCH_PERIOD_FACETS_QUERY.format(conditions=extra), [expression] + params
+        ):
+            if document_id not in category_of:
+                continue
+            total += count
+            period = f"{report_year}-{report_month}"
+            periods[period] = periods.get(period, 0) + count
+            category = category_of[document_id]
+            by_category[category] = by_category.get(category, 0) + count
+        site_ids = dict(conn.execute("SELECT id, SiteID FROM sites"))
+        sites = [
+            (site_ids.get(site_id), count) for site_id, count in
+            conn.execute(SEARCH_SITE_FACETS_QUERY.format(conditions=extra), [expression] + params)
+        ]
+
+        def largest_first(counts):
+            return sorted(counts, key=lambda item: (-item[1], str(item[0])))
+        return {
+            'total': total,
+            'facets': {
+                'site': largest_first(sites),
+                'period': largest_first(periods.items()),
+                'category': largest_first(by_category.items()),
+            },
+        }
+
+    def iter_data_rows(self, filters=None, batch_size=IMPORT_CHUNK_SIZE):
+        """
+        Stream raw rows in id order without loading them all.
+
+        filters is as for get_data_page. Returns (columns, rows) where rows
+        is a generator fetching batch_size rows at a time.
+        """
+        conditions, params = self._page_conditions(filters)
+        query = "SELECT * FROM financial_data"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        cursor = self.connection().execute(query + " ORDER BY id", params)
+        return [description[0] for description in cursor.description], _batched_rows(cursor, batch_size)
+
+    def iter_data_range(self, start=None, end=None, batch_size=IMPORT_CHUNK_SIZE):
+        """
+        Stream raw rows of an inclusive 'YYYY-MM' month range, ordered as
+        get_data_range, without loading them all. Returns (columns, rows).
+        """
+        first, last = _period_range(start, end)
+        cursor = self.connection().execute(DATA_RANGE_QUERY, [first // 12, last // 12, first, last])
+        return [description[0] for description in cursor.description], _batched_rows(cursor, batch_size)
+
+    def count_data(self, filters=None):
+        """Count raw rows matching the same filters as get_data_page"""
+        conditions, params = self._page_conditions(filters, facts=True)
+        query = "SELECT COUNT(*) FROM financial_facts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.connection().execute(query, params).fetchone()[0]
+
+    def get_financial_summary(self, report_month=None, report_year=None, start=None, end=None):
+        """
+        Get financial summary with filtering options (see _compact_frame for dtypes).
+
+        start and end ('YYYY-MM', inclusive) select a range of months.
+        """
+        query, params = _financial_summary_query(report_month, report_year, start, end)
+        return self.cached_query(
+            'financial_summary', params, lambda: _compact_frame(_read_frame(query, self.connection(), params)),
+            report_month=report_month, report_year=report_year, start=start, end=end
+        )
+
+    def get_financial_summary_rows(self, report_month=None, report_year=None, start=None, end=None):
+        """Get the financial summary as (columns, rows) without pandas"""
+        query, params = _financial_summary_query(report_month, report_year, start, end)
+
+        def compute():
+            cursor = self.connection().execute(query, params)
+            return [column[0] for column in cursor.description], cursor.fetchall()
+        return self.cached_query('financial_summary_rows', params, compute, report_month=report_month,
+                                 report_year=report_year, start=start, end=end)
+
+    def get_trend_report(self, start, end, by_category=False, measure='net_total', rolling_months=3):
+        """
+        Get per-month totals for a range of months in one query.
+
+        start and end are 'YYYY-MM' (inclusive). Each row has the month's
+        totals plus, for measure, the change and % change from the previous
+        month (mom_) and the same month a year earlier (yoy_), and the total
+        over the last rolling_months months. Months without data are
+        omitted, and comparisons against such a month are NaN. With
+        by_category there is one series per charge category.
+        """
+        query, params = _trend_query(start, end, by_category, measure, rolling_months)
+        return _compact_frame(_read_frame(query, self.connection(), params))
+
+    def get_trend_rows(self, start, end, by_category=False, measure='net_total', rolling_months=3):
+        """Get the trend report as (columns, rows) without pandas"""
+        query, params = _trend_query(start, end, by_category, measure, rolling_months)
+        cursor = self.connection().execute(query, params)
+        return [column[0] for column in cursor.description], cursor.fetchall()
 
     def get_sage_export_data(self, report_month, report_year):
         """Get data formatted for Sage GLS export"""
-        conn = sqlite3.connect(self.db_path)
-        
-        query = '''
-            SELECT
-                sChgCategory, sAcctCode, sDefAcctCode,
-                SUM(ChargeTotal) as debit_amount,
-                SUM(PaymentTotal) as credit_amount
-            FROM financial_data
-            WHERE report_month = ? AND report_year = ? AND Chg_dDisabled = 0
-            GROUP BY sChgCategory, sAcctCode, sDefAcctCode
-            HAVING ABS(debit_amount) + ABS(credit_amount) > 0
-        '''
-        
-        df = pd.read_sql_query(query, conn, params=[report_month, report_year])
-        conn.close()
-        return df
+        params = [report_month, report_year]
+        return self.cached_query(
+            'sage_export', params, lambda: _read_frame(SAGE_EXPORT_QUERY, self.connection(), params),
+            periods=[(report_month, report_year)]
+        )
+
+    def get_sage_export_batch(self, periods, site_ids=None, by_site=False):
+        """
+        Get Sage export rows for many periods (and optionally sites) at once.
+
+        periods is an iterable of (report_month, report_year) pairs. With
+        site_ids only those sites are included; with by_site the rows keep
+        a SiteID column instead of being combined across sites.
+        """
+        periods = list(periods)
+        query, params = _sage_export_batch_query(periods, site_ids, by_site)
+        return self.cached_query(
+            'sage_export_batch', params + [by_site], lambda: _read_frame(query, self.connection(), params),
+            periods=periods
+        )
+
+    def builtin_queries(self):
+        """
+        List the read queries this class issues, for plan diagnostics.
+
+        Each entry is (name, sql, sample params, full_scan_expected).
+        """
+        month, year = '01', 2000
+        summary_all = _financial_summary_query()
+        summary_month = _financial_summary_query(month, year)
+        summary_year = _financial_summary_query(None, year)
+        summary_range = _financial_summary_query(start='2000-01', end='2001-12')
+        trend = _trend_query('2000-01', '2001-12')
+        trend_by_category = _trend_query('2000-01', '2001-12', by_category=True)
+        return [
+            ('all_data', ALL_DATA_QUERY, [], True),
+            ('financial_summary', summary_all[0], summary_all[1], True),
+            ('financial_summary_by_period', summary_month[0], summary_month[1], False),
+            ('financial_summary_by_year', summary_year[0], summary_year[1], False),
+            ('financial_summary_by_range', summary_range[0], summary_range[1], False),
+            ('trend', trend[0], trend[1], False),
+            ('trend_by_category', trend_by_category[0], trend_by_category[1], False),
+            ('sage_export_data', SAGE_EXPORT_QUERY, [month, year], False),
+            (
+                'sage_export_batch',
+                SAGE_EXPORT_BATCH_QUERY.format(
+                    years="?", months="?, ?", periods="(?, ?), (?, ?)",
+                    sites=" AND SiteID IN (?)", site_column=", SiteID"
+                ),
+                [year, month, '02', year, month, year, '02', 'S1'], False
+            ),
+            ('monthly_totals', MONTHLY_TOTALS_QUERY, [month, year], False),
+            ('data_range', DATA_RANGE_QUERY, [year, year + 1, year * 12, year * 12 + 23], False),
+            ('unchanged_import', UNCHANGED_IMPORT_QUERY, [year, month, '0' * 64, 0], False),
+            ('data_page_by_id', "SELECT * FROM financial_data WHERE (id) > (?) ORDER BY id LIMIT ?",
+             [0, 101], False),
+            (
+                'data_page_by_period',
+                "SELECT * FROM financial_data WHERE (report_year, report_month, id) > (?, ?, ?) "
+                "ORDER BY report_year, report_month, id LIMIT ?",
+                [year, month, 0, 101], False
+            ),
+            (
+                'data_page_by_site',
+                "SELECT * FROM financial_data WHERE (SiteID, id) < (?, ?) "
+                "ORDER BY SiteID DESC, id DESC LIMIT ?",
+                ['S1', 0, 101], False
+            ),
+            ('search_period_facets', SEARCH_PERIOD_FACETS_QUERY.format(conditions=""), ['"fee"*'], False),
+            ('search_rows', SEARCH_ROWS_QUERY.format(conditions=""), [1, 1, 1, 1, 51], False),
+            (
+                'category_summary_rebuild',
+                CATEGORY_SUMMARY_SELECT + " WHERE f.report_month = ? AND f.report_year = ?"
+                + CATEGORY_SUMMARY_GROUPING,
+                [month, year], False
+            ),
+        ]
+
+    def explain_queries(self):
+        """
+        Run EXPLAIN QUERY PLAN on every built-in query.
+
+        A query is flagged when its plan sorts through a temp B-tree, or
+        scans a table without a covering index when it is not meant to
+        read everything. Returns one dict per query.
+        """
+        conn = self.connection()
+        report = []
+        for name, query, params, full_scan_expected in self.builtin_queries():
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+            # Scanning a subquery reads its co-routine's rows, not a table, and
+            # "scanning" an FTS5 table runs its full-text index
+            issues = [
+                step for step in plan
+                if 'TEMP B-TREE' in step
+                or (step.startswith('SCAN') and 'COVERING INDEX' not in step
+                    and 'CONSTANT ROWS' not in step and not step.startswith('SCAN (subquery')
+                    and 'VIRTUAL TABLE' not in step
+                    and not full_scan_expected)
+            ]
+            report.append({'query': name, 'plan': plan, 'issues': issues, 'flagged': bool(issues)})
+        return report
 
     def reset_database(self):
         """Reset database - use only if needed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DROP TABLE IF EXISTS financial_data")
-        cursor.execute("DROP TABLE IF EXISTS monthly_summary")
-        conn.commit()
-        conn.close()
-        self.init_database()
+        with self.transaction() as conn:
+            conn.execute("DROP VIEW IF EXISTS financial_data")
+            conn.execute("DROP TABLE IF EXISTS financial_facts")
+            for table in sorted({table for table, _ in DIMENSIONS.values()}):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute("DROP TABLE IF EXISTS monthly_summary")
+            conn.execute("DROP TABLE IF EXISTS category_summary")
+            conn.execute("DROP TABLE IF EXISTS import_ledger")
+            conn.execute("DROP TABLE IF EXISTS archived_periods")
+            conn.execute("DROP TABLE IF EXISTS data_generations")
+            conn.execute("DROP TABLE IF EXISTS charge_search")
+            conn.execute("DROP TABLE IF EXISTS search_documents")
+            conn.execute("PRAGMA user_version = 0")
+            self._create_tables(conn)
+        self.migrate_database()
+        self.query_cache.clear()
         print("Database reset completed!")
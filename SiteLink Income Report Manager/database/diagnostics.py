@@ -0,0 +1,32 @@
+"""
+Query plan diagnostics for SiteLink Financial Data
+
+Run from the application directory:
+    python -m database.diagnostics
+"""
+import sys
+from database.sharding import open_database
+
+
+def print_query_plans(db_manager):
+    """Print the plan for every built-in query; return how many were flagged"""
+    flagged = 0
+    for entry in db_manager.explain_queries():
+        status = "FLAGGED" if entry['flagged'] else "ok"
+        print(f"[{status}] {entry['query']}")
+        for step in entry['plan']:
+            marker = "  !! " if step in entry['issues'] else "     "
+            print(f"{marker}{step}")
+        flagged += entry['flagged']
+    return flagged
+
+
+def main():
+    """Entry point for the query plan diagnostic"""
+    flagged = print_query_plans(open_database())
+    print(f"\n{flagged} query plan(s) flagged")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,3 +2,7 @@
 Database package for SiteLink Financial Manager
 """
 from .db_manager import DatabaseManager
+from .connection import ConnectionPool
+from .sharding import ShardedDatabaseManager, open_database
+from .archive import archive_periods, read_archived_rows, restore_period
+from .query_cache import QueryCache
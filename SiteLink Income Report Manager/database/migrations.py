@@ -0,0 +1,303 @@
+"""
+Schema migrations for SiteLink Financial Data
+
+Each entry of SCHEMA_MIGRATIONS brings a database file one schema version
+forward. DatabaseManager.migrate_database runs the ones a file has not had
+yet, all in one transaction, and records the count in PRAGMA user_version.
+"""
+from database.queries import (
+    CATEGORY_SUMMARY_COLUMNS, CATEGORY_SUMMARY_GROUPING, CATEGORY_SUMMARY_SELECT, DIMENSIONS, FACT_COLUMNS,
+    FACT_KEY_COLUMNS, FINANCIAL_DATA_COLUMNS, MEASURE_COLUMNS, PERIOD_KEY_SQL, SEARCH_TEXT_COLUMNS,
+    _ADD_SEARCH_DOCUMENTS_SQL, _GROUP_COLUMNS, _INDEX_SEARCH_DOCUMENTS_SQL, _dimension_joins, _dimension_value
+)
+
+
+# financial_data as it read before migration 5 normalized it; migration 2
+# backfills category_summary from this table layout
+_LEGACY_CATEGORY_SUMMARY_SQL = f'''
+    INSERT INTO category_summary ({', '.join(CATEGORY_SUMMARY_COLUMNS[:14])})
+    SELECT
+        report_month, report_year, {_GROUP_COLUMNS},
+        SUM(ChargeTotal), SUM(PaymentTotal), SUM(CreditTotal), SUM(TotalCost),
+        SUM(CASE WHEN Chg_dDisabled = 0 THEN ChargeTotal END),
+        SUM(CASE WHEN Chg_dDisabled = 0 THEN PaymentTotal END),
+        COUNT(*),
+        SUM(CASE WHEN Chg_dDisabled = 1 THEN 1 ELSE 0 END)
+    FROM financial_data
+    GROUP BY report_year, report_month, sChgCategory, sAcctCode, sDefAcctCode, SiteID
+'''
+
+# category_summary rebuilt from financial_facts by migration 5, before
+# migration 6 adds period_key
+_MIGRATED_CATEGORY_SUMMARY_SQL = f'''
+    WITH fresh ({', '.join(CATEGORY_SUMMARY_COLUMNS)}) AS (
+        {CATEGORY_SUMMARY_SELECT} {CATEGORY_SUMMARY_GROUPING}
+    )
+    INSERT INTO category_summary ({', '.join(CATEGORY_SUMMARY_COLUMNS[:14])})
+    SELECT {', '.join(CATEGORY_SUMMARY_COLUMNS[:14])} FROM fresh
+'''
+
+# monthly_summary recomputed from it, as create_monthly_summary would; rows
+# whose keys became equal once blanks turned into '' were merged
+_MIGRATED_MONTHLY_SUMMARY_SQL = '''
+    INSERT OR REPLACE INTO monthly_summary
+    (report_month, report_year, total_charges, total_payments,
+     total_credits, net_total, record_count, created_date)
+    SELECT
+        report_month, report_year, COALESCE(SUM(total_charges), 0), COALESCE(SUM(total_payments), 0),
+        COALESCE(SUM(total_credits), 0), COALESCE(SUM(net_total), 0), SUM(transaction_count),
+        strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+    FROM category_summary
+    GROUP BY report_year, report_month
+'''
+
+_MEASURE_DEFINITIONS = ",\n        ".join(
+    f"{col} INTEGER DEFAULT 0" if col.startswith('Chg_d') else f"{col} {'INTEGER' if col == 'iCount' else 'REAL'}"
+    for col in MEASURE_COLUMNS
+)
+
+FINANCIAL_FACTS_TABLE_SQL = f'''
+    CREATE TABLE IF NOT EXISTS financial_facts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        report_month TEXT NOT NULL,
+        report_year INTEGER NOT NULL,
+        upload_id INTEGER NOT NULL REFERENCES uploads (id),
+        site_id INTEGER NOT NULL REFERENCES sites (id),
+        charge_desc_id INTEGER NOT NULL REFERENCES charge_descriptions (id),
+        category_id INTEGER NOT NULL REFERENCES charge_categories (id),
+        def_account_id INTEGER REFERENCES account_codes (id),
+        account_id INTEGER REFERENCES account_codes (id),
+        {_MEASURE_DEFINITIONS},
+        UNIQUE ({', '.join(FACT_KEY_COLUMNS)})
+    )
+'''
+
+# The original row layout, column for column, for readers of raw rows
+FINANCIAL_DATA_VIEW_SQL = f'''
+    CREATE VIEW IF NOT EXISTS financial_data AS
+    SELECT f.id, f.report_month, f.report_year,
+           {", ".join(f"{_dimension_value(col)} AS {col}" for col in FINANCIAL_DATA_COLUMNS[2:9])},
+           {", ".join(f"f.{col}" for col in MEASURE_COLUMNS)}
+    FROM financial_facts f
+    {_dimension_joins("f", DIMENSIONS)}
+'''
+
+# Rows of the first release's financial_data whose keys only differed by
+# NULL versus '' (or NULL twice: its UNIQUE constraint let NULLs repeat)
+_BLANK_KEY_COLLISIONS_QUERY = '''
+    SELECT report_month, report_year, COALESCE(SiteID, ''), COALESCE(ChargeDescID, ''),
+           COALESCE(sChgCategory, ''), COALESCE(sChgDesc, ''), GROUP_CONCAT(id, ', ')
+    FROM financial_data
+    GROUP BY report_year, report_month, COALESCE(SiteID, ''), COALESCE(ChargeDescID, ''),
+             COALESCE(sChgCategory, ''), COALESCE(sChgDesc, '')
+    HAVING COUNT(*) > 1
+    ORDER BY report_year, report_month
+'''
+
+
+def _check_blank_key_collisions(conn):
+    """
+    Stop migration 5 before it copies rows that would share a key.
+
+    Blank key text becomes '' in financial_facts, whose UNIQUE key then
+    covers it, so such rows cannot all be kept. Nothing has been dropped
+    yet, and the failed migration rolls back.
+    """
+    collisions = conn.execute(_BLANK_KEY_COLLISIONS_QUERY).fetchall()
+    if not collisions:
+        return
+    examples = "; ".join(
+        f"{month}/{year} SiteID={site!r} ChargeDescID={desc_id!r} sChgCategory={category!r} "
+        f"sChgDesc={desc!r} (ids {ids})"
+        for month, year, site, desc_id, category, desc, ids in collisions[:5]
+    )
+    raise ValueError(
+        f"{len(collisions)} group(s) of financial_data rows differ only by blank key columns and "
+        f"would become duplicates: {examples}. Fill in or delete those rows, then open the database again"
+    )
+
+
+# Versioned schema migrations, applied in order. PRAGMA user_version records
+# how many have run, so each list of statements executes exactly once. A
+# callable entry is called with the connection instead of executed.
+SCHEMA_MIGRATIONS = [
+    # 1: covering indexes for the summary and Sage export access paths
+    [
+        '''CREATE INDEX IF NOT EXISTS idx_financial_data_summary ON financial_data (
+            report_year DESC, report_month DESC, sChgCategory, sAcctCode,
+            ChargeTotal, PaymentTotal, CreditTotal, TotalCost, Chg_dDisabled
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_financial_data_sage ON financial_data (
+            report_year, report_month, Chg_dDisabled, sChgCategory, sAcctCode, sDefAcctCode,
+            ChargeTotal, PaymentTotal
+        )''',
+    ],
+    # 2: materialized aggregate by period/site/category/account, backfilled.
+    #    Summary reads move to category_summary, so financial_data only needs
+    #    one covering index for re-aggregating groups.
+    [
+        "DROP INDEX IF EXISTS idx_financial_data_summary",
+        "DROP INDEX IF EXISTS idx_financial_data_sage",
+        '''CREATE INDEX IF NOT EXISTS idx_financial_data_groups ON financial_data (
+            report_year, report_month, sChgCategory, sAcctCode, sDefAcctCode, SiteID,
+            ChargeTotal, PaymentTotal, CreditTotal, TotalCost, Chg_dDisabled
+        )''',
+        '''CREATE TABLE IF NOT EXISTS category_summary (
+            report_month TEXT NOT NULL,
+            report_year INTEGER NOT NULL,
+            SiteID TEXT,
+            sChgCategory TEXT,
+            sAcctCode TEXT,
+            sDefAcctCode TEXT,
+            total_charges REAL,
+            total_payments REAL,
+            total_credits REAL,
+            net_total REAL,
+            active_charges REAL,
+            active_payments REAL,
+            transaction_count INTEGER,
+            disabled_count INTEGER
+        )''',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_category_summary_period ON category_summary (
+            report_year DESC, report_month DESC, sChgCategory, sAcctCode, sDefAcctCode, SiteID
+        )''',
+        _LEGACY_CATEGORY_SUMMARY_SQL,
+    ],
+    # 3: sort orders for keyset-paginated browsing (rowid is the implicit tiebreaker)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_financial_data_period ON financial_data (report_year, report_month)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_data_site ON financial_data (SiteID)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_data_category ON financial_data (sChgCategory)",
+    ],
+    # 4: which file each period was last imported from, to skip identical re-imports
+    [
+        '''CREATE TABLE IF NOT EXISTS import_ledger (
+            report_month TEXT NOT NULL,
+            report_year INTEGER NOT NULL,
+            file_hash TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            sheet_signature TEXT,
+            row_count INTEGER NOT NULL,
+            source_path TEXT,
+            imported_at TEXT NOT NULL,
+            PRIMARY KEY (report_year, report_month)
+        )''',
+    ],
+    # 5: repeated text moves to lookup tables keyed by integer ids. Rows move
+    #    to financial_facts, keeping their ids, and financial_data becomes a
+    #    view with the old columns. Missing key text becomes '' as on import,
+    #    so the summaries are rebuilt to match the new keys. Rows that would
+    #    then collide stop the migration rather than being dropped.
+    [
+        "CREATE TABLE IF NOT EXISTS uploads (id INTEGER PRIMARY KEY, upload_date TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS sites (id INTEGER PRIMARY KEY, SiteID TEXT NOT NULL UNIQUE)",
+        '''CREATE TABLE IF NOT EXISTS charge_descriptions (
+            id INTEGER PRIMARY KEY,
+            ChargeDescID TEXT NOT NULL,
+            sChgDesc TEXT NOT NULL,
+            UNIQUE (ChargeDescID, sChgDesc)
+        )''',
+        "CREATE TABLE IF NOT EXISTS charge_categories (id INTEGER PRIMARY KEY, sChgCategory TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS account_codes (id INTEGER PRIMARY KEY, code TEXT NOT NULL UNIQUE)",
+        "INSERT OR IGNORE INTO uploads (upload_date) SELECT DISTINCT upload_date FROM financial_data",
+        "INSERT OR IGNORE INTO sites (SiteID) SELECT DISTINCT COALESCE(SiteID, '') FROM financial_data",
+        '''INSERT OR IGNORE INTO charge_descriptions (ChargeDescID, sChgDesc)
+           SELECT DISTINCT COALESCE(ChargeDescID, ''), COALESCE(sChgDesc, '') FROM financial_data''',
+        '''INSERT OR IGNORE INTO charge_categories (sChgCategory)
+           SELECT DISTINCT COALESCE(sChgCategory, '') FROM financial_data''',
+        '''INSERT OR IGNORE INTO account_codes (code)
+           SELECT sDefAcctCode FROM financial_data WHERE sDefAcctCode IS NOT NULL
+           UNION SELECT sAcctCode FROM financial_data WHERE sAcctCode IS NOT NULL''',
+        FINANCIAL_FACTS_TABLE_SQL,
+        _check_blank_key_collisions,
+        f'''INSERT INTO financial_facts (id, {', '.join(FACT_COLUMNS)})
+           SELECT old.id, old.report_month, old.report_year,
+                  {", ".join(f"{col[:-3]}.id" for col in DIMENSIONS)},
+                  {", ".join(f"old.{col}" for col in MEASURE_COLUMNS)}
+           FROM financial_data old
+           JOIN uploads AS upload ON upload.upload_date = old.upload_date
+           JOIN sites AS site ON site.SiteID = COALESCE(old.SiteID, '')
+           JOIN charge_descriptions AS charge_desc
+             ON charge_desc.ChargeDescID = COALESCE(old.ChargeDescID, '')
+            AND charge_desc.sChgDesc = COALESCE(old.sChgDesc, '')
+           JOIN charge_categories AS category ON category.sChgCategory = COALESCE(old.sChgCategory, '')
+           LEFT JOIN account_codes AS def_account ON def_account.code = old.sDefAcctCode
+           LEFT JOIN account_codes AS account ON account.code = old.sAcctCode''',
+        "DROP TABLE financial_data",
+        FINANCIAL_DATA_VIEW_SQL,
+        "DELETE FROM category_summary",
+        _MIGRATED_CATEGORY_SUMMARY_SQL,
+        _MIGRATED_MONTHLY_SUMMARY_SQL,
+        '''CREATE INDEX IF NOT EXISTS idx_financial_facts_groups ON financial_facts (
+            report_year, report_month, category_id, account_id, def_account_id, site_id,
+            ChargeTotal, PaymentTotal, CreditTotal, TotalCost, Chg_dDisabled
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_financial_facts_period ON financial_facts (report_year, report_month)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_facts_site ON financial_facts (site_id)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_facts_category ON financial_facts (category_id)",
+    ],
+    # 6: sortable period key for month ranges, with covering indexes for
+    #    whole-range and per-category trend reports. A plain column rather
+    #    than a generated one, so those indexes can cover the queries.
+    [
+        "ALTER TABLE category_summary ADD COLUMN period_key INTEGER",
+        f"UPDATE category_summary SET period_key = {PERIOD_KEY_SQL}",
+        '''CREATE INDEX IF NOT EXISTS idx_category_summary_trend ON category_summary (
+            period_key, total_charges, total_payments, total_credits, net_total, transaction_count
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_category_summary_category_trend ON category_summary (
+            sChgCategory, period_key, total_charges, total_payments, total_credits, net_total, transaction_count
+        )''',
+    ],
+    # 7: periods archived to Parquet: their raw rows leave financial_facts
+    #    but their summary rows stay
+    [
+        '''CREATE TABLE IF NOT EXISTS archived_periods (
+            report_month TEXT NOT NULL,
+            report_year INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            file_size INTEGER NOT NULL,
+            archived_at TEXT NOT NULL,
+            PRIMARY KEY (report_year, report_month)
+        )''',
+    ],
+    # 8: per-period data generations tagging cached query results
+    #    (see database.query_cache); existing periods start at "now"
+    [
+        '''CREATE TABLE IF NOT EXISTS data_generations (
+            report_month TEXT NOT NULL,
+            report_year INTEGER NOT NULL,
+            period_key INTEGER NOT NULL,
+            generation INTEGER NOT NULL,
+            PRIMARY KEY (report_year, report_month)
+        )''',
+        f'''INSERT OR IGNORE INTO data_generations
+            SELECT report_month, report_year, {PERIOD_KEY_SQL}, CAST(strftime('%s', 'now') AS INTEGER) * 1000000000
+            FROM monthly_summary''',
+    ],
+    # 9: full-text search over descriptions, categories and account codes,
+    #    backfilled from the stored rows
+    [
+        '''CREATE TABLE IF NOT EXISTS search_documents (
+            id INTEGER PRIMARY KEY,
+            charge_desc_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            account_id INTEGER,
+            def_account_id INTEGER
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_search_documents_key ON search_documents (
+            charge_desc_id, category_id, account_id, def_account_id
+        )''',
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS charge_search USING fts5(
+            {', '.join(SEARCH_TEXT_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_financial_facts_search ON financial_facts (
+            charge_desc_id, category_id, account_id, def_account_id, report_year, report_month, site_id
+        )''',
+        _ADD_SEARCH_DOCUMENTS_SQL.format(source="financial_facts"),
+        _INDEX_SEARCH_DOCUMENTS_SQL,
+    ],
+]
+
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
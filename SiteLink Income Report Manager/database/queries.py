@@ -0,0 +1,548 @@
+"""
+SQL for SiteLink Financial Data
+
+Column lists, statements and query builders for the current schema:
+lookup tables, financial_facts behind the financial_data view, the summary
+tables and full-text search. DatabaseManager runs them, and
+ShardedDatabaseManager reuses them against each shard. How older files
+reach this schema is in database.migrations.
+"""
+import re
+from config.settings import EXPECTED_COLUMNS
+from utils.helpers import parse_period, period_key, validate_date_range
+
+
+# Columns written to financial_data, in insert order
+FINANCIAL_DATA_COLUMNS = [
+    'report_month', 'report_year', 'upload_date', 'SiteID', 'ChargeDescID', 'sChgCategory',
+    'sChgDesc', 'sDefAcctCode', 'sAcctCode', 'Price', 'Charge', 'Discount', 'ChargeTax1',
+    'ChargeTax2', 'ChargeTotal', 'Payment', 'PaymentTax1', 'PaymentTax2', 'PaymentTotal',
+    'Credit', 'CreditTax1', 'CreditTax2', 'CreditTotal', 'TotalCost', 'iCount',
+    'dcPercent', 'Chg_dDisabled', 'Chg_dDeleted'
+]
+
+# Natural key of a charge line within a month (the UNIQUE key of financial_facts)
+KEY_COLUMNS = ['report_month', 'report_year', 'SiteID', 'ChargeDescID', 'sChgCategory', 'sChgDesc']
+
+# Columns compared when deciding whether an existing row changed
+VALUE_COLUMNS = [col for col in EXPECTED_COLUMNS if col not in KEY_COLUMNS]
+
+# Dimensions of the materialized category_summary aggregate below the period
+GROUP_COLUMNS = ['SiteID', 'sChgCategory', 'sAcctCode', 'sDefAcctCode']
+
+_GROUP_COLUMNS = ", ".join(GROUP_COLUMNS)
+
+# Repeated text is stored once per distinct value in lookup tables.
+# financial_facts holds the integer ids, and financial_data is a view that
+# joins the text back in. DIMENSIONS maps each id column of financial_facts
+# to its lookup table and the financial_data columns it stands for.
+DIMENSIONS = {
+    'upload_id': ('uploads', {'upload_date': 'upload_date'}),
+    'site_id': ('sites', {'SiteID': 'SiteID'}),
+    'charge_desc_id': ('charge_descriptions', {'ChargeDescID': 'ChargeDescID', 'sChgDesc': 'sChgDesc'}),
+    'category_id': ('charge_categories', {'sChgCategory': 'sChgCategory'}),
+    'def_account_id': ('account_codes', {'sDefAcctCode': 'code'}),
+    'account_id': ('account_codes', {'sAcctCode': 'code'}),
+}
+
+# Numeric columns, stored as-is in financial_facts
+MEASURE_COLUMNS = FINANCIAL_DATA_COLUMNS[9:]
+
+# Columns written to financial_facts, in insert order
+FACT_COLUMNS = ['report_month', 'report_year'] + list(DIMENSIONS) + MEASURE_COLUMNS
+
+# KEY_COLUMNS, VALUE_COLUMNS and GROUP_COLUMNS in terms of financial_facts
+FACT_KEY_COLUMNS = ['report_year', 'report_month', 'site_id', 'category_id', 'charge_desc_id']
+FACT_VALUE_COLUMNS = ['def_account_id', 'account_id'] + MEASURE_COLUMNS
+FACT_GROUP_COLUMNS = ['site_id', 'category_id', 'account_id', 'def_account_id']
+
+_KEY_MATCH = " AND ".join(f"f.{col} = s.{col}" for col in FACT_KEY_COLUMNS)
+_ROW_DIFFERS = " OR ".join(f"f.{col} IS NOT s.{col}" for col in FACT_VALUE_COLUMNS)
+_ROW_CHANGED = " OR ".join(f"financial_facts.{col} IS NOT excluded.{col}" for col in FACT_VALUE_COLUMNS)
+
+
+def _dimension_joins(alias, columns, outer=('def_account_id', 'account_id')):
+    """JOIN clauses from a facts alias to the lookup tables of the given id columns"""
+    joins = []
+    for column in columns:
+        table = DIMENSIONS[column][0]
+        join = "LEFT JOIN" if column in outer else "JOIN"
+        joins.append(f"{join} {table} AS {column[:-3]} ON {column[:-3]}.id = {alias}.{column}")
+    return "\n    ".join(joins)
+
+
+def _dimension_value(column):
+    """Expression for a financial_data text column through its lookup join"""
+    for id_column, (_, values) in DIMENSIONS.items():
+        if column in values:
+            return f"{id_column[:-3]}.{values[column]}"
+    return column
+
+
+# Incoming row tuples are the import metadata followed by EXPECTED_COLUMNS
+_STAGED_COLUMNS = FINANCIAL_DATA_COLUMNS[:3] + EXPECTED_COLUMNS
+
+STAGE_ROW_SQL = (
+    f"INSERT INTO temp.import_staging ({', '.join(_STAGED_COLUMNS)}) VALUES ("
+    + ", ".join("COALESCE(?, '')" if col in KEY_COLUMNS else "?" for col in _STAGED_COLUMNS)
+    + ")"
+)
+
+# Lookup rows for text values an import introduces; known values keep their id
+ADD_DIMENSIONS_SQL = [
+    "INSERT OR IGNORE INTO uploads (upload_date) SELECT DISTINCT upload_date FROM temp.import_staging",
+    "INSERT OR IGNORE INTO sites (SiteID) SELECT DISTINCT SiteID FROM temp.import_staging",
+    '''INSERT OR IGNORE INTO charge_descriptions (ChargeDescID, sChgDesc)
+       SELECT DISTINCT ChargeDescID, sChgDesc FROM temp.import_staging''',
+    "INSERT OR IGNORE INTO charge_categories (sChgCategory) SELECT DISTINCT sChgCategory FROM temp.import_staging",
+    '''INSERT OR IGNORE INTO account_codes (code)
+       SELECT sDefAcctCode FROM temp.import_staging WHERE sDefAcctCode IS NOT NULL
+       UNION SELECT sAcctCode FROM temp.import_staging WHERE sAcctCode IS NOT NULL''',
+]
+
+# Staged rows with their text replaced by lookup ids
+STAGE_FACTS_SQL = f'''
+    CREATE TEMP TABLE import_facts AS
+    SELECT s.report_month, s.report_year, {", ".join(f"{col[:-3]}.id AS {col}" for col in DIMENSIONS)},
+           {", ".join(f"s.{col}" for col in MEASURE_COLUMNS)}
+    FROM temp.import_staging s
+    JOIN uploads AS upload ON upload.upload_date = s.upload_date
+    JOIN sites AS site ON site.SiteID = s.SiteID
+    JOIN charge_descriptions AS charge_desc
+      ON charge_desc.ChargeDescID = s.ChargeDescID AND charge_desc.sChgDesc = s.sChgDesc
+    JOIN charge_categories AS category ON category.sChgCategory = s.sChgCategory
+    LEFT JOIN account_codes AS def_account ON def_account.code = s.sDefAcctCode
+    LEFT JOIN account_codes AS account ON account.code = s.sAcctCode
+'''
+
+COUNT_NEW_ROWS_SQL = f'''
+    SELECT COUNT(*) FROM temp.import_facts s
+    WHERE NOT EXISTS (SELECT 1 FROM financial_facts f WHERE {_KEY_MATCH})
+'''
+
+DELETE_VANISHED_ROWS_SQL = f'''
+    DELETE FROM financial_facts AS f
+    WHERE f.report_month = ? AND f.report_year = ?
+      AND NOT EXISTS (SELECT 1 FROM temp.import_facts s WHERE {_KEY_MATCH})
+'''
+
+# Groups whose aggregates an import changes: stored rows with no identical
+# staged row (vanished or changed) and staged rows with no identical stored
+# row. Both the ids and the text are kept: facts are matched on the former,
+# category_summary on the latter.
+TOUCH_GROUPS_SQL = f'''
+    INSERT INTO temp.touched_groups ({", ".join(FACT_GROUP_COLUMNS)}, {_GROUP_COLUMNS})
+    SELECT {", ".join(f"g.{col}" for col in FACT_GROUP_COLUMNS)},
+           {", ".join(_dimension_value(col) for col in GROUP_COLUMNS)}
+    FROM (
+        SELECT {", ".join(f"f.{col}" for col in FACT_GROUP_COLUMNS)} FROM financial_facts f
+        WHERE f.report_month = ? AND f.report_year = ?
+          AND NOT EXISTS (
+              SELECT 1 FROM temp.import_facts s WHERE {_KEY_MATCH} AND NOT ({_ROW_DIFFERS})
+          )
+        UNION
+        SELECT {", ".join(f"s.{col}" for col in FACT_GROUP_COLUMNS)} FROM temp.import_facts s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM financial_facts f WHERE {_KEY_MATCH} AND NOT ({_ROW_DIFFERS})
+        )
+    ) g
+    {_dimension_joins("g", FACT_GROUP_COLUMNS)}
+'''
+
+UPSERT_ROWS_SQL = f'''
+    INSERT INTO financial_facts ({', '.join(FACT_COLUMNS)})
+    SELECT {', '.join(FACT_COLUMNS)} FROM temp.import_facts WHERE true
+    ON CONFLICT({', '.join(FACT_KEY_COLUMNS)}) DO UPDATE SET
+        {', '.join(f"{col} = excluded.{col}" for col in FACT_VALUE_COLUMNS + ['upload_id'])}
+    WHERE {_ROW_CHANGED}
+'''
+
+# Sortable month number for period ranges (matches utils.helpers.period_key)
+PERIOD_KEY_SQL = "report_year * 12 + CAST(report_month AS INTEGER) - 1"
+
+CATEGORY_SUMMARY_COLUMNS = [
+    'report_month', 'report_year', 'SiteID', 'sChgCategory', 'sAcctCode', 'sDefAcctCode',
+    'total_charges', 'total_payments', 'total_credits', 'net_total',
+    'active_charges', 'active_payments', 'transaction_count', 'disabled_count', 'period_key'
+]
+
+# Aggregates financial_facts into category_summary rows; callers append the WHERE
+CATEGORY_SUMMARY_SELECT = f'''
+    SELECT
+        f.report_month, f.report_year, {", ".join(_dimension_value(col) for col in GROUP_COLUMNS)},
+        SUM(f.ChargeTotal), SUM(f.PaymentTotal), SUM(f.CreditTotal), SUM(f.TotalCost),
+        SUM(CASE WHEN f.Chg_dDisabled = 0 THEN f.ChargeTotal END),
+        SUM(CASE WHEN f.Chg_dDisabled = 0 THEN f.PaymentTotal END),
+        COUNT(*),
+        SUM(CASE WHEN f.Chg_dDisabled = 1 THEN 1 ELSE 0 END),
+        {PERIOD_KEY_SQL}
+    FROM financial_facts f
+    {_dimension_joins("f", FACT_GROUP_COLUMNS)}
+'''
+
+# Grouping follows idx_financial_facts_groups so aggregation streams in index
+# order; each id stands for exactly one text value, so the groups are the same
+CATEGORY_SUMMARY_GROUPING = (
+    " GROUP BY f.report_year, f.report_month, f.category_id, f.account_id, f.def_account_id, f.site_id"
+)
+
+_TOUCHED_GROUP_MATCH = " AND ".join(f"t.{col} IS c.{col}" for col in GROUP_COLUMNS)
+_TOUCHED_FACT_MATCH = " AND ".join(f"t.{col} IS f.{col}" for col in FACT_GROUP_COLUMNS)
+
+DELETE_TOUCHED_SUMMARY_SQL = f'''
+    DELETE FROM category_summary AS c
+    WHERE c.report_month = ? AND c.report_year = ?
+      AND EXISTS (SELECT 1 FROM temp.touched_groups t WHERE {_TOUCHED_GROUP_MATCH})
+'''
+
+INSERT_TOUCHED_SUMMARY_SQL = (
+    f"INSERT INTO category_summary ({', '.join(CATEGORY_SUMMARY_COLUMNS)})"
+    + CATEGORY_SUMMARY_SELECT
+    + f'''
+    WHERE f.report_month = ? AND f.report_year = ?
+      AND EXISTS (SELECT 1 FROM temp.touched_groups t WHERE {_TOUCHED_FACT_MATCH})
+'''
+    + CATEGORY_SUMMARY_GROUPING
+)
+
+# Compares category_summary against a fresh aggregate of financial_facts and
+# returns the periods where any group is missing, stale or off by > 0.005
+SUMMARY_MISMATCH_QUERY = f'''
+    WITH fresh ({', '.join(CATEGORY_SUMMARY_COLUMNS)}) AS (
+        {CATEGORY_SUMMARY_SELECT} {CATEGORY_SUMMARY_GROUPING}
+    ),
+    compared AS (
+        SELECT fresh.report_month, fresh.report_year
+        FROM fresh LEFT JOIN category_summary c
+          ON c.report_month = fresh.report_month AND c.report_year = fresh.report_year
+         AND {" AND ".join(f"c.{col} IS fresh.{col}" for col in GROUP_COLUMNS)}
+        WHERE c.rowid IS NULL
+           OR c.transaction_count IS NOT fresh.transaction_count
+           OR c.disabled_count IS NOT fresh.disabled_count
+           OR {" OR ".join(
+                f"ABS(COALESCE(c.{col}, 0) - COALESCE(fresh.{col}, 0)) > 0.005"
+                for col in CATEGORY_SUMMARY_COLUMNS[6:12]
+           )}
+        UNION
+        SELECT c.report_month, c.report_year
+        FROM category_summary c LEFT JOIN fresh
+          ON fresh.report_month = c.report_month AND fresh.report_year = c.report_year
+         AND {" AND ".join(f"fresh.{col} IS c.{col}" for col in GROUP_COLUMNS)}
+        WHERE fresh.report_month IS NULL
+          AND (c.report_year, c.report_month) NOT IN (SELECT report_year, report_month FROM archived_periods)
+    )
+    SELECT report_month, report_year FROM compared ORDER BY report_year, report_month
+'''
+
+# Periods whose raw rows live in Parquet archive files (see database.archive)
+ARCHIVED_PERIODS_QUERY = '''
+    SELECT report_month, report_year, file_path, row_count, file_size, archived_at
+    FROM archived_periods
+'''
+
+# Raw rows in a month range, in idx_financial_facts_period order (id last)
+DATA_RANGE_QUERY = f'''
+    SELECT * FROM financial_data
+    WHERE report_year BETWEEN ? AND ? AND {PERIOD_KEY_SQL} BETWEEN ? AND ?
+    ORDER BY report_year, report_month, id
+'''
+
+# Raw rows as stored: lookup ids rather than text, decoded by get_all_data
+ALL_DATA_QUERY = f"SELECT id, {', '.join(FACT_COLUMNS)} FROM financial_facts ORDER BY id"
+
+# Keyset pagination orders for browsing raw rows; each ends with id so the
+# order is total and the last row of a page is a unique cursor
+PAGE_SORT_KEYS = {
+    'id': ['id'],
+    'period': ['report_year', 'report_month', 'id'],
+    'site': ['SiteID', 'id'],
+    'category': ['sChgCategory', 'id'],
+}
+
+# Exact-match filters accepted by get_data_page / count_data
+PAGE_FILTER_COLUMNS = ['report_month', 'report_year', 'SiteID', 'sChgCategory']
+
+FINANCIAL_SUMMARY_QUERY = '''
+    SELECT
+        report_month, report_year, sChgCategory, sAcctCode,
+        SUM(total_charges) as total_charges,
+        SUM(total_payments) as total_payments,
+        SUM(total_credits) as total_credits,
+        SUM(net_total) as net_total,
+        SUM(transaction_count) as transaction_count,
+        SUM(disabled_count) as disabled_charges
+    FROM category_summary
+'''
+
+# Grouping follows idx_category_summary_period so neither step needs a temp B-tree
+FINANCIAL_SUMMARY_GROUPING = '''
+    GROUP BY report_year, report_month, sChgCategory, sAcctCode
+    ORDER BY report_year DESC, report_month DESC, sChgCategory, sAcctCode
+'''
+
+SAGE_EXPORT_QUERY = '''
+    SELECT
+        sChgCategory, sAcctCode, sDefAcctCode,
+        SUM(active_charges) as debit_amount,
+        SUM(active_payments) as credit_amount
+    FROM category_summary
+    WHERE report_month = ? AND report_year = ?
+    GROUP BY sChgCategory, sAcctCode, sDefAcctCode
+    HAVING ABS(debit_amount) + ABS(credit_amount) > 0
+'''
+
+# Multi-period/site variant; {years}, {months}, {periods} and {sites} are
+# filled in per call with placeholders. The separate year/month IN lists let
+# SQLite seek idx_category_summary_period; the row-value IN keeps exactly the
+# requested pairs. Grouping follows the index, with SiteID optionally last.
+SAGE_EXPORT_BATCH_QUERY = '''
+    SELECT
+        report_month, report_year{site_column}, sChgCategory, sAcctCode, sDefAcctCode,
+        SUM(active_charges) as debit_amount,
+        SUM(active_payments) as credit_amount
+    FROM category_summary
+    WHERE report_year IN ({years}) AND report_month IN ({months})
+      AND (report_year, report_month) IN (VALUES {periods}){sites}
+    GROUP BY report_year, report_month, sChgCategory, sAcctCode, sDefAcctCode{site_column}
+    HAVING ABS(debit_amount) + ABS(credit_amount) > 0
+    ORDER BY report_year DESC, report_month DESC, sChgCategory, sAcctCode, sDefAcctCode{site_column}
+'''
+
+# Measures a trend report can compute deltas and rolling totals for
+TREND_MEASURES = ['total_charges', 'total_payments', 'total_credits', 'net_total', 'transaction_count']
+
+# Per-period totals over a range of period_keys, optionally per category,
+# with window deltas computed in the same pass as the aggregation. RANGE
+# frames look back by period_key value rather than by row, so a month with
+# no data gives NULL instead of pairing with an older month. Earlier months
+# are read so the first months in range have comparisons; the outer WHERE
+# drops them. Per category, +period_key keeps SQLite on the
+# (sChgCategory, period_key) index, whose order the windows need. Rows come
+# out in the windows' order, so no ORDER BY (and no extra sort) is needed.
+TREND_QUERY = '''
+    SELECT
+        printf('%04d-%02d', period_key / 12, period_key % 12 + 1) AS period{category},
+        total_charges, total_payments, total_credits, net_total, transaction_count,
+        {measure} - previous_month AS mom_change,
+        ROUND(100.0 * ({measure} - previous_month) / NULLIF(ABS(previous_month), 0), 2) AS mom_pct,
+        {measure} - previous_year AS yoy_change,
+        ROUND(100.0 * ({measure} - previous_year) / NULLIF(ABS(previous_year), 0), 2) AS yoy_pct,
+        rolling_total
+    FROM (
+        SELECT period_key{category},
+               SUM(total_charges) AS total_charges,
+               SUM(total_payments) AS total_payments,
+               SUM(total_credits) AS total_credits,
+               SUM(net_total) AS net_total,
+               SUM(transaction_count) AS transaction_count,
+               SUM(SUM({measure})) OVER (series RANGE BETWEEN 1 PRECEDING AND 1 PRECEDING) AS previous_month,
+               SUM(SUM({measure})) OVER (series RANGE BETWEEN 12 PRECEDING AND 12 PRECEDING) AS previous_year,
+               SUM(SUM({measure})) OVER (series RANGE BETWEEN {window} PRECEDING AND CURRENT ROW) AS rolling_total
+        FROM category_summary
+        WHERE {period_key} BETWEEN ? AND ?
+        GROUP BY {grouping}
+        WINDOW series AS ({partition}ORDER BY period_key)
+    )
+    WHERE period_key >= ?
+'''
+
+MONTHLY_TOTALS_QUERY = '''
+    SELECT
+        SUM(total_charges), SUM(total_payments), SUM(total_credits),
+        SUM(net_total), SUM(transaction_count)
+    FROM category_summary
+    WHERE report_month = ? AND report_year = ?
+'''
+
+# Moves a period's data generation forward; generations are nanosecond
+# stamps but always grow, even if the clock steps back
+BUMP_GENERATION_SQL = f'''
+    INSERT INTO data_generations (report_month, report_year, period_key, generation)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (report_year, report_month)
+    DO UPDATE SET generation = MAX(excluded.generation, generation + 1)
+'''
+
+# Ledger row proving a period still holds exactly what a given file imported:
+# same fingerprint and the same number of stored rows
+UNCHANGED_IMPORT_QUERY = '''
+    SELECT l.row_count FROM import_ledger l
+    WHERE l.report_year = ? AND l.report_month = ? AND l.file_hash = ? AND l.file_size = ?
+      AND l.row_count = (
+          SELECT COUNT(*) FROM financial_facts f
+          WHERE f.report_year = l.report_year AND f.report_month = l.report_month
+      )
+'''
+
+RECORD_IMPORT_SQL = '''
+    INSERT OR REPLACE INTO import_ledger
+    (report_month, report_year, file_hash, file_size, sheet_signature, row_count, source_path, imported_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Full-text search: one search document per distinct combination of
+# description, category and account codes in financial_facts, indexed by
+# the charge_search FTS5 table under the document's id. There are far fewer
+# combinations than rows, so the index stays small and an import only adds
+# the combinations it introduces.
+SEARCH_DOCUMENT_COLUMNS = ['charge_desc_id', 'category_id', 'account_id', 'def_account_id']
+SEARCH_TEXT_COLUMNS = ['sChgDesc', 'sChgCategory', 'sAcctCode', 'sDefAcctCode']
+SEARCH_WEIGHTS = (4.0, 2.0, 1.0, 1.0)  # bm25 weight of each text column
+
+# Rows of a search document (accounts may be NULL)
+_DOCUMENT_MATCH = " AND ".join(
+    f"f.{col} {'IS' if col in ('account_id', 'def_account_id') else '='} d.{col}"
+    for col in SEARCH_DOCUMENT_COLUMNS
+)
+
+_ADD_SEARCH_DOCUMENTS_SQL = f'''
+    INSERT INTO search_documents ({', '.join(SEARCH_DOCUMENT_COLUMNS)})
+    SELECT DISTINCT {', '.join(f"f.{col}" for col in SEARCH_DOCUMENT_COLUMNS)} FROM {{source}} f
+    WHERE NOT EXISTS (SELECT 1 FROM search_documents d WHERE {_DOCUMENT_MATCH})
+'''
+
+_INDEX_SEARCH_DOCUMENTS_SQL = f'''
+    INSERT INTO charge_search (rowid, {', '.join(SEARCH_TEXT_COLUMNS)})
+    SELECT d.id, charge_desc.sChgDesc, category.sChgCategory, account.code, def_account.code
+    FROM search_documents d
+    {_dimension_joins("d", SEARCH_DOCUMENT_COLUMNS)}
+    WHERE d.id > COALESCE((SELECT rowid FROM charge_search ORDER BY rowid DESC LIMIT 1), 0)
+'''
+
+# Run by store_rows once temp.import_facts holds the import's lookup ids
+SYNC_SEARCH_SQL = [
+    _ADD_SEARCH_DOCUMENTS_SQL.format(source="temp.import_facts"),
+    _INDEX_SEARCH_DOCUMENTS_SQL,
+]
+
+# Documents matching an FTS5 expression, best first (bm25: lower is better)
+SEARCH_DOCUMENTS_QUERY = f'''
+    SELECT d.id, {', '.join(f"d.{col}" for col in SEARCH_DOCUMENT_COLUMNS)},
+           bm25(charge_search, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)}) AS rank
+    FROM charge_search JOIN search_documents d ON d.id = charge_search.rowid
+    WHERE charge_search MATCH ?{{category}}
+    ORDER BY rank, d.id
+'''
+
+# Matching rows counted per document and period, and per site
+SEARCH_PERIOD_FACETS_QUERY = f'''
+    SELECT d.id, f.report_year, f.report_month, COUNT(*)
+    FROM search_documents d JOIN financial_facts f ON {_DOCUMENT_MATCH}
+    WHERE d.id IN (SELECT rowid FROM charge_search WHERE charge_search MATCH ?){{conditions}}
+    GROUP BY d.id, f.report_year, f.report_month
+'''
+SEARCH_SITE_FACETS_QUERY = f'''
+    SELECT f.site_id, COUNT(*)
+    FROM search_documents d JOIN financial_facts f ON {_DOCUMENT_MATCH}
+    WHERE d.id IN (SELECT rowid FROM charge_search WHERE charge_search MATCH ?){{conditions}}
+    GROUP BY f.site_id
+'''
+
+# One document's rows, newest period first, after a keyset cursor
+SEARCH_ROWS_QUERY = f'''
+    SELECT f.id, f.report_year, f.report_month, f.site_id
+    FROM financial_facts f
+    WHERE {" AND ".join(f"f.{col} {'IS' if col in ('account_id', 'def_account_id') else '='} ?"
+                      for col in SEARCH_DOCUMENT_COLUMNS)}{{conditions}}
+    ORDER BY f.report_year DESC, f.report_month DESC, f.site_id DESC
+    LIMIT ?
+'''
+
+# Matching rows newest period first, for merging shards (no ranking)
+SEARCH_NEWEST_ROWS_QUERY = f'''
+    SELECT f.id, f.report_year, f.report_month, d.id
+    FROM financial_facts f JOIN search_documents d ON {_DOCUMENT_MATCH}
+    WHERE d.id IN (SELECT rowid FROM charge_search WHERE charge_search MATCH ?){{conditions}}
+    ORDER BY f.report_year DESC, f.report_month DESC, f.id DESC
+    LIMIT ?
+'''
+
+
+def _period_conditions(report_month=None, report_year=None, start=None, end=None):
+    """WHERE conditions and parameters selecting periods of a summary table"""
+    conditions, params = [], []
+    if report_month:
+        conditions.append("report_month = ?")
+        params.append(report_month)
+    if report_year:
+        conditions.append("report_year = ?")
+        params.append(report_year)
+    if start or end:
+        first, last = _period_range(start, end)
+        # The year bounds let SQLite seek idx_category_summary_period
+        conditions.append("report_year BETWEEN ? AND ? AND period_key BETWEEN ? AND ?")
+        params.extend([first // 12, last // 12, first, last])
+    return conditions, params
+
+
+def _match_expression(text):
+    """FTS5 expression requiring every word of text as a prefix; no FTS syntax is interpreted"""
+    words = re.findall(r'\w+', str(text or ''))
+    if not words:
+        raise ValueError("Search text must contain at least one letter or digit")
+    return " AND ".join(f'"{word}"*' for word in words)
+
+
+def _period_range(start, end):
+    """Period keys of an inclusive 'YYYY-MM' range; either end may be open"""
+    start = start or "0001-01"
+    end = end or "9999-12"
+    if not validate_date_range(start, end):
+        raise ValueError(f"Invalid month range '{start}' to '{end}' (expected YYYY-MM, start <= end)")
+    return period_key(*parse_period(start)), period_key(*parse_period(end))
+
+
+def _financial_summary_query(report_month=None, report_year=None, start=None, end=None):
+    """Build the summary query and parameters for the given filters"""
+    query = FINANCIAL_SUMMARY_QUERY
+    conditions, params = _period_conditions(report_month, report_year, start, end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    return query + FINANCIAL_SUMMARY_GROUPING, params
+
+
+def _trend_query(start, end, by_category=False, measure='net_total', rolling_months=3):
+    """Build the trend query and parameters for a range of months"""
+    if measure not in TREND_MEASURES:
+        raise ValueError(f"Cannot report trends of '{measure}'")
+    if int(rolling_months) < 1:
+        raise ValueError("rolling_months must be at least 1")
+    first, last = _period_range(start, end)
+    lookback = max(12, int(rolling_months) - 1)
+    query = TREND_QUERY.format(
+        category=", sChgCategory" if by_category else "",
+        grouping="sChgCategory, period_key" if by_category else "period_key",
+        partition="PARTITION BY sChgCategory " if by_category else "",
+        period_key="+period_key" if by_category else "period_key",
+        measure=measure,
+        window=int(rolling_months) - 1,
+    )
+    return query, [first - lookback, last, first]
+
+
+def _sage_export_batch_query(periods, site_ids=None, by_site=False):
+    """Build the batch Sage export query and parameters"""
+    periods = [(report_month, int(report_year)) for report_month, report_year in periods]
+    if not periods:
+        raise ValueError("At least one (report_month, report_year) period is required")
+
+    years = sorted({year for _, year in periods})
+    months = sorted({month for month, _ in periods})
+    params = years + months
+    for report_month, report_year in periods:
+        params.extend([report_year, report_month])
+    sites = ""
+    if site_ids:
+        site_ids = list(site_ids)
+        sites = f" AND SiteID IN ({', '.join('?' for _ in site_ids)})"
+        params.extend(site_ids)
+
+    query = SAGE_EXPORT_BATCH_QUERY.format(
+        years=", ".join("?" for _ in years),
+        months=", ".join("?" for _ in months),
+        periods=", ".join("(?, ?)" for _ in periods),
+        sites=sites,
+        site_column=", SiteID" if by_site else "",
+    )
+    return query, params
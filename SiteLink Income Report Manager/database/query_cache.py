@@ -0,0 +1,144 @@
+"""
+Generation-versioned cache of query results
+
+Summaries and Sage exports only change when a period's data does, so
+their results are kept in an in-process LRU keyed by the query, its
+parameters and the data generation of every period it reads. Each period
+has a generation in the data_generations table that moves forward whenever
+its summary is recomputed (see DatabaseManager.create_monthly_summary), so
+an import changes the key of exactly the results that read that period and
+stale entries are simply never looked up again.
+
+With a spill directory, entries evicted from memory are pickled there and
+loaded back on a later miss, by this process or another one using the same
+directory. Generations are nanosecond timestamps, so they never repeat,
+even after a database reset, and a spilled entry cannot be mistaken for a
+fresh one.
+
+Only the standard library is imported here.
+"""
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from config.settings import QUERY_CACHE_DIR, QUERY_CACHE_MAX_FILES, QUERY_CACHE_SIZE
+
+_MISSING = object()
+
+
+def cache_key(*parts):
+    """Stable hex digest of a key made of str/int/float/None/tuple parts"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _copy(value):
+    # Callers may modify what they get back; DataFrames are copied, (columns, rows) re-listed
+    if hasattr(value, 'copy') and hasattr(value, 'columns'):
+        return value.copy()
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], list):
+        return list(value[0]), list(value[1])
+    return value
+
+
+class QueryCache:
+    """
+    Thread-safe LRU of query results with optional on-disk spillover.
+
+    max_entries results are kept in memory (0 disables the cache). When a
+    directory is given, evicted entries are written there and at most
+    max_files spilled results are kept, least recently used removed first.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, directory=QUERY_CACHE_DIR, max_files=QUERY_CACHE_MAX_FILES):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        """Return a copy of the cached value for key, or None on a miss"""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(value)
+        value = self._load(key)
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.put(key, value)
+        return _copy(value)
+
+    def put(self, key, value):
+        """Cache value under key, spilling the least recently used entries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = _copy(value)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        for evicted_key, evicted_value in evicted:
+            self._spill(evicted_key, evicted_value)
+
+    def clear(self):
+        """Drop every in-memory entry (spilled files stay until pruned)"""
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, key):
+        if self.directory is None:
+            return _MISSING
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception:
+            # A truncated or incompatible file is just a cache miss
+            path.unlink(missing_ok=True)
+            return _MISSING
+        path.touch()
+        return value
+
+    def _spill(self, key, value):
+        if self.directory is None or self.max_files <= 0:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        partial = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        with open(partial, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        partial.replace(path)
+        self.spilled += 1
+
+        spilled = sorted(self.directory.glob('*.pkl'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in spilled[self.max_files:]:
+            stale.unlink(missing_ok=True)
+
+    def cached(self, key, compute):
+        """Return the cached value for key, computing and caching it on a miss"""
+        if not self.enabled:
+            return compute()
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
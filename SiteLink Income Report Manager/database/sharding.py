@@ -0,0 +1,674 @@
+"""
+Sharded storage for SiteLink Financial Data
+
+With many facilities in one database file, every import holds the single
+write lock and the file grows without bound. ShardedDatabaseManager keeps
+each year's (or each site's) data in its own SQLite file instead, each a
+complete database with the usual schema. Shards are opened on first use.
+Archiving (see database.archive) works shard by shard.
+
+Imports are routed to the shards their rows belong to, and different
+shards are written in parallel. Summary and Sage export reads fan out to
+the relevant shards on a thread pool (sqlite3 releases the GIL while a
+query runs) and their partial aggregates are summed into one result.
+Merged results are cached, tagged with every relevant shard's data
+generations (see database.query_cache).
+"""
+import re
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from config.settings import EXPECTED_COLUMNS, IMPORT_CHUNK_SIZE, SHARD_BY, SHARD_DIRECTORY, SHARD_WORKERS
+from database.db_manager import DatabaseManager, _compact_frame, _frame_import
+from database.queries import (
+    FINANCIAL_DATA_COLUMNS, PAGE_SORT_KEYS, SAGE_EXPORT_QUERY, _financial_summary_query, _match_expression,
+    _period_range, _sage_export_batch_query, _trend_query
+)
+from database.query_cache import QueryCache, cache_key
+from utils.instrumentation import connection_factory, instrumented
+
+SHARD_KEYS = ('year', 'site')
+
+# Shards attached to one connection at once (SQLite's default limit)
+ATTACH_LIMIT = 10
+
+# Where a summary query reads its table, swapped for a union of shards
+_SUMMARY_SOURCE = re.compile(r'\bFROM category_summary\b')
+
+SUMMARY_COLUMNS = [
+    'report_month', 'report_year', 'sChgCategory', 'sAcctCode', 'total_charges', 'total_payments',
+    'total_credits', 'net_total', 'transaction_count', 'disabled_charges'
+]
+SAGE_EXPORT_COLUMNS = ['sChgCategory', 'sAcctCode', 'sDefAcctCode', 'debit_amount', 'credit_amount']
+SAGE_AMOUNT_COLUMNS = ['debit_amount', 'credit_amount']
+
+_SITE_POSITION = EXPECTED_COLUMNS.index('SiteID')
+
+# Scratch table a site-sharded import is spilled to, tagged with each row's shard
+_SPILL_COLUMNS = [f"c{position}" for position in range(len(EXPECTED_COLUMNS))]
+_SPILL_TABLE_SQL = f"CREATE TABLE spilled_rows (shard TEXT NOT NULL, {', '.join(_SPILL_COLUMNS)})"
+_SPILL_ROW_SQL = f"INSERT INTO spilled_rows VALUES (?, {', '.join('?' for _ in _SPILL_COLUMNS)})"
+_SPILLED_ROWS_QUERY = f"SELECT {', '.join(_SPILL_COLUMNS)} FROM spilled_rows WHERE shard = ? ORDER BY rowid"
+
+# Per-month, per-category totals the trend query is run over once merged
+_TREND_TOTALS_COLUMNS = [
+    'period_key', 'sChgCategory', 'total_charges', 'total_payments', 'total_credits', 'net_total',
+    'transaction_count'
+]
+_TREND_TOTALS_QUERY = f'''
+    SELECT {', '.join(_TREND_TOTALS_COLUMNS[:2])},
+           {', '.join(f"SUM({column}) AS {column}" for column in _TREND_TOTALS_COLUMNS[2:])}
+    FROM category_summary
+    WHERE period_key BETWEEN ? AND ?
+    GROUP BY period_key, sChgCategory
+'''
+
+# Copies one stored period in EXPECTED_COLUMNS order, for copy_from
+_PERIOD_ROWS_QUERY = (
+    f"SELECT {', '.join(EXPECTED_COLUMNS)} FROM financial_data "
+    f"WHERE report_month = ? AND report_year = ? ORDER BY id"
+)
+
+
+def open_database(read_only=False):
+    """Return the configured database: sharded if SHARD_BY is set, else the single file"""
+    if SHARD_BY:
+        return ShardedDatabaseManager(SHARD_BY, read_only=read_only)
+    return DatabaseManager(read_only=read_only)
+
+
+def _site_shard(site_id):
+    """Shard key of a site: its ID with characters unsafe in file names replaced"""
+    return re.sub(r'[^\w-]', '_', str(site_id)) or '_'
+
+
+def _spill_by_site(path, chunks):
+    """
+    Write every row of chunks to a new scratch database at path, tagged with
+    its site shard. Returns the number of rows and the shard keys seen.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(_SPILL_TABLE_SQL)
+        rows_read = 0
+        for chunk in chunks:
+            rows = [(_site_shard(row[_SITE_POSITION]),) + tuple(row) for row in chunk]
+            conn.executemany(_SPILL_ROW_SQL, rows)
+            rows_read += len(rows)
+        conn.execute("CREATE INDEX spilled_rows_shard ON spilled_rows (shard)")
+        conn.commit()
+        return rows_read, [key for key, in conn.execute("SELECT DISTINCT shard FROM spilled_rows")]
+    finally:
+        conn.close()
+
+
+def _merge_groups(results, key_length):
+    """
+    Combine per-shard aggregate rows that share their first key_length
+    values, summing the rest. NULL sums stay NULL only if NULL everywhere.
+    """
+    merged = {}
+    for rows in results:
+        for row in rows:
+            key = tuple(row[:key_length])
+            totals = merged.get(key)
+            if totals is None:
+                merged[key] = list(row[key_length:])
+                continue
+            for position, value in enumerate(row[key_length:]):
+                if value is not None:
+                    totals[position] = value if totals[position] is None else totals[position] + value
+    return [key + tuple(totals) for key, totals in merged.items()]
+
+
+def _text_order(value):
+    """Sort key ordering text like SQLite: NULL first"""
+    return (value is not None, value or '')
+
+
+@instrumented('shard', 'shard_path', 'shard_keys', 'close', 'cached_query')
+class ShardedDatabaseManager:
+    """
+    Stores data in one DatabaseManager file per shard.
+
+    shard_by is 'year' (sitelink_2024.db, ...) or 'site'
+    (sitelink_site_L001.db, ...). Sites whose IDs only differ in characters
+    not allowed in file names share a shard, which is harmless since every
+    query still groups by SiteID. With read_only, every shard is opened
+    read-only and no shard files are created.
+    """
+
+    def __init__(self, shard_by=SHARD_BY, directory=SHARD_DIRECTORY, workers=SHARD_WORKERS, read_only=False):
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"Cannot shard by '{shard_by}' (expected one of {', '.join(SHARD_KEYS)})")
+        self.shard_by = shard_by
+        self.directory = Path(directory)
+        self.workers = max(1, workers)
+        self.read_only = read_only
+        self._prefix = "sitelink_" if shard_by == 'year' else "sitelink_site_"
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.query_cache = QueryCache()
+
+    def shard_path(self, key):
+        return self.directory / f"{self._prefix}{key}.db"
+
+    def shard_keys(self):
+        """Keys of the shards that exist on disk, sorted"""
+        keys = [path.stem[len(self._prefix):] for path in self.directory.glob(f"{self._prefix}*.db")]
+        if self.shard_by == 'year':
+            keys = [key for key in keys if key.isdigit()]
+        return sorted(keys)
+
+    def shard(self, key):
+        """Return the DatabaseManager of one shard, creating its file if needed"""
+        key = str(key)
+        with self._lock:
+            db_manager = self._shards.get(key)
+            if db_manager is None:
+                if not self.read_only:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                db_manager = self._shards[key] = DatabaseManager(self.shard_path(key), self.read_only)
+            return db_manager
+
+    def shards(self):
+        """(key, DatabaseManager) of every shard on disk"""
+        return [(key, self.shard(key)) for key in self.shard_keys()]
+
+    def close(self):
+        """Stop the worker threads and close every open shard"""
+        with self._lock:
+            shards, self._shards = list(self._shards.values()), {}
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        for db_manager in shards:
+            db_manager.close()
+
+    def _map(self, func, items):
+        """Run func(item) for each item on the worker threads; return results in order"""
+        if len(items) < 2:
+            return [func(item) for item in items]
+        with self._lock:
+            # Kept for the manager's lifetime so each worker thread reuses
+            # its pooled connection to every shard
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="shard")
+            executor = self._executor
+        return list(executor.map(func, items))
+
+    def _fan_out(self, func, keys):
+        """Run func(shard) for each key's DatabaseManager, in parallel"""
+        return self._map(func, [self.shard(key) for key in keys])
+
+    def _aggregate(self, query, params, keys):
+        """
+        Run a category_summary query over the given shards; return
+        (columns, one list of rows per group of shards).
+
+        Shards are split into groups of at most ATTACH_LIMIT, one per
+        worker where possible. Each group's files are attached read-only to
+        a scratch connection where category_summary stands for the UNION
+        ALL of their tables, so SQLite merges the group's rows itself and
+        only one partial aggregate per group comes back to Python.
+        """
+        if len(_SUMMARY_SOURCE.findall(query)) != 1:
+            raise ValueError("Query must read category_summary exactly once")
+        size = max(1, min(ATTACH_LIMIT, -(-len(keys) // self.workers)))
+        groups = [keys[start:start + size] for start in range(0, len(keys), size)]
+        paths = {key: self.shard(key).db_path for key in keys}  # opening migrates the schema
+
+        def run(group):
+            # uri=True so ATTACH honours the shards' mode=ro URIs on every SQLite build
+            conn = sqlite3.connect("file::memory:", uri=True, factory=connection_factory())
+            try:
+                for number, key in enumerate(group):
+                    conn.execute(f"ATTACH DATABASE ? AS shard{number}",
+                                 (f"{Path(paths[key]).resolve().as_uri()}?mode=ro",))
+                union = " UNION ALL ".join(
+                    f"SELECT * FROM shard{number}.category_summary" for number in range(len(group))
+                )
+                cursor = conn.execute(_SUMMARY_SOURCE.sub(f"FROM ({union}) AS category_summary", query), params)
+                return [column[0] for column in cursor.description], cursor.fetchall()
+            finally:
+                conn.close()
+
+        results = self._map(run, groups)
+        return (results[0][0] if results else None), [rows for _, rows in results]
+
+    def _keys_for(self, report_year=None, start=None, end=None, site_ids=None, years=None):
+        """Existing shards that can hold data matching the given filters"""
+        keys = self.shard_keys()
+        if self.shard_by == 'year':
+            if report_year is not None:
+                years = [report_year]
+            if years is not None:
+                wanted = {str(int(year)) for year in years}
+                keys = [key for key in keys if key in wanted]
+            if start or end:
+                first, last = _period_range(start, end)
+                keys = [key for key in keys if first // 12 <= int(key) <= last // 12]
+        elif site_ids:
+            wanted = {_site_shard(site_id) for site_id in site_ids}
+            keys = [key for key in keys if key in wanted]
+        return keys
+
+    # Writes
+
+    def store_data(self, df, source=None):
+        """Store a DataFrame, routing its rows to their shards; see DatabaseManager.store_data"""
+        report_month, report_year, upload_date, chunks = _frame_import(df)
+        return self.store_rows(report_month, report_year, chunks, upload_date=upload_date, source=source)
+
+    def store_rows(self, report_month, report_year, chunks, upload_date=None, progress=None,
+                   source=None):
+        """
+        Synchronize one month's data across shards; see DatabaseManager.store_rows.
+
+        By year, the rows stream into that year's shard in one transaction.
+        By site, they are first spilled to a scratch SQLite file tagged with
+        their shard, so memory stays bounded however large the import; each
+        site's shard is then synchronized from it in its own transaction,
+        several at a time. Shards that held the month but have no rows in
+        this import are emptied. A failure or cancellation leaves shards
+        already written committed.
+        """
+        if self.shard_by == 'year':
+            return self.shard(int(report_year)).store_rows(
+                report_month, report_year, chunks, upload_date, progress, source
+            )
+
+        with tempfile.TemporaryDirectory(prefix="sitelink-import-") as scratch:
+            spill_path = Path(scratch) / "rows.db"
+            rows_read, held = _spill_by_site(spill_path, chunks)
+            filters = {'report_month': report_month, 'report_year': report_year}
+            others = [key for key in self.shard_keys() if key not in held]
+            keys = sorted(held + [
+                key for key, count in zip(
+                    others, self._fan_out(lambda db_manager: db_manager.count_data(filters), others)
+                ) if count
+            ])
+            if progress:
+                progress('merging', rows_read=rows_read)
+
+            def write(key):
+                conn = sqlite3.connect(spill_path)
+                try:
+                    cursor = conn.execute(_SPILLED_ROWS_QUERY, (key,))
+                    return self.shard(key).store_rows(
+                        report_month, report_year, iter(lambda: cursor.fetchmany(IMPORT_CHUNK_SIZE), []),
+                        upload_date, source=source
+                    )
+                finally:
+                    conn.close()
+
+            totals = {'rows': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'skipped': False}
+            for stats in self._map(write, keys):
+                for name in ('rows', 'inserted', 'updated', 'deleted', 'unchanged'):
+                    totals[name] += stats[name]
+        if progress:
+            progress('written', rows_written=totals['inserted'] + totals['updated'] + totals['deleted'])
+        return totals
+
+    def unchanged_import(self, report_month, report_year, file_hash, file_size):
+        """Return import counts if every shard holding the month still holds exactly this file"""
+        keys = self._keys_for(report_year=report_year) if self.shard_by == 'year' else self.shard_keys()
+        results = self._fan_out(
+            lambda db_manager: db_manager.unchanged_import(report_month, report_year, file_hash, file_size),
+            keys
+        )
+        if self.shard_by == 'year':
+            return results[0] if results else None
+        # Shards the file never touched have no ledger entry for the month
+        # and no rows for it either, so they only need checking for rows
+        hits = [stats for stats in results if stats is not None]
+        if not hits:
+            return None
+        filters = {'report_month': report_month, 'report_year': report_year}
+        for key, stats in zip(keys, results):
+            if stats is None and self.shard(key).count_data(filters):
+                return None
+        rows = sum(stats['rows'] for stats in hits)
+        return {'rows': rows, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': rows, 'skipped': True}
+
+    def copy_from(self, db_manager, progress=None):
+        """
+        Copy every period of an unsharded database into the shards.
+
+        The source is left untouched. Returns the number of rows copied.
+        """
+        conn = db_manager.connection()
+        periods = conn.execute(
+            "SELECT DISTINCT report_year, report_month FROM category_summary ORDER BY report_year, report_month"
+        ).fetchall()
+        copied = 0
+        for report_year, report_month in periods:
+            upload_date = conn.execute(
+                "SELECT MAX(upload_date) FROM financial_data WHERE report_month = ? AND report_year = ?",
+                (report_month, report_year)
+            ).fetchone()[0]
+            cursor = conn.execute(_PERIOD_ROWS_QUERY, (report_month, report_year))
+            chunks = iter(lambda: cursor.fetchmany(IMPORT_CHUNK_SIZE), [])
+            copied += self.store_rows(report_month, report_year, chunks, upload_date)['rows']
+            if progress:
+                progress('copying', rows_written=copied)
+        return copied
+
+    def rebuild_category_summary(self, report_month=None, report_year=None):
+        """Rebuild the summary tables of every shard holding the period"""
+        keys = self._keys_for(report_year=report_year)
+        self._fan_out(lambda db_manager: db_manager.rebuild_category_summary(report_month, report_year), keys)
+
+    def reset_database(self):
+        """Reset every shard - use only if needed"""
+        self._fan_out(lambda db_manager: db_manager.reset_database(), self.shard_keys())
+        self.query_cache.clear()
+
+    def check_category_summary(self, repair=False):
+        """Return the periods whose summary disagrees with the raw rows in any shard"""
+        results = self._fan_out(lambda db_manager: db_manager.check_category_summary(repair), self.shard_keys())
+        return sorted({period for mismatched in results for period in mismatched},
+                      key=lambda period: (period[1], period[0]))
+
+    # Reads
+
+    def data_generations(self, report_month=None, report_year=None, start=None, end=None, periods=None):
+        """Data generations of the matching periods in every shard that can hold them, by shard key"""
+        years = None if periods is None else {int(year) for _, year in periods}
+        keys = self._keys_for(report_year=report_year or None, start=start, end=end, years=years)
+        return tuple(
+            (key, self.shard(key).data_generations(report_month, report_year, start, end, periods))
+            for key in keys
+        )
+
+    def cached_query(self, name, params, compute, **scope):
+        """Return compute() through the query cache; see DatabaseManager.cached_query"""
+        if not self.query_cache.enabled:
+            return compute()
+        key = cache_key(str(self.directory), self.shard_by, name, tuple(params), self.data_generations(**scope))
+        return self.query_cache.cached(key, compute)
+
+    def count_data(self, filters=None):
+        """Count stored rows matching filters across shards"""
+        filters = filters or {}
+        keys = self._keys_for(report_year=filters.get('report_year') or None,
+                              site_ids=[filters['SiteID']] if filters.get('SiteID') else None)
+        return sum(self._fan_out(lambda db_manager: db_manager.count_data(filters), keys))
+
+    def iter_data_rows(self, filters=None, batch_size=IMPORT_CHUNK_SIZE):
+        """
+        Stream raw rows shard by shard; see DatabaseManager.iter_data_rows.
+
+        ids are only unique within a shard.
+        """
+        filters = filters or {}
+        keys = self._keys_for(report_year=filters.get('report_year') or None,
+                              site_ids=[filters['SiteID']] if filters.get('SiteID') else None)
+        streams = [self.shard(key).iter_data_rows(filters, batch_size) for key in keys]
+        if not streams:
+            return ['id'] + FINANCIAL_DATA_COLUMNS, iter(())
+
+        def rows():
+            for _, shard_rows in streams:
+                yield from shard_rows
+        return streams[0][0], rows()
+
+    def iter_data_range(self, start=None, end=None, batch_size=IMPORT_CHUNK_SIZE):
+        """
+        Stream raw rows of a month range shard by shard; see
+        DatabaseManager.iter_data_range. Rows are in period order within
+        each shard (overall too when sharded by year).
+        """
+        streams = [self.shard(key).iter_data_range(start, end, batch_size)
+                   for key in self._keys_for(start=start, end=end)]
+        if not streams:
+            return ['id'] + FINANCIAL_DATA_COLUMNS, iter(())
+
+        def rows():
+            for _, shard_rows in streams:
+                yield from shard_rows
+        return streams[0][0], rows()
+
+    def get_all_data(self, include_archived=False):
+        """Get all raw data from every shard as one compact DataFrame; ids are only unique within a shard"""
+        import pandas as pd
+        frames = self._fan_out(lambda db_manager: db_manager.get_all_data(include_archived), self.shard_keys())
+        if not frames:
+            return pd.DataFrame()
+        return _compact_frame(pd.concat(frames, ignore_index=True))
+
+    def get_data_range(self, start=None, end=None, include_archived=False):
+        """Get raw rows of a month range from every shard holding it; see DatabaseManager.get_data_range"""
+        import pandas as pd
+        frames = self._fan_out(
+            lambda db_manager: db_manager.get_data_range(start, end, include_archived),
+            self._keys_for(start=start, end=end)
+        )
+        if not frames:
+            return pd.DataFrame(columns=['id'] + FINANCIAL_DATA_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        # Each shard's rows are in period order; by site the periods interleave
+        df = df.sort_values(['report_year', 'report_month'], kind='stable', ignore_index=True)
+        return _compact_frame(df)
+
+    def archived_periods(self):
+        """List the archived periods of every shard, oldest first"""
+        periods = [period for periods in self._fan_out(lambda db_manager: db_manager.archived_periods(),
+                                                       self.shard_keys())
+                   for period in periods]
+        return sorted(periods, key=lambda period: (period['report_year'], period['report_month']))
+
+    def get_financial_summary_rows(self, report_month=None, report_year=None, start=None, end=None):
+        """Get the financial summary as (columns, rows), merged across shards"""
+        keys = self._keys_for(report_year=report_year, start=start, end=end)
+        query, params = _financial_summary_query(report_month, report_year, start, end)
+
+        def compute():
+            columns, results = self._aggregate(query, params, keys)
+            if len(results) < 2:
+                return list(SUMMARY_COLUMNS), results[0] if results else []
+            rows = _merge_groups(results, 4)
+            # Same order as FINANCIAL_SUMMARY_GROUPING: newest period first
+            rows.sort(key=lambda row: (_text_order(row[2]), _text_order(row[3])))
+            rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+            return columns, rows
+        return self.cached_query('financial_summary_rows', params, compute, report_month=report_month,
+                                 report_year=report_year, start=start, end=end)
+
+    def get_financial_summary(self, report_month=None, report_year=None, start=None, end=None):
+        """Get the financial summary merged across shards; see DatabaseManager.get_financial_summary"""
+        import pandas as pd
+        columns, rows = self.get_financial_summary_rows(report_month, report_year, start, end)
+        return _compact_frame(pd.DataFrame(rows, columns=columns))
+
+    def get_monthly_totals(self, report_month, report_year):
+        """Get one month's monthly_summary totals summed across shards, or None"""
+        keys = self._keys_for(report_year=report_year)
+        rows = [row for row in self._fan_out(
+            lambda db_manager: db_manager.get_monthly_totals(report_month, report_year), keys
+        ) if row]
+        if not rows:
+            return None
+        return {column: sum(row[column] or 0 for row in rows) for column in rows[0]}
+
+    def get_sage_export_data(self, report_month, report_year):
+        """Get data formatted for Sage GLS export, merged across shards"""
+        import pandas as pd
+        keys = self._keys_for(report_year=report_year)
+
+        def compute():
+            _, results = self._aggregate(SAGE_EXPORT_QUERY, [report_month, report_year], keys)
+            # Groups can cancel out between shards, so HAVING is applied again
+            rows = [row for row in _merge_groups(results, 3) if abs(row[3] or 0) + abs(row[4] or 0) > 0]
+            return pd.DataFrame(rows, columns=SAGE_EXPORT_COLUMNS)
+        return self.cached_query('sage_export', [report_month, report_year], compute,
+                                 periods=[(report_month, report_year)])
+
+    def get_sage_export_batch(self, periods, site_ids=None, by_site=False):
+        """Get Sage export rows for many periods, merged across shards; see DatabaseManager"""
+        import pandas as pd
+        periods = list(periods)
+        query, params = _sage_export_batch_query(periods, site_ids, by_site)
+        keys = self._keys_for(site_ids=site_ids, years={int(report_year) for _, report_year in periods})
+
+        def compute():
+            columns, results = self._aggregate(query, params, keys)
+            columns = columns or ['report_month', 'report_year'] + (['SiteID'] if by_site else []) + SAGE_EXPORT_COLUMNS
+            if len(results) > 1:
+                rows = [row for row in _merge_groups(results, len(columns) - 2)
+                        if abs(row[-2] or 0) + abs(row[-1] or 0) > 0]
+                # Same order as SAGE_EXPORT_BATCH_QUERY: newest period first, SiteID last
+                rows.sort(key=lambda row: tuple(_text_order(value) for value in row[-5:-2] + row[2:-5]))
+                rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+            else:
+                rows = results[0] if results else []
+            return pd.DataFrame(rows, columns=columns)
+        return self.cached_query('sage_export_batch', params + [by_site], compute, periods=periods)
+
+    def get_trend_report(self, start, end, by_category=False, measure='net_total', rolling_months=3):
+        """Get the trend report over all shards; see DatabaseManager.get_trend_report"""
+        import pandas as pd
+        columns, rows = self.get_trend_rows(start, end, by_category, measure, rolling_months)
+        return _compact_frame(pd.DataFrame(rows, columns=columns))
+
+    def get_trend_rows(self, start, end, by_category=False, measure='net_total', rolling_months=3):
+        """
+        Get the trend report as (columns, rows) without pandas.
+
+        Window functions need each series whole, so the shards' monthly
+        (per category) totals are merged first and the trend query then
+        runs over them in a scratch in-memory database.
+        """
+        query, params = _trend_query(start, end, by_category, measure, rolling_months)
+        low, high = params[0], params[1]
+        keys = self._keys_for(years=range(low // 12, high // 12 + 1))
+        _, results = self._aggregate(_TREND_TOTALS_QUERY, [low, high], keys)
+
+        conn = sqlite3.connect("file::memory:", uri=True, factory=connection_factory())
+        try:
+            conn.execute(f"CREATE TABLE category_summary ({', '.join(_TREND_TOTALS_COLUMNS)})")
+            conn.executemany(
+                f"INSERT INTO category_summary VALUES ({', '.join('?' for _ in _TREND_TOTALS_COLUMNS)})",
+                _merge_groups(results, 2)
+            )
+            cursor = conn.execute(query, params)
+            return [column[0] for column in cursor.description], cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_data_page(self, filters=None, sort='id', descending=False, after=None, limit=100):
+        """
+        Fetch one page of raw rows merged across shards; see DatabaseManager.get_data_page.
+
+        Every shard returns its own next page and the pages are merged on
+        the sort key. ids are only unique within a shard, so the shard key
+        breaks ties and is appended to the cursor.
+        """
+        if sort not in PAGE_SORT_KEYS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        filters = filters or {}
+        keys = self._keys_for(report_year=filters.get('report_year') or None,
+                              site_ids=[filters['SiteID']] if filters.get('SiteID') else None)
+        cursor_key = None
+        if after is not None:
+            after, cursor_key = tuple(after[:-1]), str(after[-1])
+
+        def page(key):
+            shard_after = after
+            if after is not None and (key < cursor_key if descending else key > cursor_key):
+                # Later shards also hold the rows tied with the cursor row;
+                # ids are integers, so moving the id by one includes them
+                shard_after = after[:-1] + (after[-1] + (1 if descending else -1),)
+            return self.shard(key).get_data_page(filters, sort, descending, shard_after, limit)
+
+        results = self._map(page, keys)
+        if not results:
+            return ['id'] + FINANCIAL_DATA_COLUMNS, [], None
+        columns = results[0][0]
+        positions = [columns.index(column) for column in PAGE_SORT_KEYS[sort]]
+        merged = [
+            (tuple(row[position] for position in positions) + (key,), row)
+            for key, (_, rows, _) in zip(keys, results) for row in rows
+        ]
+        merged.sort(key=lambda item: item[0], reverse=descending)
+        more = len(merged) > limit or any(next_cursor for _, _, next_cursor in results)
+        merged = merged[:limit]
+        next_cursor = merged[-1][0] if more and merged else None
+        return columns, [row for _, row in merged], next_cursor
+
+    def explain_queries(self):
+        """Plans of the built-in queries in every shard, named "shard: query"; see DatabaseManager"""
+        return [
+            dict(entry, query=f"{key}: {entry['query']}")
+            for key, db_manager in self.shards() for entry in db_manager.explain_queries()
+        ]
+
+    def search(self, text, site_ids=None, start=None, end=None, category=None, after=None, limit=50,
+               facets=True):
+        """
+        Search every shard holding the range; see DatabaseManager.search.
+
+        Each shard ranks against its own rows, so bm25 scores do not compare
+        across shards: rows come newest period first, then by shard key and
+        id descending, and score is only the row's rank within its shard.
+        The cursor is (shard key, report_year, report_month, id). Facet
+        counts are summed over the shards.
+        """
+        _match_expression(text)
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        keys = self._keys_for(start=start, end=end, site_ids=site_ids)
+        cursor_key = str(after[0]) if after is not None else None
+
+        def run(key):
+            shard_after = None
+            if after is not None:
+                report_year, report_month, row_id = int(after[1]), str(after[2]), after[3]
+                if key > cursor_key:
+                    # The cursor's period is not finished in later shards
+                    shard_after = (report_year, report_month, None)
+                elif key < cursor_key:
+                    previous = report_year * 12 + int(report_month) - 2
+                    shard_after = (previous // 12, f"{previous % 12 + 1:02d}", None)
+                else:
+                    shard_after = (report_year, report_month, row_id)
+            return self.shard(key).search(text, site_ids, start, end, category, shard_after, limit,
+                                          facets, ranked=False)
+
+        results = self._map(run, keys)
+        if not results:
+            return {'columns': ['id'] + FINANCIAL_DATA_COLUMNS + ['score'], 'rows': [], 'next_cursor': None,
+                    'total': 0 if facets else None,
+                    'facets': {'site': [], 'period': [], 'category': []} if facets else None}
+        columns = results[0]['columns']
+        year, month = columns.index('report_year'), columns.index('report_month')
+        merged = [(key, row) for key, result in zip(keys, results) for row in result['rows']]
+        merged.sort(key=lambda item: item[1][0], reverse=True)
+        merged.sort(key=lambda item: item[0])
+        merged.sort(key=lambda item: (item[1][year], item[1][month]), reverse=True)
+        more = len(merged) > limit or any(result['next_cursor'] for result in results)
+        merged = merged[:limit]
+        next_cursor = None
+        if more and merged:
+            key, row = merged[-1]
+            next_cursor = (key, row[year], row[month], row[0])
+
+        total, counts = None, None
+        if facets:
+            total, counts = 0, {'site': {}, 'period': {}, 'category': {}}
+            for result in results:
+                total += result['total']
+                for facet, values in result['facets'].items():
+                    for value, count in values:
+                        counts[facet][value] = counts[facet].get(value, 0) + count
+            counts = {facet: sorted(values.items(), key=lambda item: (-item[1], str(item[0])))
+                      for facet, values in counts.items()}
+        return {'columns': columns, 'rows': [row for _, row in merged], 'next_cursor': next_cursor,
+                'total': total, 'facets': counts}
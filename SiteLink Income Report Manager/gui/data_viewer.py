@@ -0,0 +1,175 @@
+"""
+Paginated grid for browsing stored financial data
+"""
+import tkinter as tk
+from tkinter import messagebox, ttk
+from config.settings import MONTHS
+from utils.instrumentation import span
+
+PAGE_SIZE = 200
+
+# Sort key used when a column heading is clicked (see PAGE_SORT_KEYS)
+HEADING_SORTS = {
+    'id': 'id',
+    'report_month': 'period',
+    'report_year': 'period',
+    'SiteID': 'site',
+    'sChgCategory': 'category',
+}
+
+
+class DataViewer(ttk.Frame):
+    """
+    Treeview over financial_data that holds one page of rows at a time.
+
+    Pages come from keyset queries, so moving forward is an index seek
+    wherever the user is in the table; a stack of page cursors makes Prev
+    just as cheap. Filters and sorting are applied in SQL.
+    """
+
+    def __init__(self, parent, processor, page_size=PAGE_SIZE):
+        super().__init__(parent)
+        self.processor = processor
+        self.page_size = page_size
+        self.sort = 'id'
+        self.descending = False
+        self.filters = {}
+        self._page_cursors = [None]
+        self._next_cursor = None
+        self._columns = None
+
+        self.create_filter_bar()
+        self.create_grid()
+        self.create_pager()
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+    def create_filter_bar(self):
+        """Create month/year/site/category filter controls"""
+        bar = ttk.Frame(self)
+        bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+
+        self.filter_vars = {}
+        fields = [
+            ('Month:', 'report_month', lambda var: ttk.Combobox(bar, textvariable=var, values=[''] + MONTHS, width=4)),
+            ('Year:', 'report_year', lambda var: ttk.Entry(bar, textvariable=var, width=6)),
+            ('Site:', 'SiteID', lambda var: ttk.Entry(bar, textvariable=var, width=10)),
+            ('Category:', 'sChgCategory', lambda var: ttk.Entry(bar, textvariable=var, width=14)),
+        ]
+        for position, (label, column, make_widget) in enumerate(fields):
+            ttk.Label(bar, text=label).grid(row=0, column=position * 2, sticky=tk.W)
+            var = self.filter_vars[column] = tk.StringVar()
+            make_widget(var).grid(row=0, column=position * 2 + 1, padx=(2, 8))
+
+        ttk.Button(bar, text="Apply", command=self.apply_filters).grid(row=0, column=len(fields) * 2)
+        ttk.Button(bar, text="Clear", command=self.clear_filters).grid(row=0, column=len(fields) * 2 + 1, padx=(5, 0))
+
+    def create_grid(self):
+        """Create the Treeview and scrollbars"""
+        self.tree = ttk.Treeview(self, show="headings", height=20)
+        y_scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        x_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
+
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        y_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        x_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E))
+
+    def create_pager(self):
+        """Create page navigation controls"""
+        pager = ttk.Frame(self)
+        pager.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+
+        self.first_button = ttk.Button(pager, text="<< First", command=self.first_page)
+        self.prev_button = ttk.Button(pager, text="< Prev", command=self.prev_page)
+        self.next_button = ttk.Button(pager, text="Next >", command=self.next_page)
+        self.first_button.grid(row=0, column=0)
+        self.prev_button.grid(row=0, column=1, padx=(5, 0))
+        self.next_button.grid(row=0, column=2, padx=(5, 0))
+
+        self.page_var = tk.StringVar()
+        ttk.Label(pager, textvariable=self.page_var).grid(row=0, column=3, padx=(10, 0), sticky=tk.W)
+        pager.columnconfigure(3, weight=1)
+
+    def refresh(self):
+        """Reload from the first page with the current filters and sort"""
+        self._page_cursors = [None]
+        self.load_page()
+
+    def apply_filters(self):
+        """Apply the filter bar and start again at the first page"""
+        filters = {column: var.get().strip() for column, var in self.filter_vars.items()}
+        if filters['report_year'] and not filters['report_year'].isdigit():
+            messagebox.showerror("Error", "Year filter must be a number")
+            return
+        self.filters = {column: value for column, value in filters.items() if value}
+        self.refresh()
+
+    def clear_filters(self):
+        for var in self.filter_vars.values():
+            var.set('')
+        self.filters = {}
+        self.refresh()
+
+    def sort_by(self, column):
+        """Sort on a heading's key, toggling direction on repeated clicks"""
+        sort = HEADING_SORTS.get(column)
+        if sort is None:
+            return
+        self.descending = not self.descending if sort == self.sort else False
+        self.sort = sort
+        self.refresh()
+
+    def first_page(self):
+        self.refresh()
+
+    def next_page(self):
+        if self._next_cursor is not None:
+            self._page_cursors.append(self._next_cursor)
+            self.load_page()
+
+    def prev_page(self):
+        if len(self._page_cursors) > 1:
+            self._page_cursors.pop()
+            self.load_page()
+
+    def load_page(self):
+        """Fetch and render the page starting at the current cursor"""
+        try:
+            columns, rows, self._next_cursor = self.processor.get_data_page(
+                self.filters, self.sort, self.descending,
+                after=self._page_cursors[-1], limit=self.page_size
+            )
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load data:\n{str(e)}")
+            return
+
+        with span('DataViewer.render_page') as render:
+            if columns != self._columns:
+                self._set_columns(columns)
+
+            self.tree.delete(*self.tree.get_children())
+            for row in rows:
+                self.tree.insert('', tk.END, values=['' if value is None else value for value in row])
+            render.rows = len(rows)
+
+        page = len(self._page_cursors)
+        first = (page - 1) * self.page_size + 1
+        if rows:
+            self.page_var.set(f"Page {page}: rows {first:,}-{first + len(rows) - 1:,}")
+        else:
+            self.page_var.set("No data available. Please import a report first."
+                              if not self.filters else "No rows match the filters.")
+
+        self.prev_button.configure(state=tk.NORMAL if page > 1 else tk.DISABLED)
+        self.first_button.configure(state=tk.NORMAL if page > 1 else tk.DISABLED)
+        self.next_button.configure(state=tk.NORMAL if self._next_cursor is not None else tk.DISABLED)
+
+    def _set_columns(self, columns):
+        self._columns = columns
+        self.tree.configure(columns=columns)
+        for column in columns:
+            label = column + (" ⇅" if column in HEADING_SORTS else "")
+            self.tree.heading(column, text=label, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=90, minwidth=50, stretch=False)
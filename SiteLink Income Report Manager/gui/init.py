@@ -2,3 +2,5 @@
 GUI package for SiteLink Financial Manager
 """
 from .main_window import SiteLinkGUI
+from .jobs import JobExecutor, JobCancelled
+from .data_viewer import DataViewer
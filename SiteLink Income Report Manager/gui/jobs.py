@@ -0,0 +1,142 @@
+"""
+Background job execution for the Tk GUI
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job when the user has asked for it to stop.
+
+    Derives from BaseException so the processor's broad "except Exception"
+    wrappers let it through, while transactions still roll back.
+    """
+
+
+class JobContext:
+    """
+    Handed to a running job for progress reporting and cancellation.
+
+    Jobs pass report (or the context itself) as the progress callback of
+    processor methods. Every report is also a cancellation point: once
+    cancel() has been called the next report raises JobCancelled, which
+    unwinds any open database transaction.
+    """
+
+    def __init__(self, job_id, events):
+        self.job_id = job_id
+        self._events = events
+        self._cancelled = threading.Event()
+        self.progress = {'phase': 'starting', 'rows_read': 0, 'rows_written': 0}
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self._cancelled.is_set():
+            raise JobCancelled("Job cancelled")
+
+    def report(self, phase=None, rows_read=None, rows_written=None):
+        """Publish progress to the GUI thread"""
+        self.check_cancelled()
+        if phase is not None:
+            self.progress['phase'] = phase
+        if rows_read is not None:
+            self.progress['rows_read'] = rows_read
+        if rows_written is not None:
+            self.progress['rows_written'] = rows_written
+        self._events.put(('progress', self.job_id, dict(self.progress)))
+
+    __call__ = report
+
+
+class JobExecutor:
+    """
+    Runs processor work on worker threads and reports back on the Tk thread.
+
+    Workers never touch widgets. They push progress, results and errors
+    onto a queue that the Tk main loop drains every poll_interval ms via
+    root.after, and the supplied callbacks run there. Database writes stay
+    safe because every thread gets its own pooled SQLite connection and
+    ConnectionPool serializes write transactions.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=100):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sitelink-job")
+        self._events = queue.Queue()
+        self._jobs = {}
+        self._next_id = 0
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func, *args, on_progress=None, on_success=None, on_error=None,
+               on_cancel=None, **kwargs):
+        """
+        Run func(context, *args, **kwargs) in the background.
+
+        Callbacks run on the Tk thread: on_progress(progress dict),
+        on_success(result), on_error(exception) and on_cancel(). Returns the
+        job's JobContext, whose cancel() requests a cooperative stop.
+        """
+        self._next_id += 1
+        context = JobContext(self._next_id, self._events)
+        self._jobs[context.job_id] = (context, on_progress, on_success, on_error, on_cancel)
+
+        def run():
+            try:
+                result = func(context, *args, **kwargs)
+            except JobCancelled:
+                self._events.put(('cancelled', context.job_id, None))
+            except Exception as e:
+                self._events.put(('error', context.job_id, e))
+            else:
+                self._events.put(('done', context.job_id, result))
+
+        self._pool.submit(run)
+        return context
+
+    @property
+    def busy(self):
+        return bool(self._jobs)
+
+    def cancel_all(self):
+        for context, *_ in self._jobs.values():
+            context.cancel()
+
+    def _poll(self):
+        try:
+            while True:
+                kind, job_id, payload = self._events.get_nowait()
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                context, on_progress, on_success, on_error, on_cancel = job
+                if kind == 'progress':
+                    if on_progress:
+                        on_progress(payload)
+                    continue
+
+                del self._jobs[job_id]
+                if kind == 'done' and on_success:
+                    on_success(payload)
+                elif kind == 'error' and on_error:
+                    on_error(payload)
+                elif kind == 'cancelled' and on_cancel:
+                    on_cancel()
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker threads"""
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
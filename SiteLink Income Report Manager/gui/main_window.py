@@ -6,6 +6,10 @@ from tkinter import filedialog, messagebox, ttk
 from datetime import datetime
 from config.settings import WINDOW_TITLE, WINDOW_SIZE, MONTHS
 from data.sitelink_processor import SiteLinkProcessor
+from gui.jobs import JobExecutor
+from gui.data_viewer import DataViewer
+from data.bulk_import import format_results
+from data.validation import format_validation
 
 class SiteLinkGUI:
     def __init__(self):
@@ -13,8 +17,12 @@ class SiteLinkGUI:
         self.root = tk.Tk()
         self.root.title(WINDOW_TITLE)
         self.root.geometry(WINDOW_SIZE)
+        self.jobs = JobExecutor(self.root)
+        self.action_buttons = []
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         self.create_widgets()
+        self.data_viewer.refresh()
     
     def create_widgets(self):
         """Create and arrange GUI widgets"""
@@ -27,6 +35,7 @@ class SiteLinkGUI:
         
         self.create_import_section(main_frame)
         self.create_data_display_section(main_frame)
+        self.create_status_section(main_frame)
         
         main_frame.columnconfigure(0, weight=1)
         main_frame.rowconfigure(2, weight=1)
@@ -46,8 +55,13 @@ class SiteLinkGUI:
         year_entry = ttk.Entry(import_frame, textvariable=self.year_var, width=10)
         year_entry.grid(row=0, column=3, padx=(5, 10))
         
-        ttk.Button(import_frame, text="Select & Import Excel File", 
-                  command=self.import_file).grid(row=0, column=4, padx=(10, 0))
+        import_button = ttk.Button(import_frame, text="Select & Import Excel File", 
+                                   command=self.import_file)
+        import_button.grid(row=0, column=4, padx=(10, 0))
+        bulk_button = ttk.Button(import_frame, text="Bulk Import Folder", 
+                                 command=self.bulk_import_folder)
+        bulk_button.grid(row=0, column=5, padx=(5, 0))
+        self.action_buttons.extend([import_button, bulk_button])
     
     def create_data_display_section(self, parent):
         """Create data display section"""
@@ -57,27 +71,96 @@ class SiteLinkGUI:
         controls_frame = ttk.Frame(data_frame)
         controls_frame.grid(row=0, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
         
-        ttk.Button(controls_frame, text="View All Stored Data", 
-                  command=self.view_all_data).grid(row=0, column=0, padx=(0, 10))
-        ttk.Button(controls_frame, text="Export to Sage GLS", 
-                  command=self.export_sage).grid(row=0, column=1, padx=(0, 10))
+        view_button = ttk.Button(controls_frame, text="View All Stored Data", 
+                                 command=self.view_all_data)
+        view_button.grid(row=0, column=0, padx=(0, 10))
+        export_button = ttk.Button(controls_frame, text="Export to Sage GLS", 
+                                   command=self.export_sage)
+        export_button.grid(row=0, column=1, padx=(0, 10))
+        report_button = ttk.Button(controls_frame, text="Export Excel Report", 
+                                   command=self.export_excel_report)
+        report_button.grid(row=0, column=2, padx=(0, 10))
+        self.action_buttons.extend([view_button, export_button, report_button])
         
-        self.results_text = tk.Text(data_frame, height=20, width=80, wrap=tk.NONE) # Changed width and wrap
-        x_scrollbar = ttk.Scrollbar(data_frame, orient="horizontal", command=self.results_text.xview)
-        y_scrollbar = ttk.Scrollbar(data_frame, orient="vertical", command=self.results_text.yview)
-        self.results_text.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-        
-        self.results_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        y_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
-        x_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E)) # Added horizontal scrollbar
+        self.data_viewer = DataViewer(data_frame, self.processor)
+        self.data_viewer.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         data_frame.columnconfigure(0, weight=1)
         data_frame.rowconfigure(1, weight=1)
     
+    def create_status_section(self, parent):
+        """Create background job progress and cancel controls"""
+        status_frame = ttk.Frame(parent)
+        status_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(status_frame, textvariable=self.status_var).grid(row=0, column=0, sticky=tk.W)
+        
+        self.progress_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=200)
+        self.progress_bar.grid(row=0, column=1, padx=(10, 10), sticky=tk.E)
+        
+        self.cancel_button = ttk.Button(status_frame, text="Cancel", state=tk.DISABLED,
+                                        command=self.jobs.cancel_all)
+        self.cancel_button.grid(row=0, column=2, sticky=tk.E)
+        
+        status_frame.columnconfigure(0, weight=1)
+    
+    def run_job(self, description, func, *args, on_success=None, on_error=None):
+        """Run func(context, *args) off the Tk thread with progress and cancel"""
+        for button in self.action_buttons:
+            button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.status_var.set(f"{description}...")
+        self.progress_bar.start(10)
+        
+        def finished():
+            self.progress_bar.stop()
+            self.cancel_button.configure(state=tk.DISABLED)
+            for button in self.action_buttons:
+                button.configure(state=tk.NORMAL)
+        
+        def show_progress(progress):
+            details = [progress['phase'].capitalize()]
+            if progress['rows_read']:
+                details.append(f"{progress['rows_read']:,} rows read")
+            if progress['rows_written']:
+                details.append(f"{progress['rows_written']:,} rows written")
+            self.status_var.set(f"{description}: " + ", ".join(details))
+        
+        def succeeded(result):
+            finished()
+            self.status_var.set("Ready")
+            if on_success:
+                on_success(result)
+        
+        def failed(error):
+            finished()
+            self.status_var.set("Ready")
+            if on_error:
+                on_error(error)
+        
+        def cancelled():
+            finished()
+            self.status_var.set(f"{description} cancelled")
+        
+        self.jobs.submit(func, *args, on_progress=show_progress, on_success=succeeded,
+                         on_error=failed, on_cancel=cancelled)
+    
+    def selected_period(self, missing="Please select month and year"):
+        """The selected (month, year), or None after showing what is wrong"""
+        month, year = self.month_var.get(), self.year_var.get().strip()
+        if not month or not year:
+            messagebox.showerror("Error", missing)
+            return None
+        if not (year.isdigit() and len(year) == 4):
+            messagebox.showerror("Error", f"Year must be a four-digit number, not '{year}'")
+            return None
+        return month, int(year)
+    
     def import_file(self):
         """Handle file import"""
-        if not self.month_var.get() or not self.year_var.get():
-            messagebox.showerror("Error", "Please select month and year")
+        period = self.selected_period()
+        if period is None:
             return
         
         file_path = filedialog.askopenfilename(
@@ -86,59 +169,122 @@ class SiteLinkGUI:
         )
         
         if file_path:
-            try:
-                df = self.processor.read_excel_file(
-                    file_path, self.month_var.get(), int(self.year_var.get())
+            month, year = period
+            
+            def show_result(stats):
+                if stats['skipped']:
+                    messagebox.showinfo("Already Imported",
+                        f"This file was already imported for {month}/{year} and is unchanged; "
+                        f"nothing was written ({stats['rows']} records)")
+                    return
+                message = (
+                    f"Successfully imported {stats['rows']} records for {month}/{year}\n"
+                    f"Inserted: {stats['inserted']}  Updated: {stats['updated']}  "
+                    f"Deleted: {stats['deleted']}  Unchanged: {stats['unchanged']}\n\n"
+                    + format_validation(stats['validation'], stats['reconciliation'])
                 )
-                self.processor.store_data(df)
-                
-                messagebox.showinfo("Success", 
-                    f"Successfully imported {len(df)} records for {self.month_var.get()}/{self.year_var.get()}")
-                
+                if stats['validation']['violations'] or not stats['reconciliation']['ok']:
+                    messagebox.showwarning("Imported With Warnings", message)
+                else:
+                    messagebox.showinfo("Success", message)
                 self.view_all_data()
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to import file:\n{str(e)}")
+            
+            self.run_job(
+                "Importing", 
+                lambda job: self.processor.import_excel_file(file_path, month, year, progress=job),
+                on_success=show_result,
+                on_error=lambda e: messagebox.showerror("Error", f"Failed to import file:\n{str(e)}")
+            )
+    
+    def bulk_import_folder(self):
+        """Import every monthly report in a folder, inferring each file's month"""
+        folder = filedialog.askdirectory(title="Select Folder of SiteLink Monthly Reports")
+        if not folder:
+            return
+        
+        def show_result(results):
+            message = format_results(results)
+            if results['failed'] or results['skipped'] or results['violations']:
+                messagebox.showwarning("Bulk Import", message)
+            else:
+                messagebox.showinfo("Bulk Import", message)
+            self.view_all_data()
+        
+        self.run_job(
+            "Bulk importing",
+            lambda job: self.processor.bulk_import(folder, progress=job),
+            on_success=show_result,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to bulk import:\n{str(e)}")
+        )
     
     def view_all_data(self):
-        """Display all raw data from the database"""
-        try:
-            all_data_df = self.processor.get_all_data()
-            
-            self.results_text.delete(1.0, tk.END)
-            
-            if all_data_df.empty:
-                self.results_text.insert(tk.END, "No data available. Please import a report first.")
-                return
-            
-            # Display the raw data as a string
-            self.results_text.insert(tk.END, all_data_df.to_string())
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load data:\n{str(e)}")
+        """Show the first page of stored data and count the matching rows"""
+        self.data_viewer.refresh()
+        filters = dict(self.data_viewer.filters)
+        
+        def count(job):
+            job.report('counting')
+            return self.processor.count_data(filters)
+        
+        self.run_job(
+            "Counting rows", count,
+            on_success=lambda total: self.status_var.set(f"{total:,} stored rows match the viewer filters"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to count data:\n{str(e)}")
+        )
     
     def export_sage(self):
         """Export data for Sage GLS"""
-        if not self.month_var.get() or not self.year_var.get():
-            messagebox.showerror("Error", "Please select month and year for export")
+        period = self.selected_period("Please select month and year for export")
+        if period is None:
             return
         
-        try:
-            sage_df = self.processor.prepare_sage_export(
-                self.month_var.get(), int(self.year_var.get())
-            )
-            
+        month, year = period
+        filename = f"sage_export_{month}_{year}.csv"
+        
+        def export(job):
+            job.report('aggregating')
+            sage_df = self.processor.prepare_sage_export(month, year)
             if sage_df.empty:
-                messagebox.showwarning("Warning", "No data available for selected month/year")
-                return
-            
-            filename = f"sage_export_{self.month_var.get()}_{self.year_var.get()}.csv"
+                return None
+            job.report('writing', rows_written=len(sage_df))
             sage_df.to_csv(filename, index=False)
-            
-            messagebox.showinfo("Success", f"Sage GLS export saved as: {filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export for Sage:\n{str(e)}")
+            return filename
+        
+        def show_result(saved):
+            if saved is None:
+                messagebox.showwarning("Warning", "No data available for selected month/year")
+            else:
+                messagebox.showinfo("Success", f"Sage GLS export saved as: {saved}")
+        
+        self.run_job(
+            "Exporting to Sage", export, on_success=show_result,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to export for Sage:\n{str(e)}")
+        )
+    
+    def export_excel_report(self):
+        """Export raw data, summary and Sage journal for the selected month to Excel"""
+        period = self.selected_period("Please select month and year for export")
+        if period is None:
+            return
+        
+        month, year = period
+        filename = f"sitelink_report_{month}_{year}.xlsx"
+        
+        def export(job):
+            job.report('reading')
+            self.processor.export_excel_report(filename, month, year, progress=job.report)
+            return filename
+        
+        self.run_job(
+            "Exporting Excel report", export,
+            on_success=lambda saved: messagebox.showinfo("Success", f"Excel report saved as: {saved}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to export Excel report:\n{str(e)}")
+        )
+    
+    def close(self):
+        """Stop background jobs and close the window"""
+        self.jobs.shutdown()
+        self.root.destroy()
     
     def run(self):
         """Start the GUI application"""
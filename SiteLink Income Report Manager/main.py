@@ -2,11 +2,17 @@
 SiteLink Financial Data Manager - Main Entry Point
 """
 from gui.main_window import SiteLinkGUI
+from utils import instrumentation
 
 def main():
     """Main application entry point"""
-    app = SiteLinkGUI()
-    app.run()
+    # Metrics/profiling via SITELINK_METRICS / SITELINK_PROFILE
+    instrumentation.configure()
+    try:
+        app = SiteLinkGUI()
+        app.run()
+    finally:
+        instrumentation.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,124 @@
+"""
+Shared fixtures: run from the application directory's imports, and build
+databases in the layout the first release wrote
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config.settings import EXPECTED_COLUMNS  # noqa: E402
+
+# financial_data and monthly_summary as created before any schema migration
+BASELINE_SCHEMA = [
+    '''CREATE TABLE financial_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        report_month TEXT NOT NULL,
+        report_year INTEGER NOT NULL,
+        upload_date TEXT NOT NULL,
+        SiteID TEXT,
+        ChargeDescID TEXT,
+        sChgCategory TEXT,
+        sChgDesc TEXT,
+        sDefAcctCode TEXT,
+        sAcctCode TEXT,
+        Price REAL,
+        Charge REAL,
+        Discount REAL,
+        ChargeTax1 REAL,
+        ChargeTax2 REAL,
+        ChargeTotal REAL,
+        Payment REAL,
+        PaymentTax1 REAL,
+        PaymentTax2 REAL,
+        PaymentTotal REAL,
+        Credit REAL,
+        CreditTax1 REAL,
+        CreditTax2 REAL,
+        CreditTotal REAL,
+        TotalCost REAL,
+        iCount INTEGER,
+        dcPercent REAL,
+        Chg_dDisabled INTEGER DEFAULT 0,
+        Chg_dDeleted INTEGER DEFAULT 0,
+        UNIQUE(report_month, report_year, SiteID, ChargeDescID, sChgCategory, sChgDesc)
+    )''',
+    '''CREATE TABLE monthly_summary (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        report_month TEXT NOT NULL,
+        report_year INTEGER NOT NULL,
+        total_charges REAL,
+        total_payments REAL,
+        total_credits REAL,
+        net_total REAL,
+        record_count INTEGER,
+        created_date TEXT,
+        UNIQUE(report_month, report_year)
+    )''',
+]
+
+
+def charge_row(site, desc_id, category, desc, account, charge, payment=0.0, disabled=0):
+    """One report row in EXPECTED_COLUMNS order with consistent totals"""
+    values = dict.fromkeys(EXPECTED_COLUMNS, 0)
+    values.update({
+        'SiteID': site, 'ChargeDescID': desc_id, 'sChgCategory': category, 'sChgDesc': desc,
+        'sDefAcctCode': account, 'sAcctCode': account, 'Chg_dDisabled': disabled,
+        'Price': charge, 'Charge': charge, 'ChargeTotal': charge,
+        'Payment': payment, 'PaymentTotal': payment,
+        'TotalCost': round(charge - payment, 2), 'iCount': 1, 'dcPercent': 0.0,
+    })
+    return tuple(values[column] for column in EXPECTED_COLUMNS)
+
+
+# Two months of rows, including the blank SiteID and description the first
+# release stored as NULL
+BASELINE_ROWS = [
+    charge_row(None, '1', 'Admin Fee', 'Admin', '4002', 705.58, 500.0),
+    charge_row('L001', '2', 'Rent', None, '4000', 1200.0, 1000.0),
+    charge_row('L001', '3', 'Rent', 'Rent - Lock', '4000', 95.0, 95.0),
+    charge_row('L002', '2', 'Late Fee', 'Late Fee', '4010', 25.0, 0.0, disabled=1),
+]
+BASELINE_PERIODS = [('01', 2023), ('02', 2023)]
+
+
+def write_baseline_db(path, rows=BASELINE_ROWS, periods=BASELINE_PERIODS):
+    """Write a database with the first release's schema, rows and monthly summaries"""
+    conn = sqlite3.connect(path)
+    for statement in BASELINE_SCHEMA:
+        conn.execute(statement)
+    columns = ['report_month', 'report_year', 'upload_date'] + EXPECTED_COLUMNS
+    for report_month, report_year in periods:
+        conn.executemany(
+            f"INSERT INTO financial_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [(report_month, report_year, '2023-03-01T09:00:00') + row for row in rows]
+        )
+        conn.execute('''
+            INSERT INTO monthly_summary
+            (report_month, report_year, total_charges, total_payments, total_credits, net_total,
+             record_count, created_date)
+            SELECT report_month, report_year, SUM(ChargeTotal), SUM(PaymentTotal), SUM(CreditTotal),
+                   SUM(TotalCost), COUNT(*), '2023-03-01T09:00:00'
+            FROM financial_data WHERE report_month = ? AND report_year = ?
+        ''', (report_month, report_year))
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """Path of a database as the first release left it"""
+    return write_baseline_db(tmp_path / "baseline.db")
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh DatabaseManager at the current schema version"""
+    from database.db_manager import DatabaseManager
+    manager = DatabaseManager(tmp_path / "sitelink.db")
+    yield manager
+    manager.close()
@@ -0,0 +1,149 @@
+"""
+The read-only HTTP API answers every endpoint over localhost
+"""
+import asyncio
+import csv
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import charge_row
+from api.server import ApiServer
+from data import sitelink_processor
+from database.db_manager import DatabaseManager
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 1200.0, 1000.0),
+    charge_row('L001', '2', 'Insurance', 'Insurance - Lock', '4030', 12.0, 12.0),
+    charge_row('L002', '1', 'Rent', 'Rent', '4000', 950.0),
+]
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setattr(sitelink_processor, 'SAGE_MAPPING_PATH', tmp_path / "sage_gls_mapping.json")
+    writer = DatabaseManager(tmp_path / "api.db")
+    for report_month in ('03', '04'):
+        writer.store_rows(report_month, 2023, [ROWS])
+    reader = DatabaseManager(tmp_path / "api.db", read_only=True)
+    server = ApiServer(reader, host='127.0.0.1', port=0, workers=2)
+
+    loop = asyncio.new_event_loop()
+    bound, started = [], threading.Event()
+    task = loop.create_task(server.serve_forever(ready=lambda address: (bound.append(address), started.set())))
+    thread = threading.Thread(target=lambda: loop.run_until_complete(asyncio.wait([task])))
+    thread.start()
+    assert started.wait(10)
+    yield f"http://{bound[0][0]}:{bound[0][1]}"
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(10)
+    loop.close()
+    server.close()
+    reader.close()
+    writer.close()
+
+
+def _get(base, path, **headers):
+    request = urllib.request.Request(base + path, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read().decode('utf-8')
+
+
+def _json(base, path):
+    status, _, body = _get(base, path)
+    assert status == 200, body
+    return json.loads(body)
+
+
+def test_health(api):
+    assert _json(api, "/health") == {'columns': ['status'], 'rows': [['ok']]}
+
+
+def test_summary(api):
+    body = _json(api, "/summary?month=04&year=2023")
+    total = body['columns'].index('total_charges')
+    assert round(sum(row[total] for row in body['rows']), 2) == 2162.0
+    assert len(_json(api, "/summary?start=2023-03&end=2023-04")['rows']) == 2 * len(body['rows'])
+
+
+def test_trend(api):
+    body = _json(api, "/trend?start=2023-03&end=2023-04&measure=total_charges")
+    rows = [dict(zip(body['columns'], row)) for row in body['rows']]
+    assert [row['period'] for row in rows] == ['2023-03', '2023-04']
+    assert rows[1]['mom_change'] == 0.0
+
+
+def test_range_as_csv(api):
+    status, headers, body = _get(api, "/range?start=2023-04&end=2023-04&format=csv")
+    assert status == 200
+    assert headers['Content-Type'].startswith('text/csv')
+    rows = list(csv.reader(io.StringIO(body)))
+    assert 'SiteID' in rows[0]
+    assert len(rows) == 1 + len(ROWS)
+
+
+def test_rows_pages_with_cursor(api):
+    first = _json(api, "/rows?year=2023&limit=4")
+    assert len(first['rows']) == 4 and first['next_cursor']
+    after = urllib.request.quote(json.dumps(first['next_cursor']))
+    second = _json(api, f"/rows?year=2023&limit=4&after={after}")
+    assert second['next_cursor'] is None
+    ids = [row[0] for row in first['rows'] + second['rows']]
+    assert len(set(ids)) == len(ids) == 2 * len(ROWS)
+    assert len(_json(api, "/rows?site=L002")['rows']) == 2
+
+
+def test_sage_export(api):
+    body = _json(api, "/sage-export?month=04&year=2023")
+    assert body['columns'] == ['Account', 'Description', 'Debit', 'Credit', 'Reference']
+    assert {row[-1] for row in body['rows']} == {'04-2023'}
+    status, headers, _ = _get(api, "/sage-export?month=04&year=2023", Accept='text/csv')
+    assert status == 200 and 'sage_export_04_2023.csv' in headers['Content-Disposition']
+
+
+def test_search(api):
+    body = _json(api, "/search?q=lock")
+    assert body['total'] == 2
+    assert {row[body['columns'].index('sChgDesc')] for row in body['rows']} == {'Insurance - Lock'}
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/nowhere", 404),
+    ("/summary?month=13", 400),
+    ("/sage-export?year=2023", 400),
+    ("/search", 400),
+    ("/rows?limit=ten", 400),
+    ("/rows?limit=0", 400),
+    ("/rows?limit=-1", 400),
+    ("/rows?limit=-2", 400),
+    ("/search?q=rent&limit=0", 400),
+    ("/trend?start=2023-03&end=2023-04&rolling=0", 400),
+    ("/rows?after=oops", 400),
+    ("/health?format=xml", 400),
+])
+def test_errors(api, path, status):
+    code, headers, body = _get(api, path)
+    assert code == status
+    assert 'error' in json.loads(body)
+
+
+def test_limit_is_capped(api, monkeypatch):
+    monkeypatch.setattr('api.server.API_PAGE_LIMIT', 2)
+    body = _json(api, "/rows?limit=1000")
+    assert len(body['rows']) == 2 and body['next_cursor']
+    assert len(_json(api, "/search?q=rent&limit=1000")['rows']) == 2
+
+
+@pytest.mark.parametrize("limit", [0, -1, -2])
+def test_database_refuses_empty_pages(db, limit):
+    with pytest.raises(ValueError):
+        db.get_data_page(limit=limit)
+    with pytest.raises(ValueError):
+        db.search("rent", limit=limit)
@@ -0,0 +1,55 @@
+"""
+Archiving a month to Parquet and restoring it
+"""
+import pytest
+
+from conftest import charge_row
+from config.settings import EXPECTED_COLUMNS
+from database.archive import archive_period, period_path, restore_period
+
+pytest.importorskip("pyarrow")
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 1200.0, 1000.0),
+    charge_row('L001', '2', 'Insurance', 'Insurance - Lock', '4030', 12.0, 12.0),
+    charge_row('L002', '1', 'Rent', 'Rent', '4000', 950.0),
+    charge_row('L002', '3', 'Late Fee', None, '4010', 20.0, disabled=1),
+]
+
+
+def _period_rows(db, report_month, report_year):
+    return db.connection().execute(
+        f"SELECT {', '.join(EXPECTED_COLUMNS)} FROM financial_data "
+        f"WHERE report_month = ? AND report_year = ? ORDER BY SiteID, ChargeDescID",
+        (report_month, report_year)
+    ).fetchall()
+
+
+def test_archive_then_restore_round_trip(db, tmp_path):
+    for report_month in ('03', '04'):
+        db.store_rows(report_month, 2023, [ROWS], upload_date='2023-05-01T00:00:00')
+    rows = _period_rows(db, '03', 2023)
+    summary = db.get_financial_summary_rows('03', 2023)
+    journal = db.get_sage_export_data('03', 2023)
+
+    assert archive_period(db, '03', 2023, tmp_path / "archive") == len(ROWS)
+    assert period_path('03', 2023, tmp_path / "archive").exists()
+    assert _period_rows(db, '03', 2023) == []
+    assert len(_period_rows(db, '04', 2023)) == len(ROWS)
+    assert db.get_financial_summary_rows('03', 2023) == summary
+    assert db.get_sage_export_data('03', 2023).equals(journal)
+    assert [(period['report_month'], period['row_count']) for period in db.archived_periods()] == [('03', len(ROWS))]
+    assert len(db.get_data_range('2023-03', '2023-03')) == 0
+    assert len(db.get_data_range('2023-03', '2023-03', include_archived=True)) == len(ROWS)
+
+    assert restore_period(db, '03', 2023) == len(ROWS)
+    assert _period_rows(db, '03', 2023) == rows
+    assert db.get_financial_summary_rows('03', 2023) == summary
+    assert db.archived_periods() == []
+    assert not period_path('03', 2023, tmp_path / "archive").exists()
+
+
+def test_restoring_a_live_month_fails(db):
+    db.store_rows('03', 2023, [ROWS])
+    with pytest.raises(ValueError):
+        restore_period(db, '03', 2023)
@@ -0,0 +1,53 @@
+"""
+Report period inference from file names
+"""
+import pytest
+
+from data.bulk_import import find_report_files, infer_period, period_from_text
+
+
+@pytest.mark.parametrize("name, period", [
+    ("2023-04", ('04', 2023)),
+    ("income_2023_04", ('04', 2023)),
+    ("202304", ('04', 2023)),
+    ("04-2023", ('04', 2023)),
+    ("4-2023", ('04', 2023)),
+    ("report_042023", ('04', 2023)),
+    ("report 12.2021", ('12', 2021)),
+    ("April 2023", ('04', 2023)),
+    ("Apr_2023", ('04', 2023)),
+    ("sept2023", ('09', 2023)),
+    ("2023 December", ('12', 2023)),
+    ("Facility 12 April 2023", ('04', 2023)),
+])
+def test_period_from_text(name, period):
+    assert period_from_text(name) == period
+
+
+@pytest.mark.parametrize("name, period", [
+    # Facility names that start like a month never override the numeric period
+    ("Augusta_2023-04", ('04', 2023)),
+    ("Decatur 2023-04", ('04', 2023)),
+    ("Janesville 2023-11", ('11', 2023)),
+    ("Marietta 05-2022", ('05', 2022)),
+    ("Mayfield_202208", ('08', 2022)),
+])
+def test_facility_names_are_not_months(name, period):
+    assert period_from_text(name) == period
+
+
+@pytest.mark.parametrize("name", ["Augusta 2023", "Market 2023", "Decatur", "report_2023-13", "Facility 12", ""])
+def test_no_period(name):
+    assert period_from_text(name) is None
+
+
+def test_infer_period_from_file_name(tmp_path):
+    # A name with a period never opens the workbook
+    assert infer_period(tmp_path / "Augusta_2023-04.xlsx") == ('04', 2023)
+    assert infer_period(tmp_path / "Janesville.xls") is None
+
+
+def test_find_report_files_skips_lock_files(tmp_path):
+    for name in ("2023-01.xlsx", "2023-02.XLS", "~$2023-01.xlsx", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert [p.name for p in find_report_files(str(tmp_path))] == ["2023-01.xlsx", "2023-02.XLS"]
@@ -0,0 +1,94 @@
+"""
+Pooled connections, nested transactions and read-only pools
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from database.connection import ConnectionPool
+from database.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool.for_path(tmp_path / "pool.db")
+    pool.connection().execute("CREATE TABLE t (value INTEGER)")
+    yield pool
+    pool.close_all()
+
+
+def _values(pool):
+    return [row[0] for row in pool.connection().execute("SELECT value FROM t ORDER BY value")]
+
+
+def test_nested_failure_rolls_back_only_the_inner_block(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(ValueError):
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO t VALUES (2)")
+                raise ValueError("inner")
+        conn.execute("INSERT INTO t VALUES (3)")
+    assert _values(pool) == [1, 3]
+
+
+def test_outer_failure_rolls_back_nested_blocks(pool):
+    with pytest.raises(ValueError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO t VALUES (2)")
+            raise ValueError("outer")
+    assert _values(pool) == []
+    # The pool is usable again afterwards
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO t VALUES (4)")
+    assert _values(pool) == [4]
+
+
+def test_one_connection_per_thread(pool):
+    assert pool.connection() is pool.connection()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not pool.connection()
+
+
+def test_managers_share_the_pool_for_a_file(tmp_path):
+    first = DatabaseManager(tmp_path / "shared.db")
+    second = DatabaseManager(tmp_path / "shared.db")
+    try:
+        assert first.pool is second.pool
+        assert first.connection() is second.connection()
+    finally:
+        first.close()
+
+
+def test_read_only_pool_refuses_writes(tmp_path):
+    writer = DatabaseManager(tmp_path / "read_only.db")
+    reader = DatabaseManager(tmp_path / "read_only.db", read_only=True)
+    try:
+        assert reader.pool is not writer.pool
+        assert reader.connection().execute("SELECT COUNT(*) FROM monthly_summary").fetchone() == (0,)
+        with pytest.raises(sqlite3.OperationalError):
+            reader.connection().execute("DELETE FROM monthly_summary")
+        with pytest.raises(sqlite3.OperationalError):
+            with reader.transaction() as conn:
+                conn.execute("CREATE TABLE scratch (value INTEGER)")
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_read_only_pool_needs_an_existing_file(tmp_path):
+    pool = ConnectionPool.for_path(tmp_path / "missing.db", read_only=True)
+    with pytest.raises(FileNotFoundError):
+        pool.connection()
+    assert not (tmp_path / "missing.db").exists()
+
+
+def test_queries_are_timed_but_connection_plumbing_is_not():
+    assert hasattr(DatabaseManager.store_rows, '__wrapped__')
+    assert not hasattr(DatabaseManager.connection, '__wrapped__')
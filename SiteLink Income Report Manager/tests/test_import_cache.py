@@ -0,0 +1,64 @@
+"""
+Re-importing a workbook is skipped while the period still holds it
+"""
+import pytest
+
+from conftest import charge_row
+from config.settings import EXPECTED_COLUMNS
+from data.import_cache import file_fingerprint, import_workbook
+
+openpyxl = pytest.importorskip("openpyxl")
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 1200.0, 1000.0),
+    charge_row('L001', '2', 'Late Fee', 'Late Fee', '4010', 25.0),
+    charge_row('L002', '1', 'Rent', 'Rent', '4000', 950.0, 950.0),
+]
+
+
+def _workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(EXPECTED_COLUMNS)
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(path)
+    return path
+
+
+def _counts(stats):
+    return stats['skipped'], stats['inserted'], stats['updated'], stats['deleted'], stats['unchanged']
+
+
+def test_unchanged_file_is_skipped(db, tmp_path):
+    path = _workbook(tmp_path / "2023-04.xlsx", ROWS)
+    assert _counts(import_workbook(db, path, '04', 2023)) == (False, 3, 0, 0, 0)
+    stats = import_workbook(db, path, '04', 2023)
+    assert _counts(stats) == (True, 0, 0, 0, 3)
+    assert stats['rows'] == 3
+
+
+def test_changed_file_is_reimported(db, tmp_path):
+    path = _workbook(tmp_path / "2023-04.xlsx", ROWS)
+    import_workbook(db, path, '04', 2023)
+    before = file_fingerprint(path)
+
+    _workbook(path, [charge_row('L001', '1', 'Rent', 'Rent', '4000', 1250.0, 1000.0)] + ROWS[1:])
+    assert file_fingerprint(path) != before
+    assert _counts(import_workbook(db, path, '04', 2023)) == (False, 0, 1, 0, 2)
+    assert _counts(import_workbook(db, path, '04', 2023))[0] is True
+
+
+def test_same_file_for_another_period_or_forced_is_imported(db, tmp_path):
+    path = _workbook(tmp_path / "report.xlsx", ROWS)
+    import_workbook(db, path, '04', 2023)
+    assert _counts(import_workbook(db, path, '05', 2023)) == (False, 3, 0, 0, 0)
+    assert _counts(import_workbook(db, path, '04', 2023, force=True)) == (False, 0, 0, 0, 3)
+
+
+def test_rows_changed_since_import_are_not_skipped(db, tmp_path):
+    path = _workbook(tmp_path / "2023-04.xlsx", ROWS)
+    import_workbook(db, path, '04', 2023)
+    # Another source replaced the month's rows after the workbook was imported
+    db.store_rows('04', 2023, [ROWS[:1]])
+    assert _counts(import_workbook(db, path, '04', 2023)) == (False, 2, 0, 0, 1)
@@ -0,0 +1,136 @@
+"""
+Schema migrations 1-9 applied to a database written by the first release
+"""
+import sqlite3
+
+import pytest
+
+from conftest import BASELINE_PERIODS, BASELINE_ROWS, charge_row, write_baseline_db
+from database.db_manager import DatabaseManager
+from database.migrations import SCHEMA_VERSION
+
+
+@pytest.fixture
+def migrated(baseline_db):
+    manager = DatabaseManager(baseline_db)
+    yield manager
+    manager.close()
+
+
+def _facts_totals(manager, report_month, report_year):
+    return manager.connection().execute(
+        "SELECT ROUND(SUM(ChargeTotal), 2), COUNT(*) FROM financial_facts WHERE report_month = ? AND report_year = ?",
+        (report_month, report_year)
+    ).fetchone()
+
+
+def _summary_totals(manager, report_month, report_year):
+    return manager.connection().execute(
+        "SELECT ROUND(total_charges, 2), record_count FROM monthly_summary WHERE report_month = ? AND report_year = ?",
+        (report_month, report_year)
+    ).fetchone()
+
+
+def test_migrates_to_current_version(migrated):
+    assert migrated.schema_version() == SCHEMA_VERSION
+    tables = {row[0] for row in migrated.connection().execute("SELECT name FROM sqlite_master")}
+    assert {
+        'category_summary', 'import_ledger', 'financial_facts', 'sites', 'charge_descriptions',
+        'charge_categories', 'account_codes', 'uploads', 'archived_periods', 'data_generations',
+        'charge_search', 'search_documents',
+    } <= tables
+    kind = migrated.connection().execute(
+        "SELECT type FROM sqlite_master WHERE name = 'financial_data'"
+    ).fetchone()[0]
+    assert kind == 'view'
+
+
+def test_rows_keep_their_ids_and_values(migrated):
+    assert migrated.connection().execute("SELECT COUNT(*) FROM financial_facts").fetchone()[0] == (
+        len(BASELINE_ROWS) * len(BASELINE_PERIODS)
+    )
+    stored = migrated.connection().execute(
+        "SELECT id, SiteID, sChgDesc, ChargeTotal FROM financial_data ORDER BY id"
+    ).fetchall()
+    assert [row[0] for row in stored] == list(range(1, len(stored) + 1))
+    assert ('', 'Admin', 705.58) in [row[1:] for row in stored]
+    assert ('L001', '', 1200.0) in [row[1:] for row in stored]
+
+
+def test_summaries_match_normalized_keys(migrated):
+    assert migrated.check_category_summary() == []
+    keys = migrated.connection().execute(
+        "SELECT DISTINCT SiteID FROM category_summary ORDER BY SiteID"
+    ).fetchall()
+    assert keys == [('',), ('L001',), ('L002',)]
+    for report_month, report_year in BASELINE_PERIODS:
+        assert _summary_totals(migrated, report_month, report_year) == _facts_totals(
+            migrated, report_month, report_year
+        )
+
+
+def test_migration_seeds_period_keys_generations_and_search(migrated):
+    assert migrated.connection().execute(
+        "SELECT COUNT(*) FROM category_summary WHERE period_key IS NULL"
+    ).fetchone()[0] == 0
+    generations = migrated.data_generations()
+    assert {(month, year) for year, month, _ in generations} == set(BASELINE_PERIODS)
+    assert migrated.search("lock", facets=False)['rows']
+
+
+def test_reimport_after_migration_updates_in_place(migrated):
+    """A changed row with a formerly NULL key replaces its summary group"""
+    rows = list(BASELINE_ROWS)
+    rows[0] = charge_row(None, '1', 'Admin Fee', 'Admin', '4002', 706.58, 500.0)
+    result = migrated.store_rows('01', 2023, [rows])
+
+    assert (result['inserted'], result['updated'], result['deleted'], result['unchanged']) == (0, 1, 0, 3)
+    assert migrated.check_category_summary() == []
+    admin = migrated.connection().execute(
+        "SELECT SiteID, total_charges FROM category_summary "
+        "WHERE report_month = '01' AND report_year = 2023 AND sChgCategory = 'Admin Fee'"
+    ).fetchall()
+    assert admin == [('', 706.58)]
+    assert _summary_totals(migrated, '01', 2023) == _facts_totals(migrated, '01', 2023)
+
+
+def test_reimporting_migrated_month_unchanged(migrated):
+    result = migrated.store_rows('02', 2023, [BASELINE_ROWS])
+    assert (result['inserted'], result['updated'], result['deleted']) == (0, 0, 0)
+    assert migrated.check_category_summary() == []
+
+
+def test_migration_is_not_repeated(baseline_db, migrated):
+    migrated.close()
+    again = DatabaseManager(baseline_db)
+    try:
+        assert again.schema_version() == SCHEMA_VERSION
+        assert again.check_category_summary() == []
+    finally:
+        again.close()
+
+
+def test_rows_that_would_collide_stop_the_migration(tmp_path):
+    """Two NULL-description rows were distinct to the old UNIQUE key but not to the new one"""
+    rows = BASELINE_ROWS + [charge_row('L001', '2', 'Rent', None, '4000', 80.0, 80.0)]
+    path = write_baseline_db(tmp_path / "colliding.db", rows)
+    with pytest.raises(Exception, match=r"2 group\(s\) .*sChgDesc='' \(ids 2, 5\)"):
+        DatabaseManager(path)
+
+    # Nothing was migrated, so no row was lost
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM financial_data").fetchone()[0] == len(rows) * len(BASELINE_PERIODS)
+        # Once the extra row is told apart, the migration keeps every row
+        conn.execute("UPDATE financial_data SET sChgDesc = 'Rent - Second unit' WHERE ChargeTotal = 80.0")
+        conn.commit()
+    finally:
+        conn.close()
+    manager = DatabaseManager(path)
+    try:
+        assert manager.schema_version() == SCHEMA_VERSION
+        assert manager.count_data() == len(rows) * len(BASELINE_PERIODS)
+        assert manager.check_category_summary() == []
+    finally:
+        manager.close()
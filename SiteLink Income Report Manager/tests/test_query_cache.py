@@ -0,0 +1,78 @@
+"""
+Cached summaries are reused until the periods they read change
+"""
+from conftest import charge_row
+from database.query_cache import QueryCache
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 1200.0, 1000.0),
+    charge_row('L001', '2', 'Late Fee', 'Late Fee', '4010', 25.0),
+]
+
+
+def _charges(db, report_month):
+    columns, rows = db.get_financial_summary_rows(report_month, 2023)
+    return round(sum(row[columns.index('total_charges')] for row in rows), 2)
+
+
+def test_import_invalidates_only_its_period(db):
+    db.store_rows('01', 2023, [ROWS])
+    db.store_rows('02', 2023, [ROWS])
+    assert _charges(db, '01') == _charges(db, '02') == 1225.0
+    hits = db.query_cache.hits
+
+    db.store_rows('02', 2023, [[charge_row('L001', '1', 'Rent', 'Rent', '4000', 1300.0, 1000.0)]])
+    assert _charges(db, '01') == 1225.0
+    assert db.query_cache.hits == hits + 1
+    assert _charges(db, '02') == 1300.0
+    assert db.query_cache.hits == hits + 1
+
+
+def test_unchanged_reimport_keeps_cached_results(db):
+    db.store_rows('01', 2023, [ROWS])
+    generations = db.data_generations()
+    _charges(db, '01')
+    db.store_rows('01', 2023, [ROWS])
+    assert db.data_generations() == generations
+    hits = db.query_cache.hits
+    assert _charges(db, '01') == 1225.0
+    assert db.query_cache.hits == hits + 1
+
+
+def test_range_results_follow_every_period_in_range(db):
+    db.store_rows('01', 2023, [ROWS])
+    db.store_rows('03', 2023, [ROWS])
+    before = db.get_financial_summary_rows(start='2023-01', end='2023-03')
+    assert db.get_financial_summary_rows(start='2023-01', end='2023-03') == before
+    db.store_rows('02', 2023, [ROWS])
+    _, rows = db.get_financial_summary_rows(start='2023-01', end='2023-03')
+    assert len(rows) == len(before[1]) * 3 // 2
+
+
+def test_lru_spills_to_disk_and_loads_back(tmp_path):
+    cache = QueryCache(max_entries=2, directory=tmp_path, max_files=1)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, (['column'], [(key,)]))
+    assert cache.spilled == 1
+    assert (tmp_path / "a.pkl").exists()
+
+    assert cache.get('a') == (['column'], [('a',)])
+    # Loading 'a' back evicts 'b'; only the newest spilled file is kept
+    assert sorted(path.name for path in tmp_path.glob('*.pkl')) == ['b.pkl']
+    assert cache.get('missing') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_results_are_copies():
+    cache = QueryCache(max_entries=4, directory=None)
+    columns, rows = cache.cached('key', lambda: (['column'], [(1,)]))
+    rows.append((2,))
+    assert cache.get('key') == (['column'], [(1,)])
+
+
+def test_disabled_cache_always_computes():
+    cache = QueryCache(max_entries=0, directory=None)
+    calls = []
+    for _ in range(2):
+        cache.cached('key', lambda: calls.append(1) or len(calls))
+    assert len(calls) == 2
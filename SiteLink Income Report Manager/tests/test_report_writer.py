@@ -0,0 +1,17 @@
+"""
+Streaming Excel reports write their rows as given
+"""
+from openpyxl import load_workbook
+
+from utils.report_writer import ReportSheet, write_report
+
+
+def test_text_that_looks_like_a_formula_stays_text(tmp_path):
+    path = tmp_path / "report.xlsx"
+    rows = [('=SUM(A1:A2)', 1.5), ('=HYPERLINK("http://example.com")', None), ('Rent', 2)]
+    assert write_report(path, [ReportSheet('Data', ['Description', 'Amount'], rows)], engine='openpyxl') == {'Data': 3}
+
+    cells = list(load_workbook(path).active.iter_rows(min_row=2))
+    assert [(cell.value, cell.data_type) for cell in cells[0]] == [('=SUM(A1:A2)', 's'), (1.5, 'n')]
+    assert cells[1][0].data_type == 's'
+    assert [cell.value for cell in cells[2]] == ['Rent', 2]
@@ -0,0 +1,159 @@
+"""
+Sharded storage gives the same answers as the single database
+"""
+import pytest
+
+from conftest import charge_row
+from database.db_manager import DatabaseManager
+from database.sharding import ShardedDatabaseManager
+
+PERIODS = [('03', 2022), ('11', 2022), ('03', 2023)]
+CATEGORIES = [('Rent', '4000'), ('Late Fee', '4010'), ('Insurance', '4030')]
+
+
+def _rows(report_month, report_year):
+    rows = []
+    for site in ('L001', 'L002', 'L003'):
+        for number, (category, account) in enumerate(CATEGORIES, start=1):
+            charge = round(report_year % 100 + int(report_month) + number * 10.25 + int(site[-1]), 2)
+            rows.append(charge_row(site, str(number), category, f"{category} {number}", account, charge, charge / 2))
+    return rows
+
+
+def _fill(db_manager):
+    for report_month, report_year in PERIODS:
+        db_manager.store_rows(report_month, report_year, [_rows(report_month, report_year)],
+                              upload_date='2023-12-01T00:00:00')
+    return db_manager
+
+
+@pytest.fixture
+def single(tmp_path):
+    db_manager = _fill(DatabaseManager(tmp_path / "single.db"))
+    yield db_manager
+    db_manager.close()
+
+
+@pytest.fixture(params=['year', 'site'])
+def sharded(request, tmp_path):
+    db_manager = _fill(ShardedDatabaseManager(request.param, tmp_path / "shards", workers=2))
+    yield db_manager
+    db_manager.close()
+
+
+def _without_ids(rows):
+    return sorted(tuple(row[1:]) for row in rows)
+
+
+def test_reports_match(single, sharded):
+    assert sharded.get_financial_summary_rows() == single.get_financial_summary_rows()
+    assert sharded.get_financial_summary_rows(start='2022-06', end='2023-12') == (
+        single.get_financial_summary_rows(start='2022-06', end='2023-12')
+    )
+    assert sharded.get_trend_rows('2022-01', '2023-12', by_category=True) == (
+        single.get_trend_rows('2022-01', '2023-12', by_category=True)
+    )
+    assert sharded.get_sage_export_data('11', 2022).equals(single.get_sage_export_data('11', 2022))
+
+
+@pytest.mark.parametrize("sort", ['id', 'period', 'site', 'category'])
+@pytest.mark.parametrize("descending", [False, True])
+def test_paging_walks_every_row_once_in_order(single, sharded, sort, descending):
+    pages, after = [], None
+    while True:
+        columns, rows, after = sharded.get_data_page(sort=sort, descending=descending, after=after, limit=4)
+        assert len(rows) <= 4
+        pages.extend(rows)
+        if after is None:
+            break
+    _, everything, _ = single.get_data_page(limit=1000)
+    assert _without_ids(pages) == _without_ids(everything)
+
+    if sort != 'id':
+        position = columns.index({'period': 'report_year', 'site': 'SiteID', 'category': 'sChgCategory'}[sort])
+        values = [row[position] for row in pages]
+        assert values == sorted(values, reverse=descending)
+
+
+def test_paging_with_filters(single, sharded):
+    filters = {'report_year': 2022, 'SiteID': 'L002'}
+    _, rows, after = sharded.get_data_page(filters, sort='category', limit=100)
+    _, expected, _ = single.get_data_page(filters, sort='category', limit=100)
+    assert after is None
+    assert _without_ids(rows) == _without_ids(expected)
+
+
+def test_data_range_and_archived_periods(single, sharded):
+    ranged = sharded.get_data_range('2022-11', '2023-03')
+    expected = single.get_data_range('2022-11', '2023-03')
+    assert len(ranged) == len(expected) == 2 * 9
+    assert list(ranged['report_year']) == list(expected['report_year'])
+    assert sharded.archived_periods() == []
+
+
+def test_explain_queries_covers_every_shard(sharded):
+    report = sharded.explain_queries()
+    assert {entry['query'].split(': ')[0] for entry in report} == set(sharded.shard_keys())
+    assert not [entry['query'] for entry in report if entry['flagged']]
+
+
+def test_reset_empties_every_shard(sharded):
+    sharded.reset_database()
+    assert sharded.count_data() == 0
+    assert sharded.get_financial_summary_rows()[1] == []
+
+
+@pytest.mark.parametrize("text, options", [
+    ("fee", {}),
+    ("4000", {'start': '2022-06', 'end': '2023-12'}),
+    ("rent", {'site_ids': ['L002']}),
+    ("insurance", {'category': 'Insurance'}),
+])
+def test_search_walks_every_match_newest_first(single, sharded, text, options):
+    first = sharded.search(text, limit=2, **options)
+    expected = single.search(text, limit=1000, **options)
+    assert first['total'] == expected['total']
+    assert first['facets'] == expected['facets']
+
+    pages, after = [], None
+    while True:
+        result = sharded.search(text, after=after, limit=2, facets=False, **options)
+        assert len(result['rows']) <= 2
+        pages.extend(result['rows'])
+        after = result['next_cursor']
+        if after is None:
+            break
+    columns = first['columns']
+    assert sorted(row[1:-1] for row in pages) == sorted(row[1:-1] for row in expected['rows'])
+    periods = [(row[columns.index('report_year')], row[columns.index('report_month')]) for row in pages]
+    assert periods == sorted(periods, reverse=True)
+
+
+def test_search_rejects_empty_text(sharded):
+    with pytest.raises(ValueError):
+        sharded.search("  ")
+
+
+def test_site_import_reads_chunks_once_and_empties_dropped_sites(tmp_path):
+    sharded = ShardedDatabaseManager('site', tmp_path / "shards", workers=2)
+    try:
+        rows = _rows('03', 2023)
+        consumed = []
+
+        def chunks(rows):
+            for start in range(0, len(rows), 2):
+                consumed.append(start)
+                yield rows[start:start + 2]
+
+        stats = sharded.store_rows('03', 2023, chunks(rows))
+        assert consumed == list(range(0, len(rows), 2))
+        assert (stats['rows'], stats['inserted']) == (len(rows), len(rows))
+        assert sharded.shard_keys() == ['L001', 'L002', 'L003']
+
+        kept = [row for row in rows if row[0] != 'L002']
+        stats = sharded.store_rows('03', 2023, chunks(kept))
+        assert (stats['rows'], stats['deleted'], stats['unchanged']) == (len(kept), 3, len(kept))
+        assert sharded.shard('L002').count_data() == 0
+        assert sharded.count_data() == len(kept)
+    finally:
+        sharded.close()
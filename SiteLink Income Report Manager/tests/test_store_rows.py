@@ -0,0 +1,88 @@
+"""
+Re-importing a month writes only what changed
+"""
+import pytest
+
+from conftest import charge_row
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 1200.0, 1000.0),
+    charge_row('L001', '2', 'Late Fee', 'Late Fee', '4010', 25.0),
+    charge_row('L002', '1', 'Rent', 'Rent', '4000', 950.0, 950.0),
+    charge_row('L002', '3', 'Insurance', 'Insurance', '4030', 12.0, 12.0),
+]
+
+
+def _counts(stats):
+    return stats['inserted'], stats['updated'], stats['deleted'], stats['unchanged']
+
+
+def _ids(db, report_month):
+    return dict(db.connection().execute(
+        "SELECT SiteID || '/' || ChargeDescID, id FROM financial_data WHERE report_month = ?", (report_month,)
+    ))
+
+
+def test_first_import_inserts_every_row(db):
+    stats = db.store_rows('04', 2023, [ROWS])
+    assert stats['rows'] == 4
+    assert _counts(stats) == (4, 0, 0, 0)
+
+
+def test_reimport_counts_each_kind_of_change(db):
+    db.store_rows('04', 2023, [ROWS])
+    ids = _ids(db, '04')
+    changed = [
+        charge_row('L001', '1', 'Rent', 'Rent', '4000', 1250.0, 1000.0),
+        ROWS[1],
+        ROWS[2],
+        charge_row('L003', '1', 'Rent', 'Rent', '4000', 800.0),
+    ]
+    stats = db.store_rows('04', 2023, [changed[:2], changed[2:]])
+    assert _counts(stats) == (1, 1, 1, 2)
+
+    stored = _ids(db, '04')
+    # Updated and unchanged rows keep their ids; the dropped row is gone
+    kept = ('L001/1', 'L001/2', 'L002/1')
+    assert {key: stored[key] for key in kept} == {key: ids[key] for key in kept}
+    assert 'L002/3' not in stored and 'L003/1' in stored
+    total = db.connection().execute(
+        "SELECT total_charges, record_count FROM monthly_summary WHERE report_month = '04' AND report_year = 2023"
+    ).fetchone()
+    assert total == (1250.0 + 25.0 + 950.0 + 800.0, 4)
+
+
+def test_identical_reimport_writes_nothing(db):
+    db.store_rows('04', 2023, [ROWS])
+    stats = db.store_rows('04', 2023, [ROWS[2:], ROWS[:2]])
+    assert _counts(stats) == (0, 0, 0, 4)
+
+
+def test_other_months_are_untouched(db):
+    db.store_rows('04', 2023, [ROWS])
+    db.store_rows('05', 2023, [ROWS])
+    stats = db.store_rows('05', 2023, [ROWS[:1]])
+    assert _counts(stats) == (0, 0, 3, 1)
+    assert len(_ids(db, '04')) == 4
+
+
+def test_repeated_key_fails_the_import(db):
+    db.store_rows('04', 2023, [ROWS])
+    repeated = charge_row('L001', '2', 'Late Fee', 'Late Fee', '4010', 50.0)
+    with pytest.raises(Exception, match=r"Row 6 repeats the key .*ChargeDescID='2'"):
+        db.store_rows('04', 2023, [ROWS[:3], [ROWS[3], charge_row('L009', '1', 'Rent', 'Rent', '4000', 1.0),
+                                              repeated]])
+    # Nothing of the failed import was written
+    assert _counts(db.store_rows('04', 2023, [ROWS])) == (0, 0, 0, 4)
+
+
+def test_blank_and_missing_keys_are_the_same_key(db):
+    rows = [charge_row(None, '1', 'Rent', None, '4000', 100.0), charge_row('', '1', 'Rent', '', '4000', 50.0)]
+    with pytest.raises(Exception, match="Row 2 repeats the key"):
+        db.store_rows('04', 2023, [rows])
+
+
+def test_rows_counts_every_input_row(db):
+    stats = db.store_rows('04', 2023, iter([iter(ROWS[:2]), [], iter(ROWS[2:])]))
+    assert stats['rows'] == 4
+    assert _counts(stats) == (4, 0, 0, 0)
@@ -0,0 +1,78 @@
+"""
+Month-range summaries and trend reports
+"""
+import pytest
+
+from conftest import charge_row
+
+# Net totals per month; 2022-03 and 2022-05..12 have no data
+NET = {('01', 2022): 100.0, ('02', 2022): 110.0, ('04', 2022): 130.0, ('01', 2023): 150.0, ('02', 2023): 121.0}
+
+
+@pytest.fixture
+def trend_db(db):
+    for (report_month, report_year), net in NET.items():
+        db.store_rows(report_month, report_year, [[
+            charge_row('L001', '1', 'Rent', 'Rent', '4000', net + 40.0, 40.0),
+            charge_row('L002', '2', 'Late Fee', 'Late Fee', '4010', 5.0, 5.0),
+        ]])
+    return db
+
+
+def _by_period(columns, rows):
+    return {row[0]: dict(zip(columns, row)) for row in rows}
+
+
+def test_month_over_month_year_over_year_and_rolling(trend_db):
+    rows = _by_period(*trend_db.get_trend_rows('2022-02', '2023-02'))
+    assert list(rows) == ['2022-02', '2022-04', '2023-01', '2023-02']
+
+    # The month before the range still feeds the first comparison
+    assert (rows['2022-02']['mom_change'], rows['2022-02']['mom_pct']) == (10.0, 10.0)
+    assert rows['2022-02']['rolling_total'] == 210.0
+
+    # A missing month gives no comparison instead of pairing with an older one
+    assert rows['2022-04']['mom_change'] is None
+    assert rows['2022-04']['rolling_total'] == 240.0
+    assert rows['2023-01']['mom_change'] is None
+    assert (rows['2023-01']['yoy_change'], rows['2023-01']['yoy_pct']) == (50.0, 50.0)
+    assert rows['2023-01']['rolling_total'] == 150.0
+
+    assert (rows['2023-02']['mom_change'], rows['2023-02']['mom_pct']) == (-29.0, -19.33)
+    assert (rows['2023-02']['yoy_change'], rows['2023-02']['yoy_pct']) == (11.0, 10.0)
+    assert rows['2023-02']['rolling_total'] == 271.0
+    assert rows['2022-02']['yoy_change'] is None
+
+
+def test_other_measures_and_windows(trend_db):
+    rows = _by_period(*trend_db.get_trend_rows('2023-01', '2023-02', measure='total_charges', rolling_months=1))
+    assert rows['2023-02']['total_charges'] == 121.0 + 45.0
+    assert rows['2023-02']['mom_change'] == -29.0
+    assert rows['2023-02']['rolling_total'] == 166.0
+
+
+def test_by_category_keeps_separate_series(trend_db):
+    columns, rows = trend_db.get_trend_rows('2022-02', '2023-02', by_category=True)
+    late_fees = [dict(zip(columns, row)) for row in rows if row[1] == 'Late Fee']
+    assert [row['period'] for row in late_fees] == ['2022-02', '2022-04', '2023-01', '2023-02']
+    assert all(row['net_total'] == 0.0 for row in late_fees)
+    rent = [dict(zip(columns, row)) for row in rows if row[1] == 'Rent']
+    assert rent[-1]['yoy_change'] == 11.0
+
+
+def test_range_summary_covers_only_the_range(trend_db):
+    columns, rows = trend_db.get_financial_summary_rows(start='2022-02', end='2022-12')
+    periods = {(row[columns.index('report_month')], row[columns.index('report_year')]) for row in rows}
+    assert periods == {('02', 2022), ('04', 2022)}
+
+
+def test_report_frame_matches_rows(trend_db):
+    df = trend_db.get_trend_report('2022-02', '2023-02')
+    assert list(df['period']) == ['2022-02', '2022-04', '2023-01', '2023-02']
+    assert df['mom_change'].isna().tolist() == [False, True, True, False]
+
+
+@pytest.mark.parametrize("options", [{'measure': 'bogus'}, {'rolling_months': 0}])
+def test_bad_options(trend_db, options):
+    with pytest.raises(ValueError):
+        trend_db.get_trend_rows('2022-01', '2022-12', **options)
@@ -0,0 +1,81 @@
+"""
+Import validation rules and strict imports
+"""
+import pandas as pd
+import pytest
+
+from conftest import charge_row
+from config.settings import EXPECTED_COLUMNS
+from data import sitelink_processor
+from data.validation import ImportValidator, ValidationError, validate_frame
+
+ROWS = [
+    charge_row('L001', '1', 'Rent', 'Rent', '4000', 100.0, 100.0),
+    charge_row('L001', '2', 'Late Fee', 'Late Fee', '4010', 25.0),
+]
+
+
+def _frame(rows, report_month='04', report_year=2023):
+    df = pd.DataFrame(rows, columns=EXPECTED_COLUMNS)
+    df.insert(0, 'upload_date', '2023-05-01T00:00:00')
+    df.insert(0, 'report_year', report_year)
+    df.insert(0, 'report_month', report_month)
+    return df
+
+
+@pytest.fixture
+def processor(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(sitelink_processor, 'SAGE_MAPPING_PATH', tmp_path / "sage_gls_mapping.json")
+    return sitelink_processor.SiteLinkProcessor(db)
+
+
+def test_clean_rows_pass():
+    report = validate_frame(_frame(ROWS))
+    assert report['rows'] == 2
+    assert report['violations'] == {}
+    assert report['totals']['ChargeTotal'] == 125.0
+
+
+def test_rules_report_counts_and_rows():
+    broken = list(ROWS)
+    broken.append(ROWS[0])
+    broken.append(charge_row('', '3', 'Rent', 'Rent 3', '4000', 10.0, disabled=2))
+    validator = ImportValidator()
+    for start in range(0, len(broken), 2):
+        validator.check(broken[start:start + 2])
+    validator.finish()
+    violations = validator.report()['violations']
+    assert violations['duplicate_key']['rows'] == [3]
+    assert violations['missing_key']['rows'] == [4]
+    assert violations['invalid_flag']['rows'] == [4]
+
+
+def test_blank_rule_names_what_it_sees():
+    values = dict(zip(EXPECTED_COLUMNS, ROWS[0]))
+    values['Discount'] = None
+    violations = validate_frame(_frame([tuple(values.values())]))['violations']
+    assert list(violations) == ['blank:Discount']
+    assert 'blank' in violations['blank:Discount']['description']
+
+
+def test_store_data_validates_before_storing(processor):
+    stats = processor.store_data(_frame(ROWS))
+    assert stats['validation']['violations'] == {}
+    assert stats['reconciliation']['ok']
+
+    unsited = _frame(ROWS + [charge_row('', '3', 'Rent', 'Rent', '4000', 10.0)], report_month='05')
+    with pytest.raises(ValidationError):
+        processor.store_data(unsited, strict=True)
+    assert processor.count_data({'report_month': '05'}) == 0
+
+    stats = processor.store_data(unsited)
+    assert 'missing_key' in stats['validation']['violations']
+    assert processor.count_data({'report_month': '05'}) == 3
+
+
+def test_duplicate_keys_are_never_stored(processor):
+    duplicated = _frame(ROWS + [ROWS[1]])
+    assert 'duplicate_key' in validate_frame(duplicated)['violations']
+    with pytest.raises(Exception, match="Row 3 repeats the key"):
+        processor.store_data(duplicated)
+    assert processor.count_data() == 0
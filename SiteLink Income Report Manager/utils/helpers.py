@@ -1,7 +1,6 @@
 """
 Utility functions for SiteLink Financial Manager
 """
-import pandas as pd
 from datetime import datetime
 
 def validate_date_range(start_date, end_date):
@@ -13,33 +12,23 @@ def validate_date_range(start_date, end_date):
     except ValueError:
         return False
 
+def period_key(report_month, report_year):
+    """Sortable month number: year * 12 + month - 1 (matches category_summary.period_key)"""
+    return int(report_year) * 12 + int(report_month) - 1
+
+def parse_period(text):
+    """Split a YYYY-MM string into (report_month, report_year)"""
+    parsed = datetime.strptime(text, "%Y-%m")
+    return f"{parsed.month:02d}", parsed.year
+
 def format_currency(amount):
     """Format amount as currency"""
     return f"${amount:,.2f}"
 
 def export_to_excel(df, filename):
-    """Export DataFrame to Excel with formatting"""
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='SiteLink_Data', index=False)
-        
-        # Get workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets['SiteLink_Data']
-        
-        # Auto-adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+    """Export DataFrame to Excel with column widths fitted to the data"""
+    from utils.report_writer import ReportSheet, write_report
+    write_report(filename, [ReportSheet.from_frame('SiteLink_Data', df)])
 
 def get_month_name(month_number):
     """Convert month number to name"""
@@ -2,3 +2,4 @@
 Utilities package for SiteLink Financial Manager
 """
 from .helpers import *
+from .report_writer import ReportSheet, write_report
@@ -0,0 +1,330 @@
+"""
+Timing, SQL metrics and profiling hooks for SiteLink Financial Manager
+
+Off by default. Turn it on with environment variables, or with the
+matching cli.py options:
+
+    SITELINK_METRICS=metrics.json     write span and SQL metrics on exit
+    SITELINK_METRICS=metrics.prom     ... in Prometheus text format instead
+    SITELINK_PROFILE=cprofile         also capture a cProfile of the run
+    SITELINK_PROFILE=tracemalloc      also report top allocations and peak
+                                      (both: SITELINK_PROFILE=cprofile,tracemalloc)
+
+Only the standard library is imported here so the headless CLI stays fast.
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_ENV = "SITELINK_METRICS"
+PROFILE_ENV = "SITELINK_PROFILE"
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+# Longest SQL text used as a metric key / Prometheus label
+QUERY_KEY_LENGTH = 160
+
+_state = {'enabled': False, 'metrics_path': None, 'profilers': {}}
+
+
+def enabled():
+    return _state['enabled']
+
+
+class Metrics:
+    """Thread-safe accumulator for span and query timings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}
+            self.queries = {}
+            self.started = datetime.now().isoformat(timespec='seconds')
+
+    @staticmethod
+    def _add(table, key, seconds, rows, error=False):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'errors': 0}
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        entry['rows'] += rows or 0
+        entry['errors'] += error
+
+    def record_span(self, name, seconds, rows=None, error=False):
+        with self._lock:
+            self._add(self.spans, name, seconds, rows, error)
+
+    def record_query(self, sql, seconds, rows=0):
+        with self._lock:
+            self._add(self.queries, query_key(sql), seconds, rows)
+
+    def add_query_rows(self, key, seconds, rows):
+        """Attribute fetch time and rows to an already recorded query"""
+        with self._lock:
+            entry = self.queries.get(key)
+            if entry is not None:
+                entry['seconds'] += seconds
+                entry['rows'] += rows
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'started': self.started,
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                'spans': {name: dict(entry) for name, entry in self.spans.items()},
+                'queries': {sql: dict(entry) for sql, entry in self.queries.items()},
+            }
+
+
+metrics = Metrics()
+
+
+def query_key(sql):
+    """Collapse whitespace so one statement always maps to one metric"""
+    return " ".join(sql.split())[:QUERY_KEY_LENGTH]
+
+
+class Span:
+    """Handle yielded by span(); set rows to record how many rows were processed"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+
+@contextmanager
+def span(name):
+    """Time a block as a named span (no-op unless instrumentation is on)"""
+    current = Span(name)
+    if not _state['enabled']:
+        yield current
+        return
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        metrics.record_span(name, time.perf_counter() - started, current.rows, error=True)
+        raise
+    metrics.record_span(name, time.perf_counter() - started, current.rows)
+
+
+def _result_rows(result):
+    """Best-effort row count of an operation's return value"""
+    if isinstance(result, dict):
+        return result.get('rows')
+    shape = getattr(result, 'shape', None)
+    return shape[0] if shape else None
+
+
+def timed(name=None):
+    """Decorator recording each call of a function as a span"""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                metrics.record_span(span_name, time.perf_counter() - started, error=True)
+                raise
+            metrics.record_span(span_name, time.perf_counter() - started, _result_rows(result))
+            return result
+        return wrapper
+    return decorate
+
+
+def instrumented(*exclude):
+    """Class decorator applying timed() to every public method not excluded"""
+    def decorate(cls):
+        for attribute, value in list(vars(cls).items()):
+            if not attribute.startswith('_') and attribute not in exclude and callable(value):
+                setattr(cls, attribute, timed(f"{cls.__name__}.{attribute}")(value))
+        return cls
+    return decorate
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor recording execution time, fetch time and row counts per statement"""
+
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._query = query_key(sql)
+            rows = self.rowcount if self.rowcount > 0 else 0
+            metrics.record_query(sql, time.perf_counter() - started, rows)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._query = query_key(sql)
+            rows = self.rowcount if self.rowcount > 0 else 0
+            metrics.record_query(sql, time.perf_counter() - started, rows)
+
+    def _fetched(self, started, rows):
+        if self._query is not None:
+            metrics.add_query_rows(self._query, time.perf_counter() - started, rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those of execute(), are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts bypass cursor(), so route them through it explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """sqlite3.connect factory for new connections given the current mode"""
+    return InstrumentedConnection if _state['enabled'] else sqlite3.Connection
+
+
+def configure(metrics_path=None, profile=None):
+    """
+    Turn instrumentation on if requested here or in the environment.
+
+    metrics_path and profile default to SITELINK_METRICS and
+    SITELINK_PROFILE. Call before the first database connection is opened
+    so SQL timing covers it. Returns True if instrumentation is on.
+    """
+    metrics_path = metrics_path or os.environ.get(METRICS_ENV)
+    profile = profile or os.environ.get(PROFILE_ENV)
+    modes = [mode.strip().lower() for mode in (profile or '').split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s): {', '.join(unknown)}")
+
+    if not (metrics_path or modes):
+        return False
+    _state['enabled'] = True
+    _state['metrics_path'] = metrics_path
+    metrics.reset()
+
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracemalloc.start(10)
+        _state['profilers']['tracemalloc'] = tracemalloc
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        _state['profilers']['cprofile'] = profiler
+    return True
+
+
+def finish(stream=sys.stderr):
+    """Write the metrics file, then stop profilers and print their reports"""
+    if not _state['enabled']:
+        return
+    _state['enabled'] = False
+    if _state['metrics_path']:
+        write_metrics(_state['metrics_path'])
+        print(f"Metrics written to {_state['metrics_path']}", file=stream)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    profiler = _state['profilers'].pop('cprofile', None)
+    if profiler is not None:
+        import pstats
+        profiler.disable()
+        path = f"sitelink_profile_{stamp}.prof"
+        profiler.dump_stats(path)
+        print(f"cProfile written to {path}; top functions by cumulative time:", file=stream)
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(20)
+
+    tracemalloc = _state['profilers'].pop('tracemalloc', None)
+    if tracemalloc is not None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"tracemalloc: peak {peak / 1048576:.1f} MB, current {current / 1048576:.1f} MB; "
+              f"top allocations:", file=stream)
+        for statistic in snapshot.statistics('lineno')[:15]:
+            print(f"  {statistic}", file=stream)
+
+
+def write_metrics(path):
+    """Write the collected metrics as JSON, or Prometheus text for .prom/.txt"""
+    snapshot = metrics.snapshot()
+    with open(path, 'w') as f:
+        if path.lower().endswith(('.prom', '.txt')):
+            f.write(prometheus_text(snapshot))
+        else:
+            json.dump(snapshot, f, indent=4)
+
+
+def _label(value):
+    return re.sub(r'(["\\])', r'\\\1', value).replace("\n", " ")
+
+
+def prometheus_text(snapshot):
+    """Render a metrics snapshot in the Prometheus text exposition format"""
+    lines = []
+    families = [
+        ('span', 'spans', 'operation', 'instrumented operation'),
+        ('query', 'queries', 'query', 'SQL statement'),
+    ]
+    for prefix, table, label, description in families:
+        for suffix, field, kind, text in [
+            ('calls_total', 'calls', 'counter', 'Calls of each'),
+            ('seconds_total', 'seconds', 'counter', 'Total seconds spent in each'),
+            ('max_seconds', 'max_seconds', 'gauge', 'Slowest single call of each'),
+            ('rows_total', 'rows', 'counter', 'Rows processed by each'),
+            ('errors_total', 'errors', 'counter', 'Failed calls of each'),
+        ]:
+            if prefix == 'query' and field == 'errors':
+                continue
+            metric = f"sitelink_{prefix}_{suffix}"
+            lines.append(f"# HELP {metric} {text} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, entry in sorted(snapshot[table].items()):
+                lines.append(f'{metric}{{{label}="{_label(name)}"}} {entry[field]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,195 @@
+"""
+Streaming Excel report writer for SiteLink Financial Manager
+
+Rows are written straight from their source (a database cursor, a
+DataFrame or any iterable of tuples) into a workbook opened in streaming
+mode: xlsxwriter's constant_memory mode when it is installed, otherwise
+openpyxl's write-only mode. Neither keeps more than the current row in
+memory, so reports can be far larger than RAM.
+"""
+import importlib.util
+import os
+from itertools import chain, islice
+from pathlib import Path
+
+XLSXWRITER_AVAILABLE = importlib.util.find_spec('xlsxwriter') is not None
+
+# Rows per worksheet Excel accepts (including the header row)
+EXCEL_MAX_ROWS = 1048576
+
+# Column widths are sized from the header and this many leading rows
+WIDTH_SAMPLE_ROWS = 500
+MAX_COLUMN_WIDTH = 50
+
+# progress is reported every this many rows
+PROGRESS_EVERY = 10000
+
+
+class ReportSheet:
+    """
+    One worksheet of a report: a name, column headings and rows.
+
+    rows is any iterable of tuples in column order and is consumed once.
+    widths, if given, overrides the sampled column widths.
+    """
+
+    def __init__(self, name, columns, rows, widths=None):
+        self.name = name
+        self.columns = list(columns)
+        self.rows = rows
+        self.widths = widths
+
+    @classmethod
+    def from_frame(cls, name, df):
+        """Sheet over a DataFrame's rows, with NaN written as blank cells"""
+        values = df.astype(object)
+        values = values.where(values.notna(), None)
+        return cls(name, [str(column) for column in df.columns], values.itertuples(index=False, name=None))
+
+
+def _cell_width(value):
+    if value is None:
+        return 0
+    if isinstance(value, float):
+        return len(f"{value:.2f}")
+    return len(str(value))
+
+
+def column_widths(columns, sample):
+    """Column widths fitting the header and a sample of rows, capped at MAX_COLUMN_WIDTH"""
+    widths = [len(str(column)) for column in columns]
+    for row in sample:
+        for position, value in enumerate(row):
+            width = _cell_width(value)
+            if width > widths[position]:
+                widths[position] = width
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def _sheet_title(name, part):
+    """Worksheet title for the nth part of a sheet split at EXCEL_MAX_ROWS"""
+    suffix = f" ({part})" if part > 1 else ""
+    return name[:31 - len(suffix)] + suffix
+
+
+class _XlsxWriterBook:
+    """xlsxwriter workbook in constant_memory mode"""
+
+    def __init__(self, path):
+        import xlsxwriter
+        # Text is written as text: no formula or URL detection
+        self.workbook = xlsxwriter.Workbook(str(path), {
+            'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd'
+        })
+        self.header_format = self.workbook.add_format({'bold': True})
+
+    def add_sheet(self, title, columns, widths):
+        worksheet = self.workbook.add_worksheet(title)
+        for position, width in enumerate(widths):
+            worksheet.set_column(position, position, width)
+        worksheet.write_row(0, 0, columns, self.header_format)
+        worksheet.freeze_panes(1, 0)
+        row_number = [0]
+
+        def write(row):
+            row_number[0] += 1
+            worksheet.write_row(row_number[0], 0, row)
+        return write
+
+    def close(self):
+        self.workbook.close()
+
+
+def _looks_like_formula(value):
+    return isinstance(value, str) and value.startswith('=')
+
+
+def _text_cell(worksheet, value):
+    """A cell holding value as text; openpyxl would otherwise write it as a formula"""
+    from openpyxl.cell import WriteOnlyCell
+    cell = WriteOnlyCell(worksheet, value=value)
+    cell.data_type = 's'
+    return cell
+
+
+class _OpenpyxlBook:
+    """openpyxl workbook in write-only mode"""
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+
+    def add_sheet(self, title, columns, widths):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
+        worksheet = self.workbook.create_sheet(title)
+        # Column widths and panes must be set before the first row is written
+        for position, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(position)].width = width
+        worksheet.freeze_panes = 'A2'
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        worksheet.append(header)
+
+        def append(row):
+            worksheet.append([_text_cell(worksheet, value) if _looks_like_formula(value) else value
+                              for value in row])
+        return append
+
+    def close(self):
+        self.workbook.save(str(self.path))
+
+
+def write_report(path, sheets, engine=None, progress=None):
+    """
+    Stream sheets into one .xlsx workbook; return rows written per sheet.
+
+    sheets is an iterable of ReportSheet, written in order. A sheet with
+    more rows than Excel allows continues on "name (2)", "name (3)", ...
+    engine is 'xlsxwriter' or 'openpyxl' (default: xlsxwriter if
+    installed). progress, if given, is called as progress('writing',
+    rows_written=...) as rows are written; an exception it raises stops
+    the export. The workbook is written to a temporary file and only
+    moved to path once complete.
+    """
+    engine = engine or ('xlsxwriter' if XLSXWRITER_AVAILABLE else 'openpyxl')
+    if engine not in ('xlsxwriter', 'openpyxl'):
+        raise ValueError(f"Unknown Excel engine '{engine}'")
+    path = Path(path)
+    partial = path.with_name(path.name + '.partial')
+    book = _XlsxWriterBook(partial) if engine == 'xlsxwriter' else _OpenpyxlBook(partial)
+
+    written, total = {}, 0
+    try:
+        for sheet in sheets:
+            rows = iter(sheet.rows)
+            sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+            widths = sheet.widths or column_widths(sheet.columns, sample)
+
+            part, in_part, count = 1, 0, 0
+            write = book.add_sheet(_sheet_title(sheet.name, part), sheet.columns, widths)
+            for row in chain(sample, rows):
+                if in_part == EXCEL_MAX_ROWS - 1:
+                    part, in_part = part + 1, 0
+                    write = book.add_sheet(_sheet_title(sheet.name, part), sheet.columns, widths)
+                write(row)
+                in_part += 1
+                count += 1
+                total += 1
+                if progress and total % PROGRESS_EVERY == 0:
+                    progress('writing', rows_written=total)
+            written[sheet.name] = count
+        book.close()
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    if progress:
+        progress('writing', rows_written=total)
+    return written